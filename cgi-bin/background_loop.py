@@ -0,0 +1,100 @@
+"""
+Long-lived asyncio event loop for outbound HTTP from sync Flask handlers.
+
+The loop runs forever in a daemon thread and owns one aiohttp session, so
+keep-alive connections (and their TLS handshakes) are reused across requests
+instead of being thrown away with a per-call loop. Request threads hand
+coroutines to submit() and block on the result.
+
+The loop is started lazily and restarted in a forked child, where the
+parent's thread and sockets do not exist.
+"""
+
+import asyncio
+import concurrent.futures
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundLoop:
+    """An event loop in a daemon thread with a thread-safe submit API."""
+
+    def __init__(self, session_factory=None, name='background-loop', default_timeout=15):
+        self.session_factory = session_factory
+        self.name = name
+        self.default_timeout = default_timeout
+        self._loop = None
+        self._thread = None
+        self._session = None
+        self._lock = threading.Lock()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        """Forget the parent's loop thread, session and lock in a forked child."""
+        self._loop = self._thread = self._session = None
+        self._lock = threading.Lock()
+
+    def _running(self):
+        return self._loop is not None and self._thread is not None and self._thread.is_alive()
+
+    def _run(self, loop, started):
+        asyncio.set_event_loop(loop)
+        loop.call_soon(started.set)
+        loop.run_forever()
+
+    def start(self):
+        """Start the loop thread if it is not running in this process."""
+        if self._running():
+            return self._loop
+        with self._lock:
+            if self._running():
+                return self._loop
+            self._session = None
+            loop = asyncio.new_event_loop()
+            started = threading.Event()
+            thread = threading.Thread(target=self._run, args=(loop, started), name=self.name, daemon=True)
+            thread.start()
+            started.wait()
+            self._loop, self._thread = loop, thread
+            logger.info(f"[OK] {self.name} event loop started")
+        return self._loop
+
+    def submit(self, coro, timeout=None):
+        """Run a coroutine on the loop and wait for its result (thread-safe).
+
+        Raises concurrent.futures.TimeoutError (after cancelling the coroutine)
+        if it does not finish within timeout seconds.
+        """
+        loop = self.start()
+        future = asyncio.run_coroutine_threadsafe(coro, loop)
+        try:
+            return future.result(self.default_timeout if timeout is None else timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+    def session(self):
+        """The shared aiohttp session; only call from coroutines running on this loop."""
+        if self._session is None or self._session.closed:
+            self._session = self.session_factory()
+        return self._session
+
+    async def _close_session(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    def stop(self, timeout=5):
+        """Close the session and stop the loop thread."""
+        if not self._running():
+            return
+        try:
+            self.submit(self._close_session(), timeout=timeout)
+        except Exception as e:
+            logger.debug(f"Could not close {self.name} session: {e}")
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout)
+        self._loop = self._thread = self._session = None
@@ -0,0 +1,339 @@
+"""
+Per-guild, per-day bet aggregates used by the guild stats widgets.
+
+Rows in guild_daily_bet_stats are keyed by (guild_id, stat_date), where
+stat_date is the calendar day in the guild's own time zone. Buckets are kept
+up to date incrementally by sync(), run from the refresh scheduler, from bets
+whose created_at or updated_at moved past a stored watermark. Each column is
+read on its own so both range scans can use their index (bets is expected to
+have one on created_at and one on updated_at). The first sync creates the
+tables and fills the win-rate window; the backfill command rebuilds the full
+history.
+"""
+
+import logging
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from queries import DB_NOW, execute, execute_many, fetch_all, fetch_one, register
+from schema import ASSUMED_SCHEMA, BetColumns
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_STATS_TABLE = """
+    CREATE TABLE IF NOT EXISTS guild_daily_bet_stats (
+        guild_id BIGINT NOT NULL,
+        stat_date DATE NOT NULL,
+        bet_count INT NOT NULL DEFAULT 0,
+        units DECIMAL(12, 2) NOT NULL DEFAULT 0,
+        settled_units DECIMAL(12, 2) NOT NULL DEFAULT 0,
+        bettor_count INT NOT NULL DEFAULT 0,
+        won_count INT NOT NULL DEFAULT 0,
+        lost_count INT NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP{on_update},
+        PRIMARY KEY (guild_id, stat_date)
+    )
+"""
+
+ROLLUP_SCHEMA = [
+    register('rollup.create_stats_table', ROLLUP_STATS_TABLE.replace('{on_update}', ' ON UPDATE CURRENT_TIMESTAMP'),
+             postgres=ROLLUP_STATS_TABLE.replace('{on_update}', ''), prepare=False),
+    register('rollup.create_state_table', """
+        CREATE TABLE IF NOT EXISTS bet_rollup_state (
+            name VARCHAR(64) PRIMARY KEY,
+            watermark DATETIME NOT NULL
+        )
+    """, postgres="""
+        CREATE TABLE IF NOT EXISTS bet_rollup_state (
+            name VARCHAR(64) PRIMARY KEY,
+            watermark TIMESTAMP NOT NULL
+        )
+    """, prepare=False),
+]
+
+GUILD_TIMEZONES = register('rollup.guild_timezones', """
+    SELECT guild_id, timezone FROM guild_settings WHERE timezone IS NOT NULL
+""")
+UPSERT_BUCKET = register('rollup.upsert_bucket', """
+    INSERT INTO guild_daily_bet_stats (
+        guild_id, stat_date, bet_count, units, settled_units,
+        bettor_count, won_count, lost_count
+    ) VALUES (
+        :guild_id, :stat_date, :bet_count, :units, :settled_units,
+        :bettor_count, :won_count, :lost_count
+    )
+    {upsert:guild_id,stat_date}
+        bet_count = {excluded:bet_count},
+        units = {excluded:units},
+        settled_units = {excluded:settled_units},
+        bettor_count = {excluded:bettor_count},
+        won_count = {excluded:won_count},
+        lost_count = {excluded:lost_count}
+""")
+# Buckets are recomputed REFRESH_SLOTS at a time in one GROUP BY; each slot is
+# a guild's [start, end) day range in DB time (unused slots repeat the last)
+REFRESH_SLOTS = 32
+_SLOT_RANGES = [f"(guild_id = :guild_{i} AND created_at >= :start_{i} AND created_at < :end_{i})"
+                for i in range(REFRESH_SLOTS)]
+BUCKET_TOTALS = register('rollup.bucket_totals', """
+    SELECT
+        {slot} as slot,
+        COUNT(*) as bet_count,
+        COALESCE(SUM({bets.stake}), 0) as units,
+        COALESCE(SUM(CASE WHEN {bets.settled} THEN {bets.stake} ELSE 0 END), 0) as settled_units,
+        COUNT(DISTINCT user_id) as bettor_count,
+        COALESCE(SUM(CASE WHEN {bets.won} THEN 1 ELSE 0 END), 0) as won_count,
+        COALESCE(SUM(CASE WHEN {bets.lost} THEN 1 ELSE 0 END), 0) as lost_count
+    FROM bets
+    WHERE {ranges}
+    GROUP BY slot
+""".replace('{slot}', 'CASE ' + ' '.join(f"WHEN {r} THEN {i}" for i, r in enumerate(_SLOT_RANGES)) + ' END')
+   .replace('{ranges}', ' OR '.join(_SLOT_RANGES)))
+GET_WATERMARK = register('rollup.get_watermark', """
+    SELECT watermark FROM bet_rollup_state WHERE name = 'bets'
+""")
+SET_WATERMARK = register('rollup.set_watermark', """
+    INSERT INTO bet_rollup_state (name, watermark) VALUES ('bets', :watermark)
+    {upsert:name} watermark = {excluded:watermark}
+""")
+# One index range scan per timestamp column instead of an OR across both
+CHANGED_BETS = {
+    column: register(f'rollup.changed_bets.{column}', f"""
+        SELECT guild_id, created_at, {column} as changed_at
+        FROM bets
+        WHERE {column} >= :watermark
+        ORDER BY {column}
+        LIMIT :limit
+    """)
+    for column in ('created_at', 'updated_at')
+}
+BACKFILL_BETS = register('rollup.backfill_bets', """
+    SELECT guild_id, user_id, created_at, {bets.stake} as units, {bets.outcome} as outcome
+    FROM bets
+    {where}
+    ORDER BY guild_id
+""", prepare=False)
+GUILD_DAYS = register('rollup.guild_days', """
+    SELECT stat_date, bet_count, settled_units, bettor_count, won_count, lost_count
+    FROM guild_daily_bet_stats
+    WHERE guild_id = :guild_id AND stat_date > :first_day AND stat_date <= :today
+""")
+
+BUCKET_FIELDS = ('guild_id', 'stat_date', 'bet_count', 'units', 'settled_units',
+                 'bettor_count', 'won_count', 'lost_count')
+
+# Bet columns used when the rollup has no schema registry
+DEFAULT_BETS = BetColumns(ASSUMED_SCHEMA['bets'])
+WIN_RATE_DAYS = 30
+SYNC_BATCH_SIZE = 5000
+
+
+def _resolve_zone(name, fallback):
+    """Return a ZoneInfo for name, or the fallback zone if it is unknown."""
+    if not name:
+        return fallback
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        logger.warning(f"Unknown guild time zone {name!r}, using {fallback}")
+        return fallback
+
+
+class BetRollup:
+    """Maintains and reads the guild_daily_bet_stats rollup table."""
+
+    def __init__(self, db_timezone='UTC', default_timezone='UTC', timezone_ttl=600, schema=None):
+        self.schema = schema
+        self.db_zone = _resolve_zone(db_timezone, timezone.utc)
+        self.default_zone = _resolve_zone(default_timezone, timezone.utc)
+        self.timezone_ttl = timezone_ttl
+        self._zones = {}
+        self._zones_loaded_at = 0
+        self._schema_ready = False
+
+    def _bets(self):
+        return self.schema.bets() if self.schema else DEFAULT_BETS
+
+    # -- time zones -------------------------------------------------------
+
+    def _load_timezones(self, connection):
+        """Refresh the guild_id -> ZoneInfo map from guild_settings."""
+        zones = {}
+        try:
+            for row in fetch_all(connection, GUILD_TIMEZONES):
+                zones[int(row['guild_id'])] = _resolve_zone(row['timezone'], self.default_zone)
+        except Exception as e:
+            # Older schemas have no timezone column - every guild uses the default
+            logger.debug(f"Guild time zones unavailable: {e}")
+        self._zones = zones
+        self._zones_loaded_at = time.monotonic()
+
+    def guild_zone(self, connection, guild_id):
+        """Time zone used to bucket a guild's bets into days."""
+        if time.monotonic() - self._zones_loaded_at > self.timezone_ttl:
+            self._load_timezones(connection)
+        return self._zones.get(int(guild_id), self.default_zone)
+
+    def local_date(self, zone, db_timestamp):
+        """Calendar day of a naive DB timestamp in the given guild zone."""
+        return db_timestamp.replace(tzinfo=self.db_zone).astimezone(zone).date()
+
+    def day_bounds(self, zone, day):
+        """Naive DB-time [start, end) range covering a guild-local day."""
+        start = datetime(day.year, day.month, day.day, tzinfo=zone)
+        end = start + timedelta(days=1)
+        return (start.astimezone(self.db_zone).replace(tzinfo=None),
+                end.astimezone(self.db_zone).replace(tzinfo=None))
+
+    # -- writes -----------------------------------------------------------
+
+    def ensure_schema(self, connection):
+        """Create the rollup tables if they do not exist yet."""
+        for statement in ROLLUP_SCHEMA:
+            execute(connection, statement)
+        self._schema_ready = True
+
+    def _upsert(self, connection, rows):
+        """Write complete bucket rows (guild_id, stat_date, counters...)."""
+        execute_many(connection, UPSERT_BUCKET, [dict(zip(BUCKET_FIELDS, row)) for row in rows])
+
+    def refresh_buckets(self, connection, buckets):
+        """Recompute the given (guild_id, stat_date) buckets from bets."""
+        bets = self._bets()
+        buckets = list(buckets)
+        rows = []
+        for offset in range(0, len(buckets), REFRESH_SLOTS):
+            chunk = buckets[offset:offset + REFRESH_SLOTS]
+            params = {}
+            for i in range(REFRESH_SLOTS):
+                guild_id, day = chunk[min(i, len(chunk) - 1)]
+                start, end = self.day_bounds(self.guild_zone(connection, guild_id), day)
+                params.update({f'guild_{i}': guild_id, f'start_{i}': start, f'end_{i}': end})
+            totals = {row['slot']: row for row in fetch_all(connection, BUCKET_TOTALS, params, bets=bets)}
+            for i, (guild_id, day) in enumerate(chunk):
+                # A bucket with no bets left (e.g. all deleted) is written as zeros
+                agg = totals.get(i, {})
+                rows.append((guild_id, day, agg.get('bet_count', 0), agg.get('units', 0),
+                             agg.get('settled_units', 0), agg.get('bettor_count', 0),
+                             agg.get('won_count', 0), agg.get('lost_count', 0)))
+        self._upsert(connection, rows)
+        return len(rows)
+
+    def _get_watermark(self, connection):
+        row = fetch_one(connection, GET_WATERMARK)
+        return row['watermark'] if row else None
+
+    def _set_watermark(self, connection, watermark):
+        execute(connection, SET_WATERMARK, {'watermark': watermark})
+
+    def sync(self, connection):
+        """Apply bets created or settled since the last sync to their buckets."""
+        if not self._schema_ready:
+            self.ensure_schema(connection)
+        watermark = self._get_watermark(connection)
+        if watermark is None:
+            # First sync - fill the win-rate window, older days come from backfill
+            started_at = fetch_one(connection, DB_NOW)['now']
+            written = self.backfill(connection, days=WIN_RATE_DAYS)
+            self._set_watermark(connection, started_at)
+            return written
+
+        refreshed = 0
+        while True:
+            # >= so rows sharing the boundary timestamp are never skipped;
+            # recomputing a bucket twice is harmless
+            batches = [fetch_all(connection, query, {'watermark': watermark, 'limit': SYNC_BATCH_SIZE})
+                       for query in CHANGED_BETS.values()]
+            changed = [row for batch in batches for row in batch]
+            if not changed:
+                break
+
+            buckets = {
+                (row['guild_id'], self.local_date(self.guild_zone(connection, row['guild_id']), row['created_at']))
+                for row in changed if row['created_at']
+            }
+            refreshed += self.refresh_buckets(connection, buckets)
+
+            # A full batch is only complete up to its last row; resume from the
+            # earliest such point so neither column skips rows
+            full = [batch[-1]['changed_at'] for batch in batches if len(batch) == SYNC_BATCH_SIZE]
+            new_watermark = min(full) if full else max(row['changed_at'] for row in changed)
+            if not full or new_watermark == watermark:
+                watermark = new_watermark
+                break
+            watermark = new_watermark
+
+        self._set_watermark(connection, watermark)
+        return refreshed
+
+    def backfill(self, connection, guild_id=None, days=None):
+        """Rebuild buckets from the full bet history (optionally one guild / recent days)."""
+        self.ensure_schema(connection)
+        started_at = fetch_one(connection, DB_NOW)['now']
+
+        conditions, params = [], {}
+        if guild_id is not None:
+            conditions.append("guild_id = :guild_id")
+            params['guild_id'] = guild_id
+        if days is not None:
+            # One extra day so local days straddling the cutoff are complete
+            conditions.append("created_at >= :since")
+            params['since'] = started_at - timedelta(days=days + 1)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        history = fetch_all(connection, BACKFILL_BETS, params, bets=self._bets(), where=where)
+
+        buckets = defaultdict(lambda: {'bet_count': 0, 'units': 0, 'settled_units': 0,
+                                       'bettors': set(), 'won_count': 0, 'lost_count': 0})
+        for bet in history:
+            if not bet['created_at']:
+                continue
+            zone = self.guild_zone(connection, bet['guild_id'])
+            bucket = buckets[(bet['guild_id'], self.local_date(zone, bet['created_at']))]
+            units = bet['units'] or 0
+            bucket['bet_count'] += 1
+            bucket['units'] += units
+            bucket['bettors'].add(bet['user_id'])
+            if bet['outcome'] == 'won':
+                bucket['won_count'] += 1
+                bucket['settled_units'] += units
+            elif bet['outcome'] == 'lost':
+                bucket['lost_count'] += 1
+                bucket['settled_units'] += units
+
+        rows = [
+            (gid, day, b['bet_count'], b['units'], b['settled_units'],
+             len(b['bettors']), b['won_count'], b['lost_count'])
+            for (gid, day), b in buckets.items()
+        ]
+        self._upsert(connection, rows)
+        if guild_id is None and days is None:
+            self._set_watermark(connection, started_at)
+        logger.info(f"Bet rollup backfill wrote {len(rows)} daily buckets")
+        return len(rows)
+
+    # -- reads ------------------------------------------------------------
+
+    def get_stats(self, connection, guild_id):
+        """Today's activity plus the 30-day win rate for one guild."""
+        zone = self.guild_zone(connection, guild_id)
+        today = datetime.now(zone).date()
+
+        rows = fetch_all(connection, GUILD_DAYS, {
+            'guild_id': guild_id,
+            'first_day': today - timedelta(days=WIN_RATE_DAYS),
+            'today': today
+        })
+
+        today_row = next((row for row in rows if row['stat_date'] == today), None)
+        won = sum(row['won_count'] for row in rows)
+        settled = won + sum(row['lost_count'] for row in rows)
+
+        return {
+            'today_bets': today_row['bet_count'] if today_row else 0,
+            'today_units': float(today_row['settled_units']) if today_row else 0,
+            'active_users': today_row['bettor_count'] if today_row else 0,
+            'win_rate': (won / settled) * 100 if settled else 0
+        }
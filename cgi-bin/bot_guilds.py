@@ -0,0 +1,136 @@
+"""
+Set of guilds the bot is active in, shared by every worker through Redis.
+
+The ids live in a Redis set next to a version counter that is bumped on
+every change. Each worker keeps a frozenset snapshot of the set and only
+checks the version (one GET) every few seconds, re-reading the members when
+it moved. Filtering a user's guild list is then a local set lookup.
+
+The set is rebuilt from the database periodically (refresh()) and can be
+updated directly when a guild is activated or deactivated (add/remove), so
+the bot process can publish changes without waiting for the next rebuild.
+
+Key layout:
+    bot_guilds:ids       SET of guild ids (strings)
+    bot_guilds:version   INCR counter, bumped whenever the set changes
+"""
+
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+IDS_KEY = 'bot_guilds:ids'
+VERSION_KEY = 'bot_guilds:version'
+
+
+class BotGuildRegistry:
+    """Versioned, per-worker snapshot of the shared bot guild set."""
+
+    def __init__(self, redis_client, loader, check_interval=5, local_ttl=300):
+        self.redis = redis_client
+        self.loader = loader
+        self.check_interval = check_interval
+        self.local_ttl = local_ttl  # reload interval when running without Redis
+        self._ids = frozenset()
+        self._version = None
+        self._checked_at = 0
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._stats = {'version_checks': 0, 'reloads': 0, 'rebuilds': 0, 'errors': 0}
+
+    # -- writes -----------------------------------------------------------
+
+    def refresh(self):
+        """Rebuild the shared set from the database, bumping the version if it changed."""
+        ids = frozenset(str(guild_id) for guild_id in self.loader())
+        self._stats['rebuilds'] += 1
+        if not self.redis:
+            self._ids, self._checked_at = ids, time.monotonic()
+            return ids
+
+        current = frozenset(self.redis.smembers(IDS_KEY))
+        if ids != current or not self.redis.exists(VERSION_KEY):
+            pipe = self.redis.pipeline(transaction=True)
+            pipe.delete(IDS_KEY)
+            if ids:
+                pipe.sadd(IDS_KEY, *ids)
+            pipe.incr(VERSION_KEY)
+            version = pipe.execute()[-1]
+            logger.info(f"Bot guild set updated to version {version} ({len(ids)} guilds)")
+        self._checked_at = 0  # pick up the new version on the next read
+        return ids
+
+    def _change(self, command, guild_id):
+        pipe = self.redis.pipeline(transaction=True)
+        getattr(pipe, command)(IDS_KEY, str(guild_id))
+        pipe.incr(VERSION_KEY)
+        pipe.execute()
+        self._checked_at = 0
+
+    def add(self, guild_id):
+        """Mark a guild as active without waiting for the next rebuild."""
+        if self.redis:
+            self._change('sadd', guild_id)
+        else:
+            self._ids = self._ids | {str(guild_id)}
+
+    def remove(self, guild_id):
+        """Mark a guild as inactive without waiting for the next rebuild."""
+        if self.redis:
+            self._change('srem', guild_id)
+        else:
+            self._ids = self._ids - {str(guild_id)}
+
+    # -- reads ------------------------------------------------------------
+
+    def _sync_snapshot(self):
+        """Re-read the shared set if its version moved since the last check."""
+        self._stats['version_checks'] += 1
+        version = self.redis.get(VERSION_KEY)
+        if version is None:
+            # Never built (or Redis was flushed) - build it now
+            self.refresh()
+            version = self.redis.get(VERSION_KEY)
+        if version != self._version:
+            self._ids = frozenset(self.redis.smembers(IDS_KEY))
+            self._version = version
+            self._stats['reloads'] += 1
+
+    def snapshot(self):
+        """Frozenset of active bot guild ids, at most check_interval seconds old."""
+        interval = self.check_interval if self.redis else self.local_ttl
+        if time.monotonic() - self._checked_at < interval:
+            return self._ids
+        # Before the first load, wait for it rather than answer with an empty set
+        if not self._lock.acquire(blocking=not self._loaded):
+            return self._ids  # another thread is already syncing
+        try:
+            if self._loaded and time.monotonic() - self._checked_at < interval:
+                return self._ids  # synced while we waited for the lock
+            if self.redis:
+                self._sync_snapshot()
+            else:
+                self.refresh()
+            self._checked_at = time.monotonic()
+            self._loaded = True
+        except Exception as e:
+            # Keep the last snapshot; retry on the next check
+            self._stats['errors'] += 1
+            self._checked_at = time.monotonic()
+            logger.error(f"Error syncing bot guilds: {e}")
+        finally:
+            self._lock.release()
+        return self._ids
+
+    def contains(self, guild_id):
+        return str(guild_id) in self.snapshot()
+
+    def accessible(self, user_guilds):
+        """The user's guilds (Discord guild objects) that the bot is active in."""
+        ids = self.snapshot()
+        return [guild for guild in user_guilds if str(guild['id']) in ids]
+
+    def stats(self):
+        return dict(self._stats, version=self._version, size=len(self._ids))
@@ -0,0 +1,550 @@
+"""
+Two-tier cache: a bounded in-process LRU/TTL tier in front of Redis.
+
+Values are grouped into namespaces, each with its own size limit and TTL.
+A hit in the local tier costs no network round-trip and no decoding; a
+Redis hit is copied into the local tier for the rest of its TTL. None is
+cached as a short-lived negative entry so known-empty lookups stay cheap.
+Values returned from the local tier are shared - treat them as read-only.
+
+get_or_load() protects expensive loaders from stampedes: concurrent misses
+in one process share a single load, workers coordinate through a Redis lock
+with a lease, and entries close to expiry are refreshed early by a single
+caller chosen probabilistically (XFetch) while everyone else keeps reading.
+
+Every entry is also kept as a "last good" copy for stale_ttl seconds past
+its TTL. get_or_load() serves that copy immediately while one background
+revalidation runs, and keeps serving it for as long as the loader fails
+(e.g. while the database is unreachable).
+
+Writes made in one worker reach the others through Redis pub/sub:
+invalidate() and publish_invalidation() broadcast the key, and every worker
+running start_listener() drops its local copy so the next read goes to
+Redis. If the subscription drops, the local tier is cleared on reconnect
+because messages sent in between are lost.
+
+Redis values are encoded with a CacheCodec (typed msgpack with a version
+header), so the Redis client passed in must not decode responses.
+"""
+
+import logging
+import math
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from cache_codec import CacheCodec, CodecError
+
+logger = logging.getLogger(__name__)
+
+MISSING = object()
+
+# Delete the lock only if we still own it (the lease may have expired)
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class _Entry:
+    """A cached value with its freshness deadline, stale deadline and compute time."""
+
+    __slots__ = ('value', 'expires_at', 'stale_until', 'delta')
+
+    def __init__(self, value, expires_at, stale_until, delta):
+        self.value = value
+        self.expires_at = expires_at
+        self.stale_until = stale_until
+        self.delta = delta
+
+    def expired(self, now):
+        return self.expires_at <= now
+
+    def dead(self, now):
+        return self.stale_until <= now
+
+    def should_refresh_early(self, now, beta):
+        """XFetch: volunteer for a refresh with rising probability near expiry."""
+        if not self.delta or beta <= 0:
+            return False
+        return now - self.delta * beta * math.log(random.random() or 1e-12) >= self.expires_at
+
+
+class _Flight:
+    """An in-progress load that other threads in this process can wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = MISSING
+        self.error = None
+
+
+class _Namespace:
+    """Local LRU tier and counters for one cache namespace."""
+
+    def __init__(self, name, max_size, ttl, negative_ttl, stale_ttl):
+        self.name = name
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.stale_ttl = stale_ttl
+        self.entries = OrderedDict()  # key -> _Entry
+        self.lock = threading.Lock()
+        self.stats = {
+            'local_hits': 0,
+            'redis_hits': 0,
+            'misses': 0,
+            'negative_hits': 0,
+            'sets': 0,
+            'evictions': 0,
+            'errors': 0,
+            'decode_errors': 0,
+            'loads': 0,
+            'coalesced': 0,
+            'early_refreshes': 0,
+            'lock_waits': 0,
+            'stale_hits': 0,
+            'revalidations': 0,
+            'revalidation_failures': 0,
+            'refreshes': 0,
+            'invalidations': 0,
+        }
+
+    def get(self, key):
+        """Local entry for key (possibly stale), or None if absent or past its stale window."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry.dead(time.time()):
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry):
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def discard(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def count(self, stat):
+        with self.lock:
+            self.stats[stat] += 1
+
+
+class LayeredCache:
+    """Namespaced cache with an in-process LRU tier backed by Redis."""
+
+    def __init__(self, redis_client, default_ttl=300, local_max_size=512,
+                 negative_ttl=30, jitter=0.1, prefix='cache',
+                 lock_lease=30, lock_wait=5.0, early_refresh_beta=1.0,
+                 stale_ttl=3600, revalidate_workers=2, codec=None):
+        self.redis = redis_client
+        self.codec = codec or CacheCodec()
+        self.default_ttl = default_ttl
+        self.local_max_size = local_max_size
+        self.negative_ttl = negative_ttl
+        self.stale_ttl = stale_ttl
+        self.jitter = jitter
+        self.prefix = prefix
+        self.lock_lease = lock_lease
+        self.lock_wait = lock_wait
+        self.early_refresh_beta = early_refresh_beta
+        self._namespaces = {}
+        self._flights = {}
+        self._revalidating = set()
+        self._revalidator = ThreadPoolExecutor(max_workers=revalidate_workers,
+                                               thread_name_prefix='cache-revalidate')
+        self._lock = threading.Lock()
+        # Called as on_stale(namespace, key, age_seconds) whenever stale data is served
+        self.on_stale = None
+        self.invalidation_channel = f"{prefix}:invalidate"
+        self._origin = uuid.uuid4().hex  # lets the listener skip our own messages
+        self._listener = None
+        self._listener_stop = threading.Event()
+
+    def configure(self, namespace, max_size=None, ttl=None, negative_ttl=None, stale_ttl=None):
+        """Set the size limit, TTL and stale window of a namespace."""
+        with self._lock:
+            self._namespaces[namespace] = _Namespace(
+                namespace,
+                max_size or self.local_max_size,
+                ttl or self.default_ttl,
+                negative_ttl or self.negative_ttl,
+                self.stale_ttl if stale_ttl is None else stale_ttl
+            )
+        return self._namespaces[namespace]
+
+    def _ns(self, namespace):
+        ns = self._namespaces.get(namespace)
+        return ns if ns is not None else self.configure(namespace)
+
+    def _redis_key(self, namespace, key):
+        return f"{self.prefix}:{namespace}:{key}"
+
+    def _jittered(self, ttl):
+        """Shave up to `jitter` off a TTL so keys set together expire apart."""
+        return max(1, int(ttl * (1 - random.random() * self.jitter)))
+
+    # -- basic operations -------------------------------------------------
+
+    def _count_hit(self, ns, entry, tier):
+        if entry.expired(time.time()):
+            ns.count('stale_hits')
+        else:
+            ns.count('negative_hits' if entry.value is None else tier)
+
+    def _lookup_entry(self, namespace, key):
+        """Cached _Entry (fresh or stale) from the local tier or Redis, or None."""
+        ns = self._ns(namespace)
+
+        entry = ns.get(key)
+        if entry is not None and (not entry.expired(time.time()) or not self.redis):
+            self._count_hit(ns, entry, 'local_hits')
+            return entry
+
+        if self.redis:
+            try:
+                raw = self.redis.get(self._redis_key(namespace, key))
+                if raw is not None:
+                    envelope = self.codec.loads(raw)
+                    remote = _Entry(envelope['v'], envelope['x'], envelope['s'], envelope.get('d', 0))
+                    # Another worker may already have revalidated a locally stale key
+                    if entry is None or remote.expires_at > entry.expires_at:
+                        entry = remote
+                        ns.put(key, entry)
+            except CodecError as e:
+                # Unknown format version or corrupt value - treat as a miss
+                ns.count('decode_errors')
+                logger.warning(f"Cache decode error for {namespace}:{key}: {e}")
+            except Exception as e:
+                ns.count('errors')
+                logger.error(f"Cache get error: {e}")
+
+        if entry is not None and not entry.dead(time.time()):
+            self._count_hit(ns, entry, 'redis_hits')
+            return entry
+
+        ns.count('misses')
+        return None
+
+    def lookup(self, namespace, key):
+        """Fresh cached value (None for a negative entry) or MISSING."""
+        entry = self._lookup_entry(namespace, str(key))
+        if entry is None or entry.expired(time.time()):
+            return MISSING
+        return entry.value
+
+    def get(self, namespace, key, default=None):
+        """Cached value, or default on a miss or negative entry."""
+        value = self.lookup(namespace, key)
+        return default if value is MISSING or value is None else value
+
+    def set(self, namespace, key, value, ttl=None, delta=0.0):
+        """Store a value in both tiers; None is stored as a negative entry."""
+        ns = self._ns(namespace)
+        key = str(key)
+        if value is None:
+            ttl = ns.negative_ttl
+        ttl = self._jittered(ttl or ns.ttl)
+
+        now = time.time()
+        entry = _Entry(value, now + ttl, now + ttl + ns.stale_ttl, delta)
+        ns.put(key, entry)
+        ns.count('sets')
+        if not self.redis:
+            return True
+        try:
+            envelope = {'v': value, 'x': entry.expires_at, 's': entry.stale_until, 'd': delta}
+            # Redis keeps the key through the stale window as the last good copy
+            payload = self.codec.dumps(envelope)
+            self.redis.setex(self._redis_key(namespace, key), ttl + ns.stale_ttl, payload)
+            return True
+        except Exception as e:
+            ns.count('errors')
+            logger.error(f"Cache set error: {e}")
+            return False
+
+    def delete(self, namespace, key):
+        """Drop a key from both tiers (other workers keep their local copy until it expires)."""
+        ns = self._ns(namespace)
+        ns.discard(str(key))
+        if self.redis:
+            try:
+                self.redis.delete(self._redis_key(namespace, key))
+            except Exception as e:
+                ns.count('errors')
+                logger.error(f"Cache delete error: {e}")
+
+    # -- cross-worker invalidation ----------------------------------------
+
+    def publish_invalidation(self, namespace, key):
+        """Tell other workers to drop their local copy of a key."""
+        if not self.redis:
+            return
+        try:
+            self.redis.publish(self.invalidation_channel, f"{self._origin}|{namespace}|{key}")
+        except Exception as e:
+            self._ns(namespace).count('errors')
+            logger.error(f"Cache invalidation publish error: {e}")
+
+    def invalidate(self, namespace, key):
+        """Drop a key from both tiers here and from every other worker's local tier."""
+        self.delete(namespace, key)
+        self.publish_invalidation(namespace, key)
+
+    def _handle_invalidation(self, data):
+        if isinstance(data, bytes):
+            data = data.decode()
+        origin, namespace, key = data.split('|', 2)
+        if origin == self._origin:
+            return
+        ns = self._namespaces.get(namespace)
+        if ns is not None:
+            ns.discard(key)
+            ns.count('invalidations')
+
+    def _listen(self):
+        clear_on_connect = False
+        while not self._listener_stop.is_set():
+            pubsub = None
+            try:
+                pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.invalidation_channel)
+                if clear_on_connect:
+                    # Invalidations sent while we were disconnected are lost
+                    for ns in list(self._namespaces.values()):
+                        with ns.lock:
+                            ns.entries.clear()
+                clear_on_connect = True
+                while not self._listener_stop.is_set():
+                    message = pubsub.get_message(timeout=1.0)
+                    if message and message['type'] == 'message':
+                        try:
+                            self._handle_invalidation(message['data'])
+                        except ValueError:
+                            logger.warning(f"Ignoring malformed cache invalidation: {message['data']!r}")
+            except Exception as e:
+                logger.error(f"Cache invalidation listener error: {e}")
+                self._listener_stop.wait(1.0)
+            finally:
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+
+    def start_listener(self):
+        """Subscribe to invalidations in a background thread (no-op if running)."""
+        if not self.redis or (self._listener is not None and self._listener.is_alive()):
+            return
+        with self._lock:
+            if self._listener is not None and self._listener.is_alive():
+                return
+            self._listener_stop.clear()
+            self._listener = threading.Thread(target=self._listen, name='cache-invalidation', daemon=True)
+            self._listener.start()
+
+    def stop_listener(self, timeout=5):
+        self._listener_stop.set()
+        if self._listener is not None:
+            self._listener.join(timeout)
+            self._listener = None
+
+    # -- stampede protection ----------------------------------------------
+
+    def _acquire_lock(self, namespace, key):
+        """Take the cross-worker fill lock; returns a token, True without Redis, or None."""
+        if not self.redis:
+            return True
+        token = uuid.uuid4().hex
+        try:
+            if self.redis.set(f"lock:{self._redis_key(namespace, key)}", token,
+                              nx=True, ex=self.lock_lease):
+                return token
+            return None
+        except Exception as e:
+            logger.error(f"Cache lock error: {e}")
+            return True  # Redis trouble - fall back to loading locally
+
+    def _release_lock(self, namespace, key, token):
+        if token is True or not self.redis:
+            return
+        try:
+            self.redis.eval(_RELEASE_LOCK_SCRIPT, 1, f"lock:{self._redis_key(namespace, key)}", token)
+        except Exception as e:
+            logger.error(f"Cache unlock error: {e}")
+
+    def _load(self, namespace, key, loader, ttl):
+        """Run the loader and store its result, recording how long it took."""
+        ns = self._ns(namespace)
+        ns.count('loads')
+        started = time.time()
+        value = loader()
+        self.set(namespace, key, value, ttl, delta=time.time() - started)
+        return value
+
+    def _fill(self, namespace, key, loader, ttl):
+        """Load under the Redis lock, or wait for the worker that holds it."""
+        ns = self._ns(namespace)
+        token = self._acquire_lock(namespace, key)
+        if token is None:
+            # Another worker is filling this key - poll briefly for its result
+            ns.count('lock_waits')
+            deadline = time.time() + self.lock_wait
+            while time.time() < deadline:
+                time.sleep(0.05)
+                entry = self._lookup_entry(namespace, key)
+                if entry is not None and not entry.expired(time.time()):
+                    return entry.value
+                token = self._acquire_lock(namespace, key)
+                if token is not None:
+                    break
+            # Still nothing (holder died or is slow) - load it ourselves
+        try:
+            return self._load(namespace, key, loader, ttl)
+        finally:
+            if token is not None:
+                self._release_lock(namespace, key, token)
+
+    def _single_flight(self, namespace, key, loader, ttl):
+        """Coalesce concurrent loads of one key within this process."""
+        flight_key = (namespace, key)
+        with self._lock:
+            flight = self._flights.get(flight_key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[flight_key] = _Flight()
+
+        if not leader:
+            self._ns(namespace).count('coalesced')
+            if flight.done.wait(self.lock_wait + 1):
+                if flight.error is not None:
+                    raise flight.error
+                return flight.value
+            # Leader is stuck - stop waiting and load independently
+            return self._fill(namespace, key, loader, ttl)
+
+        try:
+            flight.value = self._fill(namespace, key, loader, ttl)
+            return flight.value
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(flight_key, None)
+            flight.done.set()
+
+    def _refresh_early(self, namespace, key, loader, ttl):
+        """Recompute a still-valid entry unless another worker is already doing it."""
+        token = self._acquire_lock(namespace, key)
+        if token is None:
+            return MISSING
+        try:
+            self._ns(namespace).count('early_refreshes')
+            return self._load(namespace, key, loader, ttl)
+        except Exception as e:
+            logger.warning(f"Early refresh of {namespace}:{key} failed: {e}")
+            return MISSING
+        finally:
+            self._release_lock(namespace, key, token)
+
+    def _revalidate(self, namespace, key, loader, ttl):
+        """Refresh a stale entry in the background (once per key at a time)."""
+        with self._lock:
+            if (namespace, key) in self._revalidating:
+                return
+            self._revalidating.add((namespace, key))
+
+        def run():
+            ns = self._ns(namespace)
+            try:
+                token = self._acquire_lock(namespace, key)
+                if token is None:
+                    return  # another worker is already refreshing it
+                try:
+                    ns.count('revalidations')
+                    self._load(namespace, key, loader, ttl)
+                finally:
+                    self._release_lock(namespace, key, token)
+            except Exception as e:
+                # Keep serving the last good copy until the loader recovers
+                ns.count('revalidation_failures')
+                logger.warning(f"Revalidation of {namespace}:{key} failed, serving stale data: {e}")
+            finally:
+                with self._lock:
+                    self._revalidating.discard((namespace, key))
+
+        try:
+            self._revalidator.submit(run)
+        except RuntimeError:
+            # Executor shut down (interpreter exiting)
+            with self._lock:
+                self._revalidating.discard((namespace, key))
+
+    def get_or_load(self, namespace, key, loader, ttl=None):
+        """Return the cached value, loading it at most once on a miss.
+
+        Stale entries are returned immediately while a background refresh
+        runs. Exceptions from loader() on a cold miss are propagated to every
+        waiting caller and nothing is cached, so callers decide how to degrade.
+        """
+        key = str(key)
+        entry = self._lookup_entry(namespace, key)
+        if entry is None:
+            return self._single_flight(namespace, key, loader, ttl)
+
+        now = time.time()
+        if entry.expired(now):
+            if self.on_stale:
+                self.on_stale(namespace, key, now - entry.expires_at)
+            self._revalidate(namespace, key, loader, ttl)
+            return entry.value
+
+        if entry.should_refresh_early(now, self.early_refresh_beta):
+            refreshed = self._refresh_early(namespace, key, loader, ttl)
+            if refreshed is not MISSING:
+                return refreshed
+        return entry.value
+
+    def reset_local(self):
+        """Drop local entries, in-flight loads and background threads (e.g. after fork)."""
+        self._lock = threading.Lock()
+        self._flights = {}
+        self._revalidating = set()
+        # The listener thread is gone after fork; start_listener() makes a new one
+        self._listener = None
+        self._listener_stop = threading.Event()
+        self._origin = uuid.uuid4().hex
+        # Executor threads do not survive fork - the old pool would never run anything
+        self._revalidator = ThreadPoolExecutor(max_workers=self._revalidator._max_workers,
+                                               thread_name_prefix='cache-revalidate')
+        for ns in self._namespaces.values():
+            ns.lock = threading.Lock()
+            ns.entries.clear()
+
+    def refresh(self, namespace, key, loader, ttl=None):
+        """Recompute and store a key now, regardless of its state (refresh-ahead)."""
+        self._ns(namespace).count('refreshes')
+        return self._load(namespace, str(key), loader, ttl)
+
+    def stats(self):
+        """Hit/miss/eviction counters and local sizes per namespace."""
+        result = {}
+        for name, ns in list(self._namespaces.items()):
+            with ns.lock:
+                result[name] = dict(ns.stats, size=len(ns.entries), max_size=ns.max_size)
+        return result
@@ -0,0 +1,139 @@
+"""
+Binary codec for values stored in the Redis cache.
+
+Payloads round-trip datetime, date, Decimal and bytes (plain JSON cannot
+encode the first three, so those keys were silently never cached). Values
+are packed with msgpack when it is installed, falling back to tagged JSON,
+and large payloads are zlib-compressed.
+
+Every payload starts with a three byte header: MAGIC, the format version
+and a flags byte. Readers reject versions they do not know (the value is
+treated as a cache miss), so workers running different releases can share
+one Redis without misreading each other's entries.
+"""
+
+import json
+import zlib
+from datetime import date, datetime
+from decimal import Decimal
+
+try:
+    import msgpack
+except ImportError:  # optional - tagged JSON is used instead
+    msgpack = None
+
+# 0xC1 is never used by msgpack and is not valid UTF-8, so it cannot be
+# confused with a legacy JSON string value
+MAGIC = b'\xc1'
+FORMAT_VERSION = 1
+
+FLAG_COMPRESSED = 0x01
+FLAG_JSON = 0x02
+
+# msgpack extension type codes
+_EXT_DATETIME = 1
+_EXT_DATE = 2
+_EXT_DECIMAL = 3
+
+
+class CodecError(ValueError):
+    """Raised when a cached payload cannot be decoded."""
+
+
+def _msgpack_default(obj):
+    if isinstance(obj, datetime):
+        return msgpack.ExtType(_EXT_DATETIME, obj.isoformat().encode())
+    if isinstance(obj, date):
+        return msgpack.ExtType(_EXT_DATE, obj.isoformat().encode())
+    if isinstance(obj, Decimal):
+        return msgpack.ExtType(_EXT_DECIMAL, str(obj).encode())
+    raise TypeError(f"Cannot cache value of type {type(obj).__name__}")
+
+
+def _msgpack_ext_hook(code, data):
+    if code == _EXT_DATETIME:
+        return datetime.fromisoformat(data.decode())
+    if code == _EXT_DATE:
+        return date.fromisoformat(data.decode())
+    if code == _EXT_DECIMAL:
+        return Decimal(data.decode())
+    return msgpack.ExtType(code, data)
+
+
+def _json_default(obj):
+    if isinstance(obj, datetime):
+        return {'__t': 'dt', 'v': obj.isoformat()}
+    if isinstance(obj, date):
+        return {'__t': 'd', 'v': obj.isoformat()}
+    if isinstance(obj, Decimal):
+        return {'__t': 'dec', 'v': str(obj)}
+    if isinstance(obj, bytes):
+        return {'__t': 'b', 'v': obj.hex()}
+    raise TypeError(f"Cannot cache value of type {type(obj).__name__}")
+
+
+_JSON_TYPES = {
+    'dt': datetime.fromisoformat,
+    'd': date.fromisoformat,
+    'dec': Decimal,
+    'b': bytes.fromhex,
+}
+
+
+def _json_object_hook(obj):
+    tag = obj.get('__t')
+    if tag in _JSON_TYPES and len(obj) == 2:
+        return _JSON_TYPES[tag](obj['v'])
+    return obj
+
+
+class CacheCodec:
+    """Versioned msgpack/JSON codec with optional zlib compression."""
+
+    def __init__(self, compress_threshold=1024, compress_level=1, use_msgpack=True):
+        self.compress_threshold = compress_threshold
+        self.compress_level = compress_level
+        self.use_msgpack = use_msgpack and msgpack is not None
+
+    def dumps(self, value):
+        """Encode a value into a versioned binary payload."""
+        flags = 0
+        if self.use_msgpack:
+            body = msgpack.packb(value, default=_msgpack_default, use_bin_type=True)
+        else:
+            flags |= FLAG_JSON
+            body = json.dumps(value, default=_json_default, separators=(',', ':')).encode()
+        if self.compress_threshold is not None and len(body) >= self.compress_threshold:
+            body = zlib.compress(body, self.compress_level)
+            flags |= FLAG_COMPRESSED
+        return MAGIC + bytes((FORMAT_VERSION, flags)) + body
+
+    def loads(self, payload):
+        """Decode a payload written by dumps() (or a legacy plain JSON value)."""
+        if isinstance(payload, str):
+            payload = payload.encode()
+        if not payload.startswith(MAGIC):
+            # Written before the codec existed
+            try:
+                return json.loads(payload)
+            except ValueError as e:
+                raise CodecError(f"Unreadable legacy cache value: {e}")
+        if len(payload) < 3:
+            raise CodecError("Truncated cache payload")
+
+        version, flags = payload[1], payload[2]
+        if version != FORMAT_VERSION:
+            raise CodecError(f"Unsupported cache format version {version}")
+        body = payload[3:]
+        try:
+            if flags & FLAG_COMPRESSED:
+                body = zlib.decompress(body)
+            if flags & FLAG_JSON:
+                return json.loads(body, object_hook=_json_object_hook)
+            if msgpack is None:
+                raise CodecError("msgpack payload but msgpack is not installed")
+            return msgpack.unpackb(body, ext_hook=_msgpack_ext_hook, raw=False, strict_map_key=False)
+        except CodecError:
+            raise
+        except Exception as e:
+            raise CodecError(f"Corrupt cache payload: {e}")
@@ -0,0 +1,214 @@
+"""
+Circuit breakers for the database and Redis clients.
+
+A breaker watches the outcome of calls over a sliding time window. When the
+failure rate crosses the threshold it opens and every call fails fast with
+CircuitOpenError instead of waiting on a connect timeout. While open, a
+background thread probes the dependency; once a probe succeeds (or the open
+timeout passes) the breaker goes half-open and lets a few trial calls
+through, closing again on success and re-opening on failure.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose breaker is open."""
+
+
+class CircuitBreaker:
+    """Closed/open/half-open breaker driven by the recent failure rate."""
+
+    def __init__(self, name, failure_threshold=0.5, minimum_calls=5, window=30,
+                 open_timeout=30, half_open_max_calls=1, probe=None, probe_interval=5,
+                 failure_exceptions=(Exception,)):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.minimum_calls = minimum_calls
+        self.window = window
+        self.open_timeout = open_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.probe = probe
+        self.probe_interval = probe_interval
+        self.failure_exceptions = failure_exceptions
+
+        self._state = CLOSED
+        self._opened_at = 0
+        self._half_opened_at = 0
+        self._outcomes = deque()  # (timestamp, succeeded)
+        self._half_open_calls = 0
+        self._prober = None
+        self._lock = threading.Lock()
+        self._stats = {'calls': 0, 'failures': 0, 'rejected': 0, 'opened': 0, 'probes': 0}
+
+    @property
+    def state(self):
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def _trim(self, now):
+        while self._outcomes and self._outcomes[0][0] < now - self.window:
+            self._outcomes.popleft()
+
+    def _maybe_half_open(self):
+        """Time-based OPEN -> HALF_OPEN transition. Caller holds the lock."""
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_timeout:
+            self._to_half_open()
+
+    def _to_half_open(self):
+        self._state = HALF_OPEN
+        self._half_open_calls = 0
+        self._half_opened_at = time.monotonic()
+        logger.info(f"[CIRCUIT] {self.name} half-open, allowing trial calls")
+
+    def _open(self):
+        """Trip the breaker. Caller holds the lock."""
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+        self._stats['opened'] += 1
+        logger.error(f"[CIRCUIT] {self.name} opened - failing fast")
+        if self.probe and (self._prober is None or not self._prober.is_alive()):
+            self._prober = threading.Thread(target=self._probe_loop, name=f"{self.name}-probe", daemon=True)
+            self._prober.start()
+
+    def _probe_loop(self):
+        """Probe the dependency in the background until the breaker leaves OPEN."""
+        while True:
+            time.sleep(self.probe_interval)
+            with self._lock:
+                if self._state != OPEN:
+                    return
+                self._stats['probes'] += 1
+            try:
+                self.probe()
+            except Exception as e:
+                logger.debug(f"[CIRCUIT] {self.name} probe failed: {e}")
+                continue
+            with self._lock:
+                if self._state == OPEN:
+                    self._to_half_open()
+            return
+
+    def allow(self):
+        """Whether a call may proceed right now (counts half-open trial slots)."""
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN:
+                if time.monotonic() - self._half_opened_at >= self.open_timeout:
+                    # Trial calls never reported back - hand out fresh slots
+                    self._to_half_open()
+                if self._half_open_calls < self.half_open_max_calls:
+                    self._half_open_calls += 1
+                    return True
+            self._stats['rejected'] += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._stats['calls'] += 1
+            if self._state == HALF_OPEN:
+                self._state = CLOSED
+                self._outcomes.clear()
+                logger.info(f"[CIRCUIT] {self.name} closed - dependency recovered")
+                return
+            now = time.monotonic()
+            self._outcomes.append((now, True))
+            self._trim(now)
+
+    def record_failure(self):
+        with self._lock:
+            self._stats['calls'] += 1
+            self._stats['failures'] += 1
+            if self._state == HALF_OPEN:
+                self._open()
+                return
+            if self._state == OPEN:
+                return
+            now = time.monotonic()
+            self._outcomes.append((now, False))
+            self._trim(now)
+            failures = sum(1 for _, ok in self._outcomes if not ok)
+            if (len(self._outcomes) >= self.minimum_calls
+                    and failures / len(self._outcomes) >= self.failure_threshold):
+                self._open()
+
+    def call(self, func, *args, **kwargs):
+        """Run func through the breaker, failing fast while it is open."""
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} circuit is open")
+        try:
+            result = func(*args, **kwargs)
+        except self.failure_exceptions:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
+
+    def reset(self):
+        """Forget all history and close the breaker (e.g. in a freshly forked worker)."""
+        with self._lock:
+            self._state = CLOSED
+            self._outcomes.clear()
+            self._half_open_calls = 0
+            self._prober = None
+
+    def snapshot(self):
+        """Current state and counters for status endpoints."""
+        with self._lock:
+            self._maybe_half_open()
+            self._trim(time.monotonic())
+            failures = sum(1 for _, ok in self._outcomes if not ok)
+            return dict(
+                self._stats,
+                state=self._state,
+                window_calls=len(self._outcomes),
+                failure_rate=round(failures / len(self._outcomes), 3) if self._outcomes else 0.0,
+                open_for=round(time.monotonic() - self._opened_at, 1) if self._state == OPEN else 0
+            )
+
+
+class _GuardedPipeline:
+    """Pipeline proxy whose execute() goes through the breaker."""
+
+    def __init__(self, pipeline, breaker):
+        self._pipeline = pipeline
+        self._breaker = breaker
+
+    def execute(self, *args, **kwargs):
+        return self._breaker.call(self._pipeline.execute, *args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._pipeline, name)
+
+
+class GuardedRedis:
+    """Redis client proxy that routes every command through a circuit breaker."""
+
+    def __init__(self, client, breaker):
+        self._client = client
+        self.breaker = breaker
+
+    def pipeline(self, *args, **kwargs):
+        return _GuardedPipeline(self._client.pipeline(*args, **kwargs), self.breaker)
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if not callable(attr):
+            return attr
+
+        def guarded(*args, **kwargs):
+            return self.breaker.call(attr, *args, **kwargs)
+        return guarded
@@ -0,0 +1,305 @@
+"""
+Process-wide database connection pool shared by the web application.
+
+Works for both PostgreSQL (psycopg2) and MySQL (mysql-connector) connections:
+the pool only needs a zero-argument factory that opens a new raw connection.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection could be checked out before the timeout."""
+
+
+class DatabaseUnavailable(Exception):
+    """Raised by loaders when no database connection could be obtained."""
+
+
+def ping_connection(connection):
+    """Return True if a raw MySQL or PostgreSQL connection is still usable."""
+    try:
+        if hasattr(connection, 'is_connected'):
+            # mysql-connector: is_connected() performs a server ping
+            return connection.is_connected()
+        if getattr(connection, 'closed', 0):
+            # psycopg2: non-zero means the connection was closed
+            return False
+        cursor = connection.cursor()
+        try:
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+        finally:
+            cursor.close()
+        return True
+    except Exception:
+        return False
+
+
+class PooledConnection:
+    """Checked-out connection; close() hands it back to the pool."""
+
+    def __init__(self, pool, connection, created_at):
+        self._pool = pool
+        self._connection = connection
+        self._created_at = created_at
+        self._released = False
+
+    @property
+    def raw(self):
+        """The underlying driver connection."""
+        return self._connection
+
+    def is_connected(self):
+        """Report whether the connection is still checked out."""
+        # Liveness is verified by the pool on borrow, so avoid a second ping here
+        return not self._released
+
+    def close(self):
+        """Return the connection to the pool (safe to call more than once)."""
+        if not self._released:
+            self._released = True
+            self._pool.release(self._connection, self._created_at)
+
+    def __getattr__(self, name):
+        if self._released:
+            raise AttributeError(f"Connection already returned to pool ({name})")
+        return getattr(self._connection, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __del__(self):
+        # Safety net for code paths that forget to close the connection
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    """Bounded, thread-safe connection pool with health checks and lifetimes."""
+
+    def __init__(self, connect, name='web_pool', min_size=1, max_size=10,
+                 checkout_timeout=5.0, max_lifetime=1800, health_check=ping_connection):
+        self.name = name
+        self.min_size = min_size
+        self.max_size = max(max_size, 1)
+        self.checkout_timeout = checkout_timeout
+        self.max_lifetime = max_lifetime
+        self._connect = connect
+        self._health_check = health_check
+        self._idle = deque()  # (connection, created_at)
+        self._open = 0
+        self._cond = threading.Condition()
+        self._stats = {
+            'checkouts': 0,
+            'timeouts': 0,
+            'connections_created': 0,
+            'connections_discarded': 0,
+            'health_check_failures': 0,
+            'total_wait_ms': 0.0,
+            'max_wait_ms': 0.0,
+        }
+
+    def _expired(self, created_at):
+        return self.max_lifetime and time.monotonic() - created_at > self.max_lifetime
+
+    def _discard(self, connection):
+        """Close a raw connection and free its slot. Caller holds the lock."""
+        self._open -= 1
+        self._stats['connections_discarded'] += 1
+        self._cond.notify()
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def _create(self):
+        """Open a new raw connection for a slot already reserved by the caller."""
+        try:
+            connection = self._connect()
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._stats['connections_created'] += 1
+        return connection, time.monotonic()
+
+    def warm(self):
+        """Open connections until min_size are available."""
+        while True:
+            with self._cond:
+                if self._open >= self.min_size:
+                    return
+                self._open += 1
+            try:
+                connection, created_at = self._create()
+            except Exception as e:
+                logger.warning(f"Could not pre-open connection for {self.name}: {e}")
+                return
+            with self._cond:
+                self._idle.append((connection, created_at))
+                self._cond.notify()
+
+    def acquire(self, timeout=None):
+        """Check out a healthy connection, waiting up to the checkout timeout."""
+        timeout = self.checkout_timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+
+        while True:
+            candidate = None
+            with self._cond:
+                while not self._idle and self._open >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats['timeouts'] += 1
+                        raise PoolTimeout(f"Timed out after {timeout:.1f}s waiting for a connection from {self.name}")
+                    self._cond.wait(remaining)
+
+                if self._idle:
+                    candidate = self._idle.pop()
+                else:
+                    self._open += 1
+
+            if candidate is None:
+                connection, created_at = self._create()
+                break
+
+            connection, created_at = candidate
+            if self._expired(created_at):
+                with self._cond:
+                    self._discard(connection)
+                continue
+            if self._health_check and not self._health_check(connection):
+                with self._cond:
+                    self._stats['health_check_failures'] += 1
+                    self._discard(connection)
+                continue
+            break
+
+        waited_ms = (time.monotonic() - started) * 1000
+        with self._cond:
+            self._stats['checkouts'] += 1
+            self._stats['total_wait_ms'] += waited_ms
+            self._stats['max_wait_ms'] = max(self._stats['max_wait_ms'], waited_ms)
+        return PooledConnection(self, connection, created_at)
+
+    def release(self, connection, created_at):
+        """Return a raw connection to the idle set, or drop it if unusable."""
+        with self._cond:
+            if self._expired(created_at) or getattr(connection, 'closed', 0):
+                self._discard(connection)
+                return
+            self._idle.append((connection, created_at))
+            self._cond.notify()
+
+    def close_all(self):
+        """Close every idle connection (checked-out ones close on release)."""
+        with self._cond:
+            while self._idle:
+                connection, _ = self._idle.pop()
+                self._discard(connection)
+
+    def reset_after_fork(self):
+        """Forget connections inherited from the parent process.
+
+        Their sockets are shared with the parent, so they are neither used nor
+        closed here (closing would end the parent's session); references are
+        kept so garbage collection does not close them either.
+        """
+        self._cond = threading.Condition()
+        self._inherited = [connection for connection, _ in self._idle]
+        self._idle = deque()
+        self._open = 0
+
+    def stats(self):
+        """Snapshot of pool usage counters."""
+        with self._cond:
+            stats = dict(self._stats)
+            stats['open'] = self._open
+            stats['idle'] = len(self._idle)
+            stats['in_use'] = self._open - len(self._idle)
+        stats['avg_wait_ms'] = round(stats['total_wait_ms'] / stats['checkouts'], 3) if stats['checkouts'] else 0.0
+        stats['name'] = self.name
+        stats['max_size'] = self.max_size
+        return stats
+
+
+class TimedCursor:
+    """Cursor proxy that reports each execute() to its owning session."""
+
+    def __init__(self, cursor, session):
+        self._cursor = cursor
+        self._session = session
+
+    def execute(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return self._cursor.execute(*args, **kwargs)
+        finally:
+            self._session.record_query(time.perf_counter() - started)
+
+    def executemany(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return self._cursor.executemany(*args, **kwargs)
+        finally:
+            self._session.record_query(time.perf_counter() - started)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._cursor.close()
+
+
+class SessionConnection:
+    """One pooled connection shared by every caller within a unit of work.
+
+    close() is a no-op so helpers can keep their usual open/close pattern;
+    the connection only goes back to the pool when release() is called.
+    """
+
+    def __init__(self, pooled, label='-'):
+        self._pooled = pooled
+        self.label = label
+        self.query_count = 0
+        self.db_time = 0.0
+
+    def record_query(self, elapsed):
+        self.query_count += 1
+        self.db_time += elapsed
+
+    def cursor(self, *args, **kwargs):
+        return TimedCursor(self._pooled.cursor(*args, **kwargs), self)
+
+    def is_connected(self):
+        return self._pooled.is_connected()
+
+    def close(self):
+        """Deferred until release() at the end of the unit of work."""
+
+    def release(self):
+        """Return the underlying connection to the pool."""
+        self._pooled.close()
+
+    def __getattr__(self, name):
+        return getattr(self._pooled, name)
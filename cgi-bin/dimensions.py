@@ -0,0 +1,151 @@
+"""
+In-memory lookup tables for the leagues and teams dimension tables.
+
+Both tables are small and practically static, so every worker holds them as
+dicts of compact records and joins game rows against them in memory instead
+of JOINing per request. warm() starts loading them in the background when a
+worker starts; they are reloaded in a background thread once older than ttl,
+and readers keep using the current tables while a reload runs.
+"""
+
+import logging
+import threading
+import time
+
+from queries import fetch_all, register
+
+logger = logging.getLogger(__name__)
+
+
+LEAGUES = register('leagues.all', "SELECT * FROM leagues")
+TEAMS = register('teams.all', "SELECT team_id, team_name, logo_url FROM teams")
+
+
+class League:
+    __slots__ = ('league_id', 'league_name', 'logo_url')
+
+    def __init__(self, league_id, league_name, logo_url=None):
+        self.league_id = league_id
+        self.league_name = league_name
+        self.logo_url = logo_url
+
+
+class Team:
+    __slots__ = ('team_id', 'team_name', 'logo_url')
+
+    def __init__(self, team_id, team_name, logo_url=None):
+        self.team_id = team_id
+        self.team_name = team_name
+        self.logo_url = logo_url
+
+
+class GameView:
+    """A game record joined with its teams (names and logos fall back to the game's own)."""
+
+    __slots__ = ('game', 'home_team', 'away_team')
+
+    def __init__(self, game, home_team, away_team):
+        self.game = game
+        self.home_team = home_team
+        self.away_team = away_team
+
+    @property
+    def home_team_name(self):
+        return self.home_team.team_name if self.home_team else self.game.home_team_name
+
+    @property
+    def away_team_name(self):
+        return self.away_team.team_name if self.away_team else self.game.away_team_name
+
+    @property
+    def home_logo(self):
+        return (self.home_team.logo_url if self.home_team else None) or self.game.home_logo
+
+    @property
+    def away_logo(self):
+        return (self.away_team.logo_url if self.away_team else None) or self.game.away_logo
+
+    def __getattr__(self, name):
+        # Everything else (status, score, game_time, ...) comes from the game
+        return getattr(self.game, name)
+
+
+def load_dimensions(connection):
+    """Read the leagues and teams tables into ({league_id: League}, {team_id: Team})."""
+    leagues = {
+        row['league_id']: League(row['league_id'], row.get('league_name') or row.get('name'),
+                                 row.get('logo_url') or row.get('logo'))
+        for row in fetch_all(connection, LEAGUES)
+    }
+    teams = {row['team_id']: Team(row['team_id'], row['team_name'], row['logo_url'])
+             for row in fetch_all(connection, TEAMS)}
+    return leagues, teams
+
+
+class DimensionCache:
+    """Per-worker leagues/teams lookup tables, refreshed in the background."""
+
+    def __init__(self, loader, ttl=600, load_wait=5):
+        self.loader = loader
+        self.ttl = ttl
+        self.load_wait = load_wait
+        self._leagues = {}
+        self._teams = {}
+        self._loaded_at = None
+        self._refreshing = False
+        self._first_load = threading.Event()
+        self._lock = threading.Lock()
+        self._stats = {'loads': 0, 'failures': 0}
+
+    def _reload(self):
+        try:
+            leagues, teams = self.loader()
+            # Swap both tables at once; readers never see a half-built dict
+            self._leagues, self._teams = leagues, teams
+            self._loaded_at = time.monotonic()
+            self._stats['loads'] += 1
+        except Exception as e:
+            self._stats['failures'] += 1
+            logger.error(f"Error loading leagues/teams: {e}")
+        finally:
+            self._refreshing = False
+            self._first_load.set()
+
+    def refresh_async(self):
+        """Reload the tables in a background thread unless a reload is already running."""
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._reload, name='dimension-refresh', daemon=True).start()
+
+    def warm(self):
+        """Start the first load in the background (no-op once loaded)."""
+        if self._loaded_at is None:
+            self.refresh_async()
+
+    def _ensure_fresh(self):
+        if self._loaded_at is None:
+            # Not loaded yet - wait briefly for the first load so pages have names to show
+            self.refresh_async()
+            self._first_load.wait(self.load_wait)
+        elif time.monotonic() - self._loaded_at > self.ttl:
+            self.refresh_async()
+
+    def league(self, league_id):
+        self._ensure_fresh()
+        return self._leagues.get(league_id)
+
+    def team(self, team_id):
+        self._ensure_fresh()
+        return self._teams.get(team_id)
+
+    def join_games(self, games):
+        """GameViews of game records with their home and away teams looked up."""
+        self._ensure_fresh()
+        teams = self._teams
+        return [GameView(game, teams.get(game.home_team_id), teams.get(game.away_team_id)) for game in games]
+
+    def stats(self):
+        age = None if self._loaded_at is None else int(time.monotonic() - self._loaded_at)
+        return dict(self._stats, leagues=len(self._leagues), teams=len(self._teams), age=age)
@@ -0,0 +1,263 @@
+"""
+Rate-limit-aware Discord REST client.
+
+Runs on an asyncio loop (see background_loop) and shares that loop's aiohttp
+session. Discord's per-route buckets are learnt from the X-RateLimit-*
+response headers: once a bucket is exhausted, further calls on it wait for
+the reset instead of drawing a 429. A 429 that still happens is retried
+after its Retry-After delay, and transient 5xx responses are retried with a
+short backoff.
+
+The current user's guild list and per-member role lookups are cached per
+token for a short TTL, so moving between guild pages does not call Discord
+again. Tokens are never used as cache keys directly, only a hash of them.
+
+The API base URL is configurable so the client can be pointed at a local
+fake Discord server in tests.
+"""
+
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_API_BASE = 'https://discord.com/api'
+RETRY_STATUSES = (500, 502, 503, 504)
+
+
+class DiscordAPIError(Exception):
+    """A Discord API call failed (non-2xx response, timeout or connection error)."""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class RateLimited(DiscordAPIError):
+    """Discord asked us to wait longer than we are willing to."""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message, status=429)
+        self.retry_after = retry_after
+
+
+def token_key(token):
+    """Stable, non-reversible cache key for an access token."""
+    return hashlib.sha256(token.encode()).hexdigest()[:32]
+
+
+class _TTLCache:
+    """Small thread-safe LRU cache with a fixed TTL per entry."""
+
+    def __init__(self, ttl, max_size):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            if item[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return item[1]
+
+    def set(self, key, value):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+
+class _Bucket:
+    """Remaining calls and reset time of one Discord rate limit bucket."""
+
+    __slots__ = ('remaining', 'reset_at')
+
+    def __init__(self):
+        self.remaining = None  # unknown until the first response
+        self.reset_at = 0.0
+
+
+class DiscordClient:
+    """Discord REST client with bucket rate limiting, retries and short-TTL caching."""
+
+    def __init__(self, session_getter, api_base=DEFAULT_API_BASE, timeout=10,
+                 max_retries=2, max_retry_wait=10, guilds_ttl=60, roles_ttl=60,
+                 cache_size=2048):
+        self.session_getter = session_getter
+        self.api_base = api_base.rstrip('/')
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.max_retries = max_retries
+        self.max_retry_wait = max_retry_wait
+        self._guilds_cache = _TTLCache(guilds_ttl, cache_size)
+        self._roles_cache = _TTLCache(roles_ttl, cache_size)
+        self._route_buckets = {}  # route key -> bucket id from X-RateLimit-Bucket
+        self._buckets = {}  # (bucket id or route key, major) -> _Bucket
+        self._global_reset_at = 0.0
+        self._stats = {
+            'requests': 0,
+            'cache_hits': 0,
+            'rate_limit_waits': 0,
+            'rate_limited': 0,
+            'retries': 0,
+            'errors': 0,
+        }
+
+    # -- rate limiting ----------------------------------------------------
+
+    def _bucket(self, route, major):
+        bucket_id = self._route_buckets.get(route, route)
+        return self._buckets.setdefault((bucket_id, major), _Bucket())
+
+    async def _wait_for_bucket(self, route, major):
+        """Sleep until the route's bucket (and the global limit) has room."""
+        now = time.monotonic()
+        wait = max(self._global_reset_at - now, 0)
+        bucket = self._bucket(route, major)
+        if bucket.remaining is not None and bucket.remaining <= 0 and bucket.reset_at > now:
+            wait = max(wait, bucket.reset_at - now)
+        if wait > self.max_retry_wait:
+            self._stats['rate_limited'] += 1
+            raise RateLimited(f"Discord rate limit on {route} resets in {wait:.1f}s", wait)
+        if wait > 0:
+            self._stats['rate_limit_waits'] += 1
+            await asyncio.sleep(wait)
+            bucket.remaining = None
+        elif bucket.remaining is not None:
+            # Reserve the call so concurrent requests don't overdraw the bucket
+            bucket.remaining -= 1
+
+    def _update_bucket(self, route, major, headers):
+        bucket_id = headers.get('X-RateLimit-Bucket')
+        if bucket_id:
+            self._route_buckets[route] = bucket_id
+        bucket = self._bucket(route, major)
+        try:
+            if 'X-RateLimit-Remaining' in headers:
+                bucket.remaining = int(headers['X-RateLimit-Remaining'])
+            if 'X-RateLimit-Reset-After' in headers:
+                bucket.reset_at = time.monotonic() + float(headers['X-RateLimit-Reset-After'])
+        except ValueError:
+            pass
+
+    async def _retry_after(self, response):
+        """Seconds to wait after a 429 (the JSON body is more precise than the header)."""
+        retry_after = response.headers.get('Retry-After', 1)
+        try:
+            body = await response.json(content_type=None)
+            retry_after = body.get('retry_after', retry_after)
+        except Exception:
+            pass
+        try:
+            return float(retry_after)
+        except (TypeError, ValueError):
+            return 1.0
+
+    # -- requests ---------------------------------------------------------
+
+    async def request(self, method, path, route=None, major=None, token=None, **kwargs):
+        """Call the API and return the decoded JSON body, raising DiscordAPIError on failure.
+
+        route is the path template that identifies the rate limit bucket
+        (defaults to path); major is the id the bucket is scoped to.
+        """
+        route = f"{method} {route or path}"
+        if token is not None:
+            kwargs.setdefault('headers', {})['Authorization'] = f'Bearer {token}'
+            # User routes are limited per token
+            major = major or token_key(token)
+        url = f"{self.api_base}{path}"
+
+        for attempt in range(self.max_retries + 1):
+            await self._wait_for_bucket(route, major)
+            self._stats['requests'] += 1
+            try:
+                async with self.session_getter().request(method, url, timeout=self.timeout, **kwargs) as response:
+                    self._update_bucket(route, major, response.headers)
+                    if response.status == 429:
+                        retry_after = await self._retry_after(response)
+                        if response.headers.get('X-RateLimit-Global', '').lower() == 'true':
+                            self._global_reset_at = time.monotonic() + retry_after
+                        else:
+                            bucket = self._bucket(route, major)
+                            bucket.remaining = 0
+                            bucket.reset_at = time.monotonic() + retry_after
+                        if attempt < self.max_retries and retry_after <= self.max_retry_wait:
+                            self._stats['retries'] += 1
+                            continue  # _wait_for_bucket sleeps out the delay
+                        self._stats['rate_limited'] += 1
+                        raise RateLimited(f"Discord rate limited {route} for {retry_after:.1f}s", retry_after)
+                    if response.status in RETRY_STATUSES and attempt < self.max_retries:
+                        self._stats['retries'] += 1
+                        await asyncio.sleep(0.5 * (attempt + 1))
+                        continue
+                    if response.status >= 400:
+                        self._stats['errors'] += 1
+                        raise DiscordAPIError(f"Discord {route} failed: {response.status}", response.status)
+                    return await response.json(content_type=None)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt < self.max_retries:
+                    self._stats['retries'] += 1
+                    await asyncio.sleep(0.5 * (attempt + 1))
+                    continue
+                self._stats['errors'] += 1
+                raise DiscordAPIError(f"Discord {route} failed: {e!r}")
+
+    # -- endpoints --------------------------------------------------------
+
+    async def exchange_code(self, code, client_id, client_secret, redirect_uri):
+        """Exchange an OAuth authorization code for a token payload."""
+        return await self.request('POST', '/oauth2/token', data={
+            'client_id': client_id,
+            'client_secret': client_secret,
+            'grant_type': 'authorization_code',
+            'code': code,
+            'redirect_uri': redirect_uri
+        })
+
+    async def get_current_user(self, token):
+        """The user the token belongs to."""
+        return await self.request('GET', '/users/@me', token=token)
+
+    async def get_current_user_guilds(self, token):
+        """Guilds the token's user is a member of (cached per token)."""
+        key = token_key(token)
+        guilds = self._guilds_cache.get(key)
+        if guilds is not None:
+            self._stats['cache_hits'] += 1
+            return guilds
+        guilds = await self.request('GET', '/users/@me/guilds', token=token)
+        self._guilds_cache.set(key, guilds)
+        return guilds
+
+    async def get_member_roles(self, guild_id, user_id, token):
+        """Role ids of a guild member (cached per token and member)."""
+        key = f"{token_key(token)}:{guild_id}:{user_id}"
+        roles = self._roles_cache.get(key)
+        if roles is not None:
+            self._stats['cache_hits'] += 1
+            return roles
+        member = await self.request('GET', f'/guilds/{guild_id}/members/{user_id}',
+                                    route='/guilds/{guild_id}/members/{user_id}',
+                                    major=str(guild_id), token=token)
+        roles = member.get('roles', [])
+        self._roles_cache.set(key, roles)
+        return roles
+
+    def stats(self):
+        """Request, retry and cache counters for status endpoints."""
+        return dict(self._stats, buckets=len(self._buckets))
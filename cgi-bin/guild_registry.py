@@ -0,0 +1,154 @@
+"""
+In-memory snapshot of guild settings, one per worker.
+
+guild_settings is tiny and rarely changes, so every worker loads all of it
+(plus names from the guilds table) into compact GuildRecord objects and
+answers lookups from memory. A version counter in Redis tells workers when
+to reload: whoever changes settings calls bump() (or runs
+`flask reload-guild-settings`), and every worker notices within
+check_interval seconds. Snapshots are also reloaded after max_age seconds
+in case a writer forgot to bump the version.
+"""
+
+import logging
+import threading
+import time
+
+from queries import fetch_all, register
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'guild_settings:version'
+
+GUILD_SETTINGS = register('guild_settings.all', "SELECT * FROM guild_settings")
+GUILD_NAMES = register('guilds.names', "SELECT guild_id, guild_name FROM guilds")
+
+
+class GuildRecord:
+    """Settings of one guild, as read by the page handlers."""
+
+    __slots__ = ('guild_id', 'guild_name', 'settings_name', 'subscription_level', 'is_active',
+                 'admin_role', 'command_channel', 'embed_channel', 'base_unit_value',
+                 'premium_enabled', 'has_settings')
+
+    def __init__(self, guild_id, guild_name=None, settings_name=None, subscription_level=None,
+                 is_active=False, admin_role=None, command_channel=None, embed_channel=None,
+                 base_unit_value=None, premium_enabled=None, has_settings=False):
+        self.guild_id = guild_id
+        self.guild_name = guild_name
+        self.settings_name = settings_name
+        self.subscription_level = subscription_level
+        self.is_active = is_active
+        self.admin_role = admin_role
+        self.command_channel = command_channel
+        self.embed_channel = embed_channel
+        self.base_unit_value = base_unit_value
+        self.premium_enabled = premium_enabled
+        self.has_settings = has_settings
+
+    @property
+    def display_name(self):
+        """The configured name, or "Guild <last 6 digits>"."""
+        return self.settings_name or f"Guild {str(self.guild_id)[-6:]}"
+
+
+def load_guild_records(connection):
+    """Read guild_settings (and guild names from guilds, if present) into records."""
+    records = {}
+    for row in fetch_all(connection, GUILD_SETTINGS):
+        guild_id = int(row['guild_id'])
+        records[guild_id] = GuildRecord(
+            guild_id,
+            guild_name=row.get('guild_name'),
+            settings_name=row.get('guild_name'),
+            subscription_level=row.get('subscription_level'),
+            is_active=bool(row.get('is_active')),
+            admin_role=row.get('admin_role'),
+            command_channel=row.get('command_channel_1'),
+            embed_channel=row.get('embed_channel_1'),
+            base_unit_value=row.get('base_unit_value'),
+            premium_enabled=row.get('premium_enabled'),
+            has_settings=True
+        )
+    try:
+        for row in fetch_all(connection, GUILD_NAMES):
+            guild_id = int(row['guild_id'])
+            record = records.get(guild_id)
+            if record is None:
+                records[guild_id] = GuildRecord(guild_id, guild_name=row['guild_name'])
+            elif row['guild_name']:
+                record.guild_name = row['guild_name']
+    except Exception as e:
+        # Older schemas keep names only in guild_settings
+        logger.debug(f"guilds table unavailable: {e}")
+    return records
+
+
+class GuildSettingsRegistry:
+    """Per-worker guild settings snapshot invalidated through a Redis version counter."""
+
+    def __init__(self, redis_client, loader, check_interval=5, max_age=300):
+        self.redis = redis_client
+        self.loader = loader
+        self.check_interval = check_interval
+        self.max_age = max_age
+        self._records = {}
+        self._version = None
+        self._loaded_at = 0
+        self._checked_at = 0
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._stats = {'version_checks': 0, 'reloads': 0, 'errors': 0}
+
+    def bump(self):
+        """Tell every worker to reload (call after changing guild_settings)."""
+        self._checked_at = 0
+        self._loaded_at = 0
+        if self.redis:
+            return self.redis.incr(VERSION_KEY)
+
+    def _remote_version(self):
+        if not self.redis:
+            return None
+        self._stats['version_checks'] += 1
+        return self.redis.get(VERSION_KEY)
+
+    def _sync(self):
+        now = time.monotonic()
+        if self._loaded and now - self._checked_at < self.check_interval:
+            return
+        if not self._lock.acquire(blocking=not self._loaded):
+            return  # another thread is syncing; keep using the current snapshot
+        try:
+            now = time.monotonic()
+            if self._loaded and now - self._checked_at < self.check_interval:
+                return
+            try:
+                version = self._remote_version()
+                if not self._loaded or version != self._version or now - self._loaded_at > self.max_age:
+                    self._records = self.loader()
+                    self._version = version
+                    self._loaded_at = now
+                    self._loaded = True
+                    self._stats['reloads'] += 1
+            except Exception as e:
+                self._stats['errors'] += 1
+                logger.error(f"Error loading guild settings: {e}")
+            self._checked_at = now
+        finally:
+            self._lock.release()
+
+    def get(self, guild_id):
+        """GuildRecord for a guild, or None if it has no settings or guilds row."""
+        self._sync()
+        try:
+            return self._records.get(int(guild_id))
+        except (TypeError, ValueError):
+            return None
+
+    def all(self):
+        self._sync()
+        return list(self._records.values())
+
+    def stats(self):
+        return dict(self._stats, version=self._version, size=len(self._records))
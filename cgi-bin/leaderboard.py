@@ -0,0 +1,330 @@
+"""
+Guild leaderboards kept in Redis sorted sets.
+
+For every guild and window (weekly, monthly, all-time) two sorted sets hold
+each bettor's net profit and win count, next to a hash of loss counts. The
+sets are updated incrementally as bets settle and rebuilt from the bets
+table by the refresh scheduler (build_pending) when a guild is first viewed
+and at every period rollover, so a page view never has to GROUP BY a
+guild's history.
+
+Key layout (period is "all", "w2025-31" or "m2025-07"):
+    lb:{guild_id}:{period}:profit   ZSET user_id -> net profit
+    lb:{guild_id}:{period}:wins     ZSET user_id -> wins
+    lb:{guild_id}:{period}:losses   HASH user_id -> losses
+    lb:{guild_id}:{period}:built    marker set once the period is rebuilt
+    lb:{guild_id}:settled           ZSET bet id -> changed_at of bets already counted,
+                                    pruned to the last SETTLED_RETENTION seconds
+    lb:guilds                       SET of guild ids whose leaderboards are kept built
+"""
+
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+
+from queries import DB_NOW, fetch_all, fetch_one, register
+from schema import ASSUMED_SCHEMA, BetColumns
+
+logger = logging.getLogger(__name__)
+
+WINDOWS = ('weekly', 'monthly', 'all')
+METRICS = ('profit', 'wins')
+WATERMARK_KEY = 'lb:watermark'
+GUILDS_KEY = 'lb:guilds'
+SYNC_BATCH_SIZE = 5000
+
+# Bets settled longer ago than this are not re-read by sync() unless they
+# change again; the weekly rollover rebuild corrects any such late change
+SETTLED_RETENTION = 8 * 86400
+
+# Keep finished periods around a little while for "last week" style views
+PERIOD_TTL = {
+    'weekly': 15 * 86400,
+    'monthly': 62 * 86400,
+    'all': None,
+}
+
+# Bet columns used when the engine has no schema registry
+DEFAULT_BETS = BetColumns(ASSUMED_SCHEMA['bets'])
+
+GUILD_TOTALS = register('leaderboard.guild_totals', """
+    SELECT
+        user_id,
+        SUM(CASE WHEN {bets.won} THEN 1 ELSE 0 END) as wins,
+        SUM(CASE WHEN {bets.lost} THEN 1 ELSE 0 END) as losses,
+        COALESCE(SUM({bets.profit}), 0) as profit,
+        SUM(CASE WHEN {bets.won} AND created_at >= :week_start THEN 1 ELSE 0 END) as week_wins,
+        SUM(CASE WHEN {bets.lost} AND created_at >= :week_start THEN 1 ELSE 0 END) as week_losses,
+        COALESCE(SUM(CASE WHEN created_at >= :week_start THEN {bets.profit} ELSE 0 END), 0) as week_profit,
+        SUM(CASE WHEN {bets.won} AND created_at >= :month_start THEN 1 ELSE 0 END) as month_wins,
+        SUM(CASE WHEN {bets.lost} AND created_at >= :month_start THEN 1 ELSE 0 END) as month_losses,
+        COALESCE(SUM(CASE WHEN created_at >= :month_start THEN {bets.profit} ELSE 0 END), 0) as month_profit
+    FROM bets
+    WHERE guild_id = :guild_id AND {bets.settled}
+    GROUP BY user_id
+""")
+GUILD_SETTLED_IDS = register('leaderboard.guild_settled_ids', """
+    SELECT bet_serial, COALESCE(updated_at, created_at) as changed_at FROM bets
+    WHERE guild_id = :guild_id AND {bets.settled} AND COALESCE(updated_at, created_at) >= :since
+""")
+SETTLED_SINCE = register('leaderboard.settled_since', """
+    SELECT bet_serial, guild_id, user_id, {bets.outcome} as outcome, {bets.profit} as profit_loss,
+           created_at, COALESCE(updated_at, created_at) as changed_at
+    FROM bets
+    WHERE (updated_at >= :watermark OR created_at >= :watermark) AND {bets.settled}
+    ORDER BY changed_at
+    LIMIT :limit
+""")
+
+
+def period_of(window, when):
+    """Period identifier of a timestamp for the given window."""
+    if window == 'weekly':
+        year, week, _ = when.isocalendar()
+        return f"w{year}-{week:02d}"
+    if window == 'monthly':
+        return f"m{when.year}-{when.month:02d}"
+    return 'all'
+
+
+def period_start(window, when):
+    """First instant of the period containing `when` (None for all-time)."""
+    day = datetime(when.year, when.month, when.day)
+    if window == 'weekly':
+        return day - timedelta(days=day.weekday())
+    if window == 'monthly':
+        return day.replace(day=1)
+    return None
+
+
+def _score(when):
+    """Sorted-set score of a naive DB timestamp."""
+    return when.replace(tzinfo=timezone.utc).timestamp()
+
+
+class LeaderboardEngine:
+    """Reads and maintains the per-guild leaderboard sorted sets."""
+
+    def __init__(self, redis_client, clock=datetime.utcnow, min_bets=3, schema=None):
+        self.redis = redis_client
+        self.schema = schema
+        self.clock = clock
+        self.min_bets = min_bets
+
+    def _bets(self):
+        return self.schema.bets() if self.schema else DEFAULT_BETS
+
+    def _key(self, guild_id, period, suffix):
+        return f"lb:{guild_id}:{period}:{suffix}"
+
+    # -- writes -----------------------------------------------------------
+
+    def _add_to_period(self, pipe, guild_id, window, period, user_id, won, profit):
+        """Queue the increments for one settled bet in one period."""
+        user_id = str(user_id)
+        wins_key = self._key(guild_id, period, 'wins')
+        profit_key = self._key(guild_id, period, 'profit')
+        losses_key = self._key(guild_id, period, 'losses')
+        pipe.zincrby(wins_key, 1 if won else 0, user_id)
+        pipe.zincrby(profit_key, float(profit or 0), user_id)
+        if not won:
+            pipe.hincrby(losses_key, user_id, 1)
+        ttl = PERIOD_TTL[window]
+        if ttl:
+            for key in (wins_key, profit_key, losses_key):
+                pipe.expire(key, ttl)
+
+    def record_settlement(self, guild_id, bet_id, user_id, won, profit, created_at, changed_at):
+        """Count a settled bet once in every window it belongs to."""
+        if not self.redis.zadd(f"lb:{guild_id}:settled", {str(bet_id): _score(changed_at)}, nx=True):
+            return False  # already counted (re-settled or seen by another worker)
+        pipe = self.redis.pipeline(transaction=False)
+        for window in WINDOWS:
+            self._add_to_period(pipe, guild_id, window, period_of(window, created_at), user_id, won, profit)
+        pipe.execute()
+        return True
+
+    def rebuild(self, connection, guild_id):
+        """Recompute every window for a guild from the bets table."""
+        now = self.clock()
+        week_start = period_start('weekly', now)
+        month_start = period_start('monthly', now)
+
+        bets = self._bets()
+        rows = fetch_all(connection, GUILD_TOTALS,
+                         {'guild_id': guild_id, 'week_start': week_start, 'month_start': month_start}, bets=bets)
+        # Only recently changed bets can come back through sync()
+        since = fetch_one(connection, DB_NOW)['now'] - timedelta(seconds=SETTLED_RETENTION)
+        settled = {str(row['bet_serial']): _score(row['changed_at'])
+                   for row in fetch_all(connection, GUILD_SETTLED_IDS,
+                                        {'guild_id': guild_id, 'since': since}, bets=bets)}
+
+        columns = {'all': '', 'weekly': 'week_', 'monthly': 'month_'}
+        pipe = self.redis.pipeline(transaction=True)
+        for window, prefix in columns.items():
+            period = period_of(window, now)
+            wins = {}
+            profit = {}
+            losses = {}
+            for row in rows:
+                if not (row[f'{prefix}wins'] or row[f'{prefix}losses']):
+                    continue
+                user_id = str(row['user_id'])
+                wins[user_id] = int(row[f'{prefix}wins'] or 0)
+                profit[user_id] = float(row[f'{prefix}profit'] or 0)
+                if row[f'{prefix}losses']:
+                    losses[user_id] = int(row[f'{prefix}losses'])
+
+            for suffix, mapping in (('wins', wins), ('profit', profit), ('losses', losses)):
+                key = self._key(guild_id, period, suffix)
+                pipe.delete(key)
+                if mapping and suffix == 'losses':
+                    pipe.hset(key, mapping=mapping)
+                elif mapping:
+                    pipe.zadd(key, mapping)
+                if PERIOD_TTL[window]:
+                    pipe.expire(key, PERIOD_TTL[window])
+            pipe.set(self._key(guild_id, period, 'built'), int(time.time()), ex=PERIOD_TTL[window])
+
+        settled_key = f"lb:{guild_id}:settled"
+        pipe.delete(settled_key)
+        settled_ids = list(settled)
+        for start in range(0, len(settled_ids), 1000):
+            pipe.zadd(settled_key, {bet_id: settled[bet_id] for bet_id in settled_ids[start:start + 1000]})
+        pipe.expire(settled_key, SETTLED_RETENTION)
+        pipe.sadd(GUILDS_KEY, str(guild_id))
+        pipe.execute()
+        logger.info(f"Rebuilt leaderboards for guild {guild_id} ({len(rows)} bettors)")
+
+    def is_built(self, guild_id, window):
+        """True once the guild's current period of the window has been built."""
+        period = period_of(window, self.clock())
+        return bool(self.redis.exists(self._key(guild_id, period, 'built')))
+
+    def request_build(self, guild_id):
+        """Have build_pending() build (and from then on keep built) a guild's leaderboards."""
+        self.redis.sadd(GUILDS_KEY, str(guild_id))
+
+    def build_pending(self, connection):
+        """Rebuild every tracked guild whose current periods are not built yet.
+
+        Run from the refresh scheduler, so new guilds and period rollovers
+        are rebuilt in the background instead of on a page view.
+        """
+        built = 0
+        for guild_id in self.redis.smembers(GUILDS_KEY):
+            if not all(self.is_built(guild_id, window) for window in WINDOWS):
+                self.rebuild(connection, guild_id)
+                built += 1
+        return built
+
+    def sync(self, connection):
+        """Apply bets settled since the last sync to their guild leaderboards."""
+        watermark = self.redis.get(WATERMARK_KEY)
+        if watermark is None:
+            # Nothing to catch up on - history is loaded by rebuild() on demand
+            self.redis.set(WATERMARK_KEY, fetch_one(connection, DB_NOW)['now'].isoformat())
+            return 0
+
+        watermark = datetime.fromisoformat(watermark)
+        bets = self._bets()
+        applied = 0
+        while True:
+            settled = fetch_all(connection, SETTLED_SINCE,
+                                {'watermark': watermark, 'limit': SYNC_BATCH_SIZE}, bets=bets)
+            if not settled:
+                break
+            guilds = set()
+            for bet in settled:
+                guilds.add(bet['guild_id'])
+                if bet['created_at'] and self.record_settlement(
+                        bet['guild_id'], bet['bet_serial'], bet['user_id'],
+                        bet['outcome'] == 'won', bet['profit_loss'], bet['created_at'], bet['changed_at']):
+                    applied += 1
+            self._prune_settled(guilds, settled[-1]['changed_at'])
+            new_watermark = settled[-1]['changed_at']
+            if new_watermark == watermark or len(settled) < SYNC_BATCH_SIZE:
+                watermark = new_watermark
+                break
+            watermark = new_watermark
+
+        self.redis.set(WATERMARK_KEY, watermark.isoformat())
+        return applied
+
+    def _prune_settled(self, guild_ids, watermark):
+        """Forget counted bets older than the retention window behind the watermark."""
+        cutoff = _score(watermark) - SETTLED_RETENTION
+        pipe = self.redis.pipeline(transaction=False)
+        for guild_id in guild_ids:
+            key = f"lb:{guild_id}:settled"
+            pipe.zremrangebyscore(key, '-inf', f"({cutoff}")
+            pipe.expire(key, SETTLED_RETENTION)
+        pipe.execute()
+
+    # -- reads ------------------------------------------------------------
+
+    def _entries(self, guild_id, period, user_ids):
+        """Full stat rows for the given users, in the given order."""
+        if not user_ids:
+            return []
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.zmscore(self._key(guild_id, period, 'wins'), user_ids)
+        pipe.zmscore(self._key(guild_id, period, 'profit'), user_ids)
+        pipe.hmget(self._key(guild_id, period, 'losses'), user_ids)
+        wins, profits, losses = pipe.execute()
+
+        entries = []
+        for user_id, win, profit, loss in zip(user_ids, wins, profits, losses):
+            win = int(win or 0)
+            loss = int(loss or 0)
+            total = win + loss
+            entries.append({
+                'user_id': user_id,
+                'total_bets': total,
+                'wins': win,
+                'losses': loss,
+                'win_rate': round(win * 100.0 / total, 1) if total else None,
+                'net_profit': round(profit or 0, 2)
+            })
+        return entries
+
+    def _qualified(self, guild_id, period, metric, stop=None, page=100):
+        """Entries with at least min_bets settled bets, best first, up to rank `stop` (exclusive)."""
+        key = self._key(guild_id, period, metric)
+        start = 0
+        while stop is None or start < stop:
+            end = start + page - 1 if stop is None else min(start + page, stop) - 1
+            user_ids = self.redis.zrevrange(key, start, end)
+            if not user_ids:
+                return
+            for entry in self._entries(guild_id, period, user_ids):
+                if entry['total_bets'] >= self.min_bets:
+                    yield entry
+            start += page
+
+    def top(self, guild_id, window='all', metric='profit', limit=10):
+        """Top bettors by metric, skipping anyone below min_bets settled bets."""
+        period = period_of(window, self.clock())
+        results = []
+        for entry in self._qualified(guild_id, period, metric, page=max(limit * 2, 20)):
+            results.append(entry)
+            if len(results) == limit:
+                break
+        return results
+
+    def rank(self, guild_id, user_id, window='all', metric='profit'):
+        """1-based position of a user among the bettors top() lists (None if unranked)."""
+        period = period_of(window, self.clock())
+        user_id = str(user_id)
+        if self._entries(guild_id, period, [user_id])[0]['total_bets'] < self.min_bets:
+            return None
+        position = self.redis.zrevrank(self._key(guild_id, period, metric), user_id)
+        if position is None:
+            return None
+        # Count only the qualifying bettors ahead, as top() shows them
+        return sum(1 for _ in self._qualified(guild_id, period, metric, stop=position, page=500)) + 1
+
+    def user_entry(self, guild_id, user_id, window='all'):
+        """One user's leaderboard row for the given window."""
+        period = period_of(window, self.clock())
+        return self._entries(guild_id, period, [str(user_id)])[0]
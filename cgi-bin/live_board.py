@@ -0,0 +1,284 @@
+"""
+In-process live board: recent games held as compact records.
+
+Each worker keeps the games of the last few days as GameRecord objects
+(__slots__, score JSON parsed once on ingest), indexed by league and by
+status. sync() pulls only rows whose updated_at moved past the last
+watermark, so keeping the board current costs one small query; a full
+reload runs on the first sync, every full_sync_interval seconds (to drop
+rows deleted from the table) and whenever the games table has no
+updated_at column.
+
+Reads never copy: board() and league_games() return prebuilt tuples and
+lists of the shared records, rebuilt only after a sync changed something
+(or, for board(), once its oldest game ages out of the board_days window).
+Records are replaced, never modified, so a view handed out earlier stays
+consistent. Treat everything returned as read-only.
+"""
+
+import json
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+
+from queries import fetch_all, register
+
+logger = logging.getLogger(__name__)
+
+BOARD_STATUSES = ('live', 'halftime', 'scheduled', 'finished')
+
+GAME_COLUMNS = """
+    id as game_id,
+    api_game_id,
+    league_id,
+    league_name,
+    home_team_id,
+    away_team_id,
+    home_team_name,
+    away_team_name,
+    home_team_logo,
+    away_team_logo,
+    start_time,
+    status,
+    score
+"""
+
+GAMES_CHANGED = register('games.changed_since', f"""
+    SELECT {GAME_COLUMNS}, updated_at
+    FROM games
+    WHERE updated_at >= :watermark AND start_time >= :since
+    ORDER BY updated_at
+""")
+GAMES_WINDOW_TRACKED = register('games.window_tracked', f"""
+    SELECT {GAME_COLUMNS}, updated_at
+    FROM games
+    WHERE start_time >= :since
+""")
+GAMES_WINDOW = register('games.window', f"""
+    SELECT {GAME_COLUMNS}
+    FROM games
+    WHERE start_time >= :since
+""")
+
+
+def parse_score(raw):
+    """{'home': n, 'away': n} from the score JSON column, or None."""
+    if not raw:
+        return None
+    try:
+        score = json.loads(raw) if isinstance(raw, (str, bytes)) else raw
+    except ValueError:
+        return None
+    if not isinstance(score, dict):
+        return None
+    return {'home': score.get('home', 0), 'away': score.get('away', 0)}
+
+
+class GameRecord:
+    """One game as shown on the live boards."""
+
+    __slots__ = ('game_id', 'api_game_id', 'league_id', 'league_name', 'home_team_id', 'away_team_id',
+                 'home_team_name', 'away_team_name', 'home_logo', 'away_logo', 'start_time',
+                 'status', 'score', 'updated_at')
+
+    def __init__(self, row):
+        self.game_id = row['game_id']
+        self.api_game_id = row.get('api_game_id')
+        self.league_id = row['league_id']
+        self.league_name = row.get('league_name')
+        self.home_team_id = row.get('home_team_id')
+        self.away_team_id = row.get('away_team_id')
+        self.home_team_name = row.get('home_team_name')
+        self.away_team_name = row.get('away_team_name')
+        self.home_logo = row.get('home_team_logo')
+        self.away_logo = row.get('away_team_logo')
+        self.start_time = row.get('start_time')
+        self.status = row.get('status')
+        self.score = parse_score(row.get('score'))
+        self.updated_at = row.get('updated_at')
+
+    @property
+    def game_time(self):
+        return self.start_time
+
+    def as_dict(self):
+        """The game in the get_live_games() JSON shape."""
+        return {
+            'game_id': self.game_id,
+            'home_team_name': self.home_team_name,
+            'home_logo': self.home_logo,
+            'away_team_name': self.away_team_name,
+            'away_logo': self.away_logo,
+            'start_time': self.start_time,
+            'status': self.status,
+            'score': self.score
+        }
+
+
+class LiveBoardEngine:
+    """Per-worker index of recent games, kept current from the games table."""
+
+    def __init__(self, window_days=7, board_days=1, board_limit=50, sync_interval=5,
+                 full_sync_interval=600, clock=datetime.utcnow):
+        self.window_days = window_days
+        self.board_days = board_days
+        self.board_limit = board_limit
+        self.sync_interval = sync_interval
+        self.full_sync_interval = full_sync_interval
+        self.clock = clock
+        self.incremental = True  # switched off if games has no updated_at
+        self._games = {}  # game_id -> GameRecord
+        self._by_league = {}  # league_id -> {game_id: GameRecord}
+        self._by_status = {}  # status -> {game_id: GameRecord}
+        self._watermark = None
+        self._last_sync = 0
+        self._last_full_sync = 0
+        self._synced_at = None  # wall clock of the last successful sync
+        self._loaded = False
+        self._board = ()
+        self._board_built = False
+        self._board_expires_at = None  # when the oldest game on the board leaves the window
+        self._league_views = {}
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._stats = {'syncs': 0, 'full_syncs': 0, 'rows': 0, 'failures': 0}
+
+    # -- ingest -----------------------------------------------------------
+
+    def _index(self, record):
+        previous = self._games.get(record.game_id)
+        if previous is not None:
+            self._by_league.get(previous.league_id, {}).pop(record.game_id, None)
+            self._by_status.get(previous.status, {}).pop(record.game_id, None)
+        self._games[record.game_id] = record
+        self._by_league.setdefault(record.league_id, {})[record.game_id] = record
+        self._by_status.setdefault(record.status, {})[record.game_id] = record
+
+    def _prune(self, since):
+        for game_id in [g for g, record in self._games.items()
+                        if record.start_time is not None and record.start_time < since]:
+            record = self._games.pop(game_id)
+            self._by_league.get(record.league_id, {}).pop(game_id, None)
+            self._by_status.get(record.status, {}).pop(game_id, None)
+
+    def _fetch(self, connection, since, watermark):
+        """(rows, full): changed rows since the watermark, or every row in the window."""
+        if self.incremental:
+            try:
+                if watermark is not None:
+                    return fetch_all(connection, GAMES_CHANGED, {'watermark': watermark, 'since': since}), False
+                return fetch_all(connection, GAMES_WINDOW_TRACKED, {'since': since}), True
+            except Exception as e:
+                logger.warning(f"games.updated_at unavailable, live board will reload fully: {e}")
+                self.incremental = False
+        return fetch_all(connection, GAMES_WINDOW, {'since': since}), True
+
+    def sync(self, connection):
+        """Apply changed games (or reload all of them) from the database."""
+        now = time.monotonic()
+        since = self.clock() - timedelta(days=self.window_days)
+        full_due = not self._loaded or now - self._last_full_sync >= self.full_sync_interval
+        rows, full = self._fetch(connection, since, None if full_due else self._watermark)
+
+        records = [GameRecord(row) for row in rows]
+        with self._lock:
+            if full:
+                self._games, self._by_league, self._by_status = {}, {}, {}
+                self._last_full_sync = now
+                self._stats['full_syncs'] += 1
+            else:
+                # updated_at >= watermark re-reads the newest rows; skip the unchanged ones
+                records = [record for record in records
+                           if record.game_id not in self._games
+                           or self._games[record.game_id].updated_at != record.updated_at]
+            for record in records:
+                self._index(record)
+            before = len(self._games)
+            self._prune(since)
+            if records or full or before != len(self._games):
+                self._board_built = False
+                self._league_views = {}
+            watermarks = [record.updated_at for record in records if record.updated_at is not None]
+            if watermarks:
+                newest = max(watermarks)
+                self._watermark = newest if full or self._watermark is None else max(self._watermark, newest)
+            self._loaded = True
+            self._synced_at = self.clock()
+            self._stats['syncs'] += 1
+            self._stats['rows'] += len(records)
+        return len(records)
+
+    def sync_if_due(self, connection_factory):
+        """Sync at most once per sync_interval; only the first load makes callers wait."""
+        if self._loaded and time.monotonic() - self._last_sync < self.sync_interval:
+            return
+        if not self._sync_lock.acquire(blocking=not self._loaded):
+            return
+        try:
+            if self._loaded and time.monotonic() - self._last_sync < self.sync_interval:
+                return
+            self._last_sync = time.monotonic()
+            connection = connection_factory()
+            if not connection:
+                raise ConnectionError("No database connection")
+            try:
+                self.sync(connection)
+            finally:
+                connection.close()
+        except Exception as e:
+            # Keep serving the last board; retry on the next interval
+            self._stats['failures'] += 1
+            logger.error(f"Live board sync failed: {e}")
+        finally:
+            self._sync_lock.release()
+
+    # -- views ------------------------------------------------------------
+
+    def board(self):
+        """Games of the last board_days grouped by league, as get_live_games() returns them."""
+        with self._lock:
+            now = self.clock()
+            if not self._board_built or (self._board_expires_at is not None and now >= self._board_expires_at):
+                since = now - timedelta(days=self.board_days)
+                games = [record for status in BOARD_STATUSES
+                         for record in self._by_status.get(status, {}).values()
+                         if record.start_time is None or record.start_time >= since]
+                games.sort(key=lambda record: (record.start_time is None, record.start_time or since))
+                leagues = {}
+                for record in games[:self.board_limit]:
+                    league = leagues.get(record.league_id)
+                    if league is None:
+                        league = leagues[record.league_id] = {
+                            'id': record.league_id,
+                            'name': record.league_name or f"League {record.league_id}",
+                            'logo': None,  # No league logo in current schema
+                            'games': []
+                        }
+                    league['games'].append(record)
+                self._board = tuple(leagues.values())
+                self._board_built = True
+                starts = [record.start_time for record in games if record.start_time is not None]
+                self._board_expires_at = min(starts) + timedelta(days=self.board_days) if starts else None
+            return self._board
+
+    def league_games(self, league_id):
+        """All held games of a league, newest first."""
+        with self._lock:
+            view = self._league_views.get(league_id)
+            if view is None:
+                view = sorted(self._by_league.get(league_id, {}).values(),
+                              key=lambda record: record.start_time or datetime.min, reverse=True)
+                self._league_views[league_id] = view
+            return view
+
+    def age(self):
+        """Seconds since the last successful sync (None before the first)."""
+        if self._synced_at is None:
+            return None
+        return (self.clock() - self._synced_at).total_seconds()
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, games=len(self._games), leagues=len(self._by_league),
+                        incremental=self.incremental, watermark=str(self._watermark))
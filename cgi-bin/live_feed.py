@@ -0,0 +1,341 @@
+"""
+Live game updates pushed to browsers as Server-Sent Events.
+
+Whichever worker refreshes the live board (the refresh scheduler's leader)
+calls publish_board(). The new board is compared with the current one, and
+only the games whose score or status changed, new games and removed game ids
+go out as one event with the next board version (a Redis INCR counter, so
+versions are monotonic across workers).
+
+Each event is published on a Redis channel and appended to a short history
+list, and the full board is stored as a snapshot. Every worker runs one
+listener thread that applies events to its copy of the board and fans them
+out to its connected streams through per-client queues.
+
+The same versions drive the polling API: changes_since(version) merges the
+events after a client's version into one delta.
+
+stream() serves a subscriber from a blocking server thread; the live_stream
+server runs the same feed under asyncio, so an open stream costs no thread.
+
+A browser that reconnects sends Last-Event-ID. It gets the events it missed
+from the in-process backlog (or the Redis history), or a full snapshot if it
+fell too far behind. A version gap seen by the listener (e.g. after a
+dropped subscription) also resyncs from the snapshot.
+
+Key layout:
+    live_games:version    INCR counter, the id of the latest event
+    live_games:snapshot   JSON {"version": n, "games": {...}}
+    live_games:history    LIST of recent events (JSON), newest first
+    live_games:events     pub/sub channel carrying each event
+"""
+
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'live_games:version'
+SNAPSHOT_KEY = 'live_games:snapshot'
+HISTORY_KEY = 'live_games:history'
+CHANNEL = 'live_games:events'
+
+# Fields that make up a game update on the wire; the rest only changes on reschedule
+DELTA_FIELDS = ('status', 'score')
+
+
+def flatten_board(leagues):
+    """Turn the grouped get_live_games() payload (dicts or GameRecords) into {game_id: game dict}."""
+    games = {}
+    for league in leagues:
+        for game in league['games']:
+            record = dict(game.as_dict() if hasattr(game, 'as_dict') else game,
+                          league_id=league['id'], league_name=league['name'])
+            start_time = record.get('start_time')
+            if hasattr(start_time, 'isoformat'):
+                record['start_time'] = start_time.isoformat()
+            games[str(record['game_id'])] = record
+    return games
+
+
+def sse_frame(event):
+    """One event as a Server-Sent Events frame."""
+    return f"id: {event['version']}\nevent: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+
+def diff_games(old, new):
+    """(changed, removed): games that are new or whose score/status moved, and ids that left."""
+    changed = {}
+    for game_id, game in new.items():
+        previous = old.get(game_id)
+        if previous is None:
+            changed[game_id] = game
+        elif any(previous.get(field) != game.get(field) for field in DELTA_FIELDS):
+            changed[game_id] = {'game_id': game['game_id'], **{field: game.get(field) for field in DELTA_FIELDS}}
+    removed = [game_id for game_id in old if game_id not in new]
+    return changed, removed
+
+
+class Subscriber:
+    """One connected event stream."""
+
+    def __init__(self, queue_size):
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.overflowed = False
+
+    def push(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            # Too slow to keep up - end the stream; the browser resumes from its last id
+            self.overflowed = True
+
+
+class LiveFeed:
+    """Versioned live board with cross-worker fan-out to SSE subscribers."""
+
+    def __init__(self, redis_client, history_size=200, max_clients=50, queue_size=64):
+        self.redis = redis_client
+        self.history_size = history_size
+        self.max_clients = max_clients
+        self.queue_size = queue_size
+        self.version = 0
+        self._games = {}
+        self._backlog = deque(maxlen=history_size)  # recent events, oldest first
+        self._subscribers = set()
+        self._loaded = False
+        self._lock = threading.RLock()
+        self._listener = None
+        self._stop = threading.Event()
+        self._stats = {'published': 0, 'received': 0, 'resyncs': 0, 'overflows': 0, 'rejected': 0}
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        """Forget the parent's listener thread, streams and lock in a forked child."""
+        self._listener = None
+        self._subscribers = set()
+        self._loaded = False
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+
+    # -- state ------------------------------------------------------------
+
+    def _load_snapshot(self):
+        """Replace local state with the shared snapshot (caller holds the lock)."""
+        raw = self.redis.get(SNAPSHOT_KEY) if self.redis else None
+        if raw:
+            snapshot = json.loads(raw)
+            self.version = snapshot['version']
+            self._games = snapshot['games']
+            self._backlog.clear()
+        self._loaded = True
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if not self._loaded:
+                try:
+                    self._load_snapshot()
+                except Exception as e:
+                    logger.error(f"Error loading live board snapshot: {e}")
+
+    def snapshot_event(self):
+        with self._lock:
+            return {'type': 'snapshot', 'version': self.version, 'games': list(self._games.values())}
+
+    def _apply(self, event):
+        """Apply an event to local state and fan it out (caller holds the lock)."""
+        if event['version'] <= self.version:
+            return  # already applied (our own publish, or a replay)
+        if self._loaded and self.version and event['version'] != self.version + 1:
+            # Missed events - the snapshot is at least as new as this event
+            self._stats['resyncs'] += 1
+            self._load_snapshot()
+            reset = self.snapshot_event()
+            for subscriber in list(self._subscribers):
+                subscriber.push(reset)
+            return
+        for game_id in event['removed']:
+            self._games.pop(game_id, None)
+        for game_id, game in event['changed'].items():
+            self._games[game_id] = dict(self._games.get(game_id, {}), **game)
+        self.version = event['version']
+        self._backlog.append(event)
+        for subscriber in list(self._subscribers):
+            subscriber.push(event)
+
+    # -- producing --------------------------------------------------------
+
+    def publish_board(self, leagues):
+        """Publish the score/status changes between the current board and a new one."""
+        self._ensure_loaded()
+        new = flatten_board(leagues)
+        with self._lock:
+            if self.redis and int(self.redis.get(VERSION_KEY) or 0) != self.version:
+                # Diff against the board everyone else has, not a stale local copy
+                self._load_snapshot()
+            changed, removed = diff_games(self._games, new)
+            if not changed and not removed:
+                return None
+            version = self.redis.incr(VERSION_KEY) if self.redis else self.version + 1
+            event = {'type': 'delta', 'version': version, 'changed': changed, 'removed': removed}
+            if self.redis:
+                payload = json.dumps(event, default=str)
+                pipe = self.redis.pipeline(transaction=True)
+                pipe.set(SNAPSHOT_KEY, json.dumps({'version': version, 'games': new}, default=str))
+                pipe.lpush(HISTORY_KEY, payload)
+                pipe.ltrim(HISTORY_KEY, 0, self.history_size - 1)
+                pipe.publish(CHANNEL, payload)
+                pipe.execute()
+            self._apply(event)
+            self._stats['published'] += 1
+            return version
+
+    # -- listening --------------------------------------------------------
+
+    def _listen(self):
+        while not self._stop.is_set():
+            pubsub = None
+            try:
+                pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(CHANNEL)
+                # Catch up on anything published before (or while) we were unsubscribed
+                with self._lock:
+                    self._load_snapshot()
+                while not self._stop.is_set():
+                    message = pubsub.get_message(timeout=1.0)
+                    if message and message['type'] == 'message':
+                        event = json.loads(message['data'])
+                        with self._lock:
+                            self._stats['received'] += 1
+                            self._apply(event)
+            except Exception as e:
+                logger.error(f"Live feed listener error: {e}")
+                self._stop.wait(1.0)
+            finally:
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+
+    def start(self):
+        """Start this process's listener thread (no-op without Redis or if running)."""
+        if not self.redis:
+            return
+        if self._listener is not None and self._listener.is_alive():
+            return
+        with self._lock:
+            if self._listener is not None and self._listener.is_alive():
+                return
+            self._stop.clear()
+            self._listener = threading.Thread(target=self._listen, name='live-feed', daemon=True)
+            self._listener.start()
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        if self._listener is not None:
+            self._listener.join(timeout)
+            self._listener = None
+
+    # -- subscribing ------------------------------------------------------
+
+    def _events_since(self, version):
+        """Events after version, oldest first, or None if they are no longer available."""
+        if version == self.version:
+            return []
+        if version > self.version:
+            return None  # from before a reset of the version counter
+        if self._backlog and self._backlog[0]['version'] <= version + 1:
+            return [event for event in self._backlog if event['version'] > version]
+        if self.redis:
+            history = [json.loads(raw) for raw in self.redis.lrange(HISTORY_KEY, 0, -1)]
+            history.reverse()
+            if history and history[0]['version'] <= version + 1:
+                return [event for event in history if version < event['version'] <= self.version]
+        return None
+
+    def board(self):
+        """(version, games) of the current board in this process."""
+        self.start()
+        self._ensure_loaded()
+        with self._lock:
+            return self.version, list(self._games.values())
+
+    def changes_since(self, version):
+        """(version, changed, removed) since a board version, or None if that is too old.
+
+        Consecutive events are merged, so a game that changed several times
+        appears once with its latest fields.
+        """
+        self.start()
+        self._ensure_loaded()
+        with self._lock:
+            events = self._events_since(version)
+            current = self.version
+        if events is None:
+            return None
+        changed, removed = {}, set()
+        for event in events:
+            for game_id in event['removed']:
+                changed.pop(game_id, None)
+                removed.add(game_id)
+            for game_id, game in event['changed'].items():
+                removed.discard(game_id)
+                changed[game_id] = dict(changed.get(game_id, {}), **game)
+        return current, changed, sorted(removed)
+
+    def subscribe(self, last_event_id=None, subscriber=None):
+        """Register a stream; returns (subscriber, initial events) or None when full."""
+        self.start()
+        self._ensure_loaded()
+        with self._lock:
+            if len(self._subscribers) >= self.max_clients:
+                self._stats['rejected'] += 1
+                return None
+            initial = None
+            try:
+                if last_event_id is not None:
+                    initial = self._events_since(int(last_event_id))
+            except Exception as e:
+                logger.warning(f"Cannot resume live feed from {last_event_id!r}: {e}")
+            if initial is None:
+                initial = [self.snapshot_event()]
+            subscriber = subscriber or Subscriber(self.queue_size)
+            self._subscribers.add(subscriber)
+            return subscriber, initial
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+            if subscriber.overflowed:
+                self._stats['overflows'] += 1
+
+    def stream(self, subscriber, initial, heartbeat=15, max_duration=300, retry_ms=3000):
+        """Yield SSE frames for a subscriber until it overflows or max_duration passes."""
+        deadline = time.monotonic() + max_duration
+        try:
+            yield f"retry: {retry_ms}\n\n"
+            for event in initial:
+                yield sse_frame(event)
+            while time.monotonic() < deadline and not subscriber.overflowed:
+                try:
+                    event = subscriber.queue.get(timeout=heartbeat)
+                except queue.Empty:
+                    yield ": heartbeat\n\n"
+                    continue
+                yield sse_frame(event)
+        finally:
+            self.unsubscribe(subscriber)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, version=self.version, games=len(self._games),
+                        clients=len(self._subscribers))
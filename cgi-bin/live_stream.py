@@ -0,0 +1,140 @@
+"""
+Non-blocking server for the live score stream (/api/live-games/stream).
+
+Under gunicorn's gthread workers every open stream holds a request thread
+for up to SSE_MAX_DURATION, so the Flask route can only serve a handful of
+browsers. This aiohttp app serves the same stream from one event loop, where
+an idle connection costs a coroutine and a small queue instead of a thread.
+
+It runs as its own process next to the web workers: flask_service.py starts
+it when LIVE_STREAM_BIND is set, and the reverse proxy routes
+/api/live-games/stream to it. It keeps a LiveFeed of its own, fed by the
+same Redis pub/sub channel as the workers; the refresh scheduler's leader
+still publishes. Reconnects (Last-Event-ID), resyncs and overflow behave as
+on the Flask route.
+"""
+
+import asyncio
+import logging
+import os
+
+import redis
+from aiohttp import web
+
+from live_feed import LiveFeed, Subscriber, sse_frame
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncSubscriber(Subscriber):
+    """Subscriber whose events are handed to an asyncio queue on the server's loop."""
+
+    def __init__(self, queue_size, loop):
+        super().__init__(queue_size)
+        self.loop = loop
+        self.events = asyncio.Queue(maxsize=queue_size)
+
+    def push(self, event):
+        # Called from the feed's listener thread
+        self.loop.call_soon_threadsafe(self._put, event)
+
+    def _put(self, event):
+        try:
+            self.events.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+
+async def handle_stream(request):
+    """Server-Sent Events stream of live score and status changes."""
+    feed = request.app['feed']
+    heartbeat, max_duration = request.app['heartbeat'], request.app['max_duration']
+    loop = asyncio.get_running_loop()
+    last_event_id = request.headers.get('Last-Event-ID') or request.query.get('last_event_id')
+
+    subscriber = AsyncSubscriber(feed.queue_size, loop)
+    # subscribe() may read the Redis history - keep it off the event loop
+    subscription = await loop.run_in_executor(None, feed.subscribe, last_event_id, subscriber)
+    if subscription is None:
+        return web.json_response({'error': 'Too many live score streams, try again shortly'},
+                                 status=503, headers={'Retry-After': '30'})
+    _, initial = subscription
+
+    response = web.StreamResponse(headers={
+        'Content-Type': 'text/event-stream',
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',  # don't let proxies buffer the stream
+    })
+    try:
+        await response.prepare(request)
+        await response.write(b"retry: 3000\n\n")
+        for event in initial:
+            await response.write(sse_frame(event).encode())
+        deadline = loop.time() + max_duration
+        while not subscriber.overflowed:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                event = await asyncio.wait_for(subscriber.events.get(), min(heartbeat, remaining))
+            except asyncio.TimeoutError:
+                await response.write(b": heartbeat\n\n")
+                continue
+            await response.write(sse_frame(event).encode())
+    except ConnectionResetError:
+        pass  # browser went away
+    finally:
+        feed.unsubscribe(subscriber)
+    return response
+
+
+async def handle_status(request):
+    return web.json_response(request.app['feed'].stats())
+
+
+def create_app(feed, heartbeat=15, max_duration=300):
+    app = web.Application()
+    app['feed'] = feed
+    app['heartbeat'] = heartbeat
+    app['max_duration'] = max_duration
+    app.router.add_get('/api/live-games/stream', handle_stream)
+    app.router.add_get('/api/live-games/stream/status', handle_status)
+
+    async def stop_feed(app):
+        app['feed'].stop()
+    app.on_cleanup.append(stop_feed)
+    return app
+
+
+def main():
+    """Serve the stream on LIVE_STREAM_BIND (host:port) until interrupted."""
+    from dotenv import load_dotenv
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(name)s: %(message)s')
+
+    redis_client = redis.Redis(
+        host=os.getenv('REDIS_HOST', 'localhost'),
+        port=int(os.getenv('REDIS_PORT', 6379)),
+        username=os.getenv('REDIS_USERNAME', None),
+        password=os.getenv('REDIS_PASSWORD', None),
+        db=int(os.getenv('REDIS_DB', 0)),
+        socket_connect_timeout=5,
+        decode_responses=True
+    )
+    redis_client.ping()  # events only arrive through Redis - fail loudly without it
+
+    feed = LiveFeed(
+        redis_client,
+        history_size=int(os.getenv('SSE_HISTORY_SIZE', 200)),
+        max_clients=int(os.getenv('LIVE_STREAM_MAX_CLIENTS', 5000))
+    )
+    feed.start()
+    host, _, port = os.getenv('LIVE_STREAM_BIND', '127.0.0.1:5001').rpartition(':')
+    app = create_app(feed, heartbeat=int(os.getenv('SSE_HEARTBEAT', 15)),
+                     max_duration=int(os.getenv('SSE_MAX_DURATION', 300)))
+    logger.info(f"Live score stream listening on {host or '0.0.0.0'}:{port}")
+    web.run_app(app, host=host or None, port=int(port), access_log=None, print=None)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+"""
+Rendered-page cache for anonymous routes, with ETags and edge cache headers.
+
+A decorated view is rendered once and its body is stored in the layered
+cache, keyed by endpoint, path, query arguments and the current version of
+each of the page's tags (e.g. guild:123). purge(tag) bumps a tag's version
+in Redis, so every page carrying that tag gets a new key on the next request
+and the old copies simply expire.
+
+Responses carry a strong ETag (hash of the body) and conditional requests
+are answered with 304. Cache-Control and Surrogate-Key / Cache-Tag headers
+let a CDN cache the page too and purge it by the same tags.
+
+Only 200 responses rendered for anonymous visitors are stored: a response
+rendered for a logged-in user, one that touched the session, or one built
+from stale data is passed through untouched.
+"""
+
+import hashlib
+import logging
+import threading
+from functools import wraps
+
+from flask import current_app, g, make_response, request, session
+
+from cache import MISSING
+
+logger = logging.getLogger(__name__)
+
+
+class PageCache:
+    """Decorator factory caching whole responses of anonymous GET routes."""
+
+    def __init__(self, cache, redis_client=None, namespace='pages', tag_prefix='page_tag',
+                 enabled=True, browser_max_age=0):
+        self.cache = cache
+        self.redis = redis_client
+        self.namespace = namespace
+        self.tag_prefix = tag_prefix
+        self.enabled = enabled
+        self.browser_max_age = browser_max_age
+        self._local_versions = {}  # tag -> version when running without Redis
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'stores': 0, 'not_modified': 0, 'bypassed': 0, 'purges': 0}
+
+    def _count(self, stat):
+        with self._lock:
+            self._stats[stat] += 1
+
+    # -- tag versions -----------------------------------------------------
+
+    def _versions(self, tags):
+        if not tags:
+            return []
+        if self.redis:
+            try:
+                return [v or '0' for v in self.redis.mget([f"{self.tag_prefix}:{tag}" for tag in tags])]
+            except Exception as e:
+                logger.error(f"Page cache version lookup error: {e}")
+        return [str(self._local_versions.get(tag, 0)) for tag in tags]
+
+    def purge(self, *tags):
+        """Invalidate every cached page carrying any of the tags."""
+        self._count('purges')
+        with self._lock:
+            for tag in tags:
+                self._local_versions[tag] = self._local_versions.get(tag, 0) + 1
+        if self.redis:
+            try:
+                pipe = self.redis.pipeline(transaction=False)
+                for tag in tags:
+                    pipe.incr(f"{self.tag_prefix}:{tag}")
+                pipe.execute()
+            except Exception as e:
+                logger.error(f"Page cache purge error: {e}")
+
+    # -- responses --------------------------------------------------------
+
+    def _key(self, tags):
+        args = '&'.join(f"{k}={v}" for k, v in sorted(request.args.items(multi=True)))
+        versions = ','.join(f"{tag}={version}" for tag, version in zip(tags, self._versions(tags)))
+        raw = f"{request.endpoint}|{request.path}|{args}|{versions}"
+        return hashlib.sha1(raw.encode()).hexdigest()
+
+    def _storable(self, response):
+        return (response.status_code == 200
+                and not response.direct_passthrough
+                and 'Set-Cookie' not in response.headers
+                and not session.modified
+                and session.get('discord_user') is None
+                and not g.get('stale_data'))
+
+    def _add_headers(self, response, tags, ttl):
+        response.cache_control.public = True
+        response.cache_control.max_age = self.browser_max_age
+        response.cache_control.s_maxage = ttl
+        if not self.browser_max_age:
+            response.cache_control.must_revalidate = True
+        if tags:
+            response.headers['Surrogate-Key'] = ' '.join(tags)
+            response.headers['Cache-Tag'] = ','.join(tags)  # Cloudflare's name for it
+
+    def cached(self, ttl=60, tags=()):
+        """Cache a view's response for ttl seconds.
+
+        tags are format strings filled from the view arguments, e.g.
+        'guild:{guild_id}'.
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if not self.enabled or request.method not in ('GET', 'HEAD'):
+                    return view(*args, **kwargs)
+
+                page_tags = [tag.format(**kwargs) for tag in tags]
+                key = self._key(page_tags)
+                page = self.cache.lookup(self.namespace, key)
+                if page is MISSING or page is None:
+                    self._count('misses')
+                    response = make_response(view(*args, **kwargs))
+                    if not self._storable(response):
+                        self._count('bypassed')
+                        return response
+                    body = response.get_data()
+                    page = {
+                        'body': body,
+                        'etag': hashlib.sha256(body).hexdigest()[:32],
+                        'mimetype': response.mimetype
+                    }
+                    self.cache.set(self.namespace, key, page, ttl)
+                    self._count('stores')
+                else:
+                    self._count('hits')
+                    response = current_app.response_class(page['body'], mimetype=page['mimetype'])
+
+                response.set_etag(page['etag'])
+                self._add_headers(response, page_tags, ttl)
+                response = response.make_conditional(request)
+                if response.status_code == 304:
+                    self._count('not_modified')
+                return response
+            return wrapper
+        return decorator
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, enabled=self.enabled)
@@ -0,0 +1,135 @@
+"""
+Concurrent fetching of the independent datasets a page needs.
+
+A page declares its datasets (name, zero-argument function, timeout,
+default) and load() runs them at the same time, so page latency follows the
+slowest query instead of their sum. The first dataset runs on the calling
+thread, in its unit of work. The others go to a bounded thread pool, each in
+its own unit of work (context_factory, e.g. a Flask app context) and so on
+its own pooled connection, but only while one of the max_workers slots is
+free. A dataset that finds no free slot runs on the calling thread as well,
+instead of queueing for a connection. Size max_workers so that the slots
+plus the server's request threads fit in the connection pool.
+
+Results are partial by design: a dataset that raises or misses its timeout
+gets its default and is listed in errors, and the page renders with what
+arrived. A timed-out query keeps running in the pool, holding its slot, until
+it finishes; its result is discarded.
+"""
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from contextlib import nullcontext
+
+logger = logging.getLogger(__name__)
+
+
+class Dataset:
+    """One independent piece of page data."""
+
+    __slots__ = ('name', 'func', 'timeout', 'default')
+
+    def __init__(self, name, func, timeout=None, default=None):
+        self.name = name
+        self.func = func
+        self.timeout = timeout
+        self.default = default
+
+
+class LoadResult(dict):
+    """Dataset values by name; errors maps failed or timed-out names to a reason."""
+
+    def __init__(self, values, errors, elapsed):
+        super().__init__(values)
+        self.errors = errors
+        self.elapsed = elapsed
+
+    @property
+    def partial(self):
+        return bool(self.errors)
+
+
+class ParallelLoader:
+    """Runs page datasets concurrently in a bounded thread pool."""
+
+    def __init__(self, max_workers=8, default_timeout=5.0, context_factory=None):
+        self.max_workers = max_workers
+        self.default_timeout = default_timeout
+        self.context_factory = context_factory or nullcontext
+        self._executor = None
+        self._slots = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._stats = {'loads': 0, 'datasets': 0, 'inline': 0, 'timeouts': 0, 'failures': 0}
+
+    def _pool(self):
+        # Pool threads do not survive fork - build a new pool per process
+        if self._executor is None or self._pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                        thread_name_prefix='page-loader')
+                    self._slots = threading.Semaphore(self.max_workers)
+                    self._pid = os.getpid()
+        return self._executor
+
+    def _run(self, dataset):
+        try:
+            with self.context_factory():
+                return dataset.func()
+        finally:
+            self._slots.release()
+
+    def _count(self, stat, n=1):
+        with self._lock:
+            self._stats[stat] += n
+
+    def load(self, datasets):
+        """Fetch all datasets concurrently and return a LoadResult."""
+        started = time.monotonic()
+        pool = self._pool()
+        pending, inline = [], []
+        for i, dataset in enumerate(datasets):
+            # Never wait for a slot: without one, the calling thread runs it
+            if i == 0 or not self._slots.acquire(blocking=False):
+                inline.append(dataset)
+                continue
+            timeout = self.default_timeout if dataset.timeout is None else dataset.timeout
+            pending.append((dataset, started + timeout, pool.submit(self._run, dataset)))
+        self._count('loads')
+        self._count('datasets', len(pending) + len(inline))
+        self._count('inline', len(inline))
+
+        values, errors = {}, {}
+        for dataset in inline:
+            try:
+                values[dataset.name] = dataset.func()
+            except Exception as e:
+                self._count('failures')
+                values[dataset.name] = dataset.default
+                errors[dataset.name] = str(e)
+                logger.error(f"Error loading dataset {dataset.name}: {e}")
+        for dataset, deadline, future in pending:
+            try:
+                values[dataset.name] = future.result(max(deadline - time.monotonic(), 0))
+            except FutureTimeout:
+                if future.cancel():  # only possible if it has not started yet
+                    self._slots.release()
+                self._count('timeouts')
+                values[dataset.name] = dataset.default
+                errors[dataset.name] = 'timeout'
+                logger.warning(f"Dataset {dataset.name} timed out")
+            except Exception as e:
+                self._count('failures')
+                values[dataset.name] = dataset.default
+                errors[dataset.name] = str(e)
+                logger.error(f"Error loading dataset {dataset.name}: {e}")
+        return LoadResult(values, errors, time.monotonic() - started)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, max_workers=self.max_workers)
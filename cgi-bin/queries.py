@@ -0,0 +1,296 @@
+"""
+Named SQL queries rendered for MySQL or PostgreSQL, returning dict rows.
+
+Each query is registered once under a name, in a portable form: parameters
+are written :name, and the constructs the two databases spell differently
+are macros:
+
+    {now}              NOW()
+    {today}            CURDATE() / CURRENT_DATE
+    {ago:1 MONTH}      DATE_SUB(NOW(), INTERVAL 1 MONTH) / NOW() - INTERVAL '1 MONTH'
+    {current_schema}   DATABASE() / current_schema()
+    {upsert:a,b}       ON DUPLICATE KEY UPDATE / ON CONFLICT (a, b) DO UPDATE SET
+    {excluded:col}     VALUES(col) / EXCLUDED.col
+
+Any other {field} is a fragment passed by the caller (e.g. the bet columns
+compiled by the schema registry). A query whose syntax differs beyond that
+can carry separate postgres text. Rendered SQL is cached per query, dialect
+and fragment text, so a new fragment object with the same SQL (e.g. after a
+schema re-probe) reuses the cached entry.
+
+Statements are prepared on the server once per connection and reused, so
+repeated queries skip parsing: MySQL through one prepared cursor per
+statement (mysql-connector's binary protocol), PostgreSQL through
+PREPARE / EXECUTE. The cache is kept per raw driver connection, so it lives
+as long as the pool keeps that connection open.
+"""
+
+import logging
+import re
+import threading
+import time
+import weakref
+
+logger = logging.getLogger(__name__)
+
+PARAM = re.compile(r"(?<![:\w]):([A-Za-z_]\w*)")
+IDENTIFIER_UNSAFE = re.compile(r"\W")
+
+
+class Macro:
+    """A dialect construct taking its argument from the format spec ({name:arg})."""
+
+    __slots__ = ('render',)
+
+    def __init__(self, render):
+        self.render = render
+
+    def __format__(self, spec):
+        return self.render(spec)
+
+
+MACROS = {
+    'mysql': {
+        'now': 'NOW()',
+        'today': 'CURDATE()',
+        'current_schema': 'DATABASE()',
+        'ago': Macro(lambda interval: f"DATE_SUB(NOW(), INTERVAL {interval})"),
+        'upsert': Macro(lambda keys: "ON DUPLICATE KEY UPDATE"),
+        'excluded': Macro(lambda column: f"VALUES({column})"),
+    },
+    'postgres': {
+        'now': 'NOW()',
+        'today': 'CURRENT_DATE',
+        'current_schema': 'current_schema()',
+        'ago': Macro(lambda interval: f"NOW() - INTERVAL '{interval}'"),
+        'upsert': Macro(lambda keys: f"ON CONFLICT ({', '.join(k.strip() for k in keys.split(','))}) DO UPDATE SET"),
+        'excluded': Macro(lambda column: f"EXCLUDED.{column}"),
+    },
+}
+
+
+class Query:
+    """One named query; postgres overrides sql when the dialects differ too much."""
+
+    __slots__ = ('name', 'sql', 'postgres', 'prepare')
+
+    def __init__(self, name, sql, postgres=None, prepare=True):
+        self.name = name
+        self.sql = sql
+        self.postgres = postgres
+        self.prepare = prepare
+
+
+class Rendered:
+    """A query rendered for one dialect and set of fragments."""
+
+    __slots__ = ('name', 'sql', 'params', 'statement', 'prepare_sql', 'prepare')
+
+    def __init__(self, name, sql, params, statement=None, prepare_sql=None, prepare=True):
+        self.name = name
+        self.sql = sql  # driver placeholders (%s), or EXECUTE ... for prepared postgres
+        self.params = params  # parameter names in placeholder order
+        self.statement = statement
+        self.prepare_sql = prepare_sql
+        self.prepare = prepare
+
+    def values(self, params):
+        if not self.params:
+            return ()
+        return tuple(params[name] for name in self.params)
+
+
+QUERIES = {}
+_rendered = {}
+_statement_ids = {}
+_connections = weakref.WeakKeyDictionary()  # raw connection -> ConnectionStatements
+_lock = threading.Lock()
+_stats = {'executions': 0, 'prepares': 0, 'renders': 0, 'errors': 0}
+
+
+def register(name, sql, postgres=None, prepare=True):
+    """Add a named query; returns the name for use as a module constant."""
+    if name in QUERIES:
+        raise ValueError(f"Query {name} is already registered")
+    QUERIES[name] = Query(name, sql, postgres, prepare)
+    return name
+
+
+# The database server's clock, shared by the watermark-based syncs
+DB_NOW = register('db.now', "SELECT {now} AS now")
+
+
+def dialect_of(connection):
+    """'postgres' for psycopg2 connections, 'mysql' otherwise."""
+    raw = getattr(connection, 'raw', connection)
+    return 'postgres' if type(raw).__module__.startswith('psycopg2') else 'mysql'
+
+
+def _fragment_key(value):
+    """Cache key of a fragment: its SQL text, or that of its attributes ({bets.stake})."""
+    if isinstance(value, str):
+        return value
+    slots = getattr(type(value), '__slots__', None)
+    if slots:
+        return tuple((slot, getattr(value, slot, None)) for slot in slots)
+    if hasattr(value, '__dict__'):
+        return tuple(sorted(vars(value).items()))
+    return str(value)
+
+
+def render(name, dialect, fragments=None):
+    """Rendered SQL of a named query for a dialect (cached)."""
+    key = (name, dialect,
+           tuple(sorted((field, _fragment_key(value)) for field, value in fragments.items())) if fragments else ())
+    rendered = _rendered.get(key)
+    if rendered is not None:
+        return rendered
+
+    query = QUERIES[name]
+    text = query.postgres if dialect == 'postgres' and query.postgres else query.sql
+    text = text.format(**MACROS[dialect], **(fragments or {}))
+    if dialect == 'postgres' and query.prepare:
+        # $n per distinct parameter; EXECUTE passes them in that order
+        names = list(dict.fromkeys(PARAM.findall(text)))
+        positions = {param: i + 1 for i, param in enumerate(names)}
+        prepare_text = PARAM.sub(lambda m: f"${positions[m.group(1)]}", text)
+        with _lock:
+            statement = _statement_ids.setdefault(prepare_text, f"q{len(_statement_ids) + 1}_{IDENTIFIER_UNSAFE.sub('_', name)}"[:63])
+        args = f" ({', '.join(['%s'] * len(names))})" if names else ""
+        rendered = Rendered(name, f"EXECUTE {statement}{args}", names, statement,
+                            f"PREPARE {statement} AS {prepare_text}")
+    else:
+        rendered = Rendered(name, PARAM.sub('%s', text), PARAM.findall(text), prepare=query.prepare)
+    _rendered[key] = rendered
+    _stats['renders'] += 1
+    return rendered
+
+
+class ConnectionStatements:
+    """Server-side statements prepared on one raw connection."""
+
+    __slots__ = ('cursors', 'prepared')
+
+    def __init__(self):
+        self.cursors = {}  # MySQL: sql -> prepared cursor
+        self.prepared = set()  # PostgreSQL: prepared statement names
+
+
+def _statements(raw):
+    try:
+        statements = _connections.get(raw)
+    except TypeError:
+        return None  # not weak-referenceable; run unprepared
+    if statements is None:
+        with _lock:
+            statements = _connections.setdefault(raw, ConnectionStatements())
+    return statements
+
+
+def _rows(cursor):
+    if cursor.description is None:
+        return []
+    names = [column[0] for column in cursor.description]
+    return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+
+def _run(connection, rendered, batches, fetch):
+    raw = getattr(connection, 'raw', connection)
+    statements = _statements(raw) if rendered.prepare else None
+    if statements is None or not hasattr(raw, 'cursor'):
+        cursor = connection.cursor()
+        try:
+            rows, count = [], 0
+            for values in batches:
+                cursor.execute(rendered.sql, values or None)
+                count += max(cursor.rowcount, 0)
+                if fetch:
+                    rows = _rows(cursor)
+            return rows if fetch else count
+        finally:
+            cursor.close()
+
+    if rendered.statement:
+        # PostgreSQL: PREPARE once per connection, then EXECUTE with the values
+        cursor = raw.cursor()
+        try:
+            if rendered.statement not in statements.prepared:
+                cursor.execute(rendered.prepare_sql)
+                statements.prepared.add(rendered.statement)
+                _stats['prepares'] += 1
+            rows, count = [], 0
+            for values in batches:
+                cursor.execute(rendered.sql, values or None)
+                count += max(cursor.rowcount, 0)
+                if fetch:
+                    rows = _rows(cursor)
+            return rows if fetch else count
+        finally:
+            cursor.close()
+
+    # MySQL: one unbuffered prepared cursor per statement; the cursor keeps
+    # the statement id as long as it is reused with the same SQL object
+    cursor = statements.cursors.get(rendered.sql)
+    if cursor is None:
+        cursor = statements.cursors[rendered.sql] = raw.cursor(prepared=True, buffered=False)
+        _stats['prepares'] += 1
+    try:
+        rows, count = [], 0
+        for values in batches:
+            cursor.execute(rendered.sql, values)
+            count += max(cursor.rowcount, 0)
+            # Always drain the result so the connection is free for the next statement
+            rows = _rows(cursor)
+        return rows if fetch else count
+    except Exception:
+        # Re-prepare on next use (the statement may be gone with a reconnect)
+        statements.cursors.pop(rendered.sql, None)
+        try:
+            cursor.close()
+        except Exception:
+            pass
+        raise
+
+
+def _execute(connection, name, batches, fetch, fragments):
+    rendered = render(name, dialect_of(connection), fragments)
+    record = getattr(connection, 'record_query', None)
+    started = time.perf_counter()
+    try:
+        return _run(connection, rendered, [rendered.values(params or {}) for params in batches], fetch)
+    except Exception:
+        _stats['errors'] += 1
+        raise
+    finally:
+        _stats['executions'] += len(batches)
+        if record:
+            record(time.perf_counter() - started)
+
+
+def fetch_all(connection, name, params=None, **fragments):
+    """Rows of a named query as dicts."""
+    return _execute(connection, name, [params], True, fragments)
+
+
+def fetch_one(connection, name, params=None, **fragments):
+    """First row of a named query as a dict, or None."""
+    rows = _execute(connection, name, [params], True, fragments)
+    return rows[0] if rows else None
+
+
+def execute(connection, name, params=None, **fragments):
+    """Run a named statement; returns the affected row count."""
+    return _execute(connection, name, [params], False, fragments)
+
+
+def execute_many(connection, name, rows, **fragments):
+    """Run a named statement once per params dict in rows."""
+    if not rows:
+        return 0
+    return _execute(connection, name, list(rows), False, fragments)
+
+
+def stats():
+    with _lock:
+        return dict(_stats, queries=len(QUERIES), statements=len(_statement_ids),
+                    connections=len(_connections))
@@ -0,0 +1,219 @@
+"""
+Background refresh-ahead scheduler for hot cache keys.
+
+Jobs are registered with a refresh interval shorter than the TTL of the key
+they fill, so the key is recomputed before it expires and requests only ever
+read it from cache. Intervals are jittered so jobs registered together drift
+apart.
+
+When several workers run the scheduler, one of them holds a leader lease in
+Redis and runs the jobs; the rest stay idle and take over if the leader's
+lease lapses. Without Redis (or while it is unreachable) every worker runs
+the jobs itself, since each then only has its own local cache tier.
+
+Deployments that do not run the scheduler thread can still trigger a job
+lazily with run_if_due(): it runs inline, under the same leader lease, at
+most once per interval.
+"""
+
+import logging
+import random
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Extend the lease only if we still hold it
+_RENEW_LEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('expire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+class _Job:
+    """A registered refresh job with its schedule and run metrics."""
+
+    def __init__(self, name, func, interval, jitter):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.jitter = jitter
+        self.next_run = 0  # run as soon as this worker becomes leader
+        self.stats = {
+            'runs': 0,
+            'failures': 0,
+            'last_run_at': None,
+            'last_duration_ms': None,
+            'avg_duration_ms': None,
+            'max_duration_ms': 0.0,
+            'last_error': None,
+        }
+
+    def schedule_next(self, now):
+        """Next run time, shaving up to `jitter` off the interval."""
+        self.next_run = now + self.interval * (1 - random.random() * self.jitter)
+
+    def record(self, started, duration, error=None):
+        stats = self.stats
+        duration_ms = round(duration * 1000, 1)
+        stats['runs'] += 1
+        stats['last_run_at'] = started
+        stats['last_duration_ms'] = duration_ms
+        stats['max_duration_ms'] = max(stats['max_duration_ms'], duration_ms)
+        previous = stats['avg_duration_ms'] or 0.0
+        stats['avg_duration_ms'] = round(previous + (duration_ms - previous) / stats['runs'], 1)
+        if error is not None:
+            stats['failures'] += 1
+            stats['last_error'] = str(error)
+
+
+class RefreshScheduler:
+    """Runs registered refresh jobs on the worker holding the Redis leader lease."""
+
+    def __init__(self, redis_client, leader_key='refresh:leader', leader_ttl=15,
+                 jitter=0.1, tick=1.0):
+        self.redis = redis_client
+        self.leader_key = leader_key
+        self.leader_ttl = leader_ttl
+        self.jitter = jitter
+        self.tick = tick
+        self._jobs = {}
+        self._token = None
+        self._is_leader = False
+        self._leader_changes = 0
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._inline_lock = threading.Lock()
+
+    def register(self, name, interval, func, jitter=None):
+        """Refresh with func() every `interval` seconds (keep it below the key's TTL)."""
+        with self._lock:
+            self._jobs[name] = _Job(name, func, interval, self.jitter if jitter is None else jitter)
+
+    # -- leadership -------------------------------------------------------
+
+    def _acquire_leadership(self):
+        """Take or renew the leader lease; True if this worker should run jobs."""
+        if not self.redis:
+            return True
+        try:
+            if self._is_leader and self.redis.eval(_RENEW_LEASE_SCRIPT, 1, self.leader_key,
+                                                   self._token, self.leader_ttl):
+                return True
+            return bool(self.redis.set(self.leader_key, self._token, nx=True, ex=self.leader_ttl))
+        except Exception as e:
+            # Redis is down - refresh this worker's own local tier
+            logger.warning(f"Refresh leader election failed, running jobs locally: {e}")
+            return True
+
+    def _set_leader(self, leader):
+        if leader != self._is_leader:
+            self._leader_changes += 1
+            logger.info(f"[REFRESH] {'became' if leader else 'lost'} refresh leader")
+        self._is_leader = leader
+
+    # -- loop -------------------------------------------------------------
+
+    def _run_job(self, job):
+        started = time.time()
+        error = None
+        try:
+            job.func()
+        except Exception as e:
+            error = e
+            logger.warning(f"Refresh job {job.name} failed: {e}")
+        duration = time.time() - started
+        with self._lock:
+            job.record(started, duration, error)
+        job.schedule_next(time.monotonic())
+
+    def run_pending(self):
+        """Run every job whose next run time has passed."""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        for job in jobs:
+            if self._stop.is_set():
+                return
+            if job.next_run <= time.monotonic():
+                self._run_job(job)
+
+    def run_if_due(self, name):
+        """Run one job inline if it is due and this worker holds the lease (never blocks).
+
+        A no-op while the scheduler thread is running; returns True if the job ran.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return False
+        job = self._jobs.get(name)
+        if job is None or job.next_run > time.monotonic():
+            return False
+        if not self._inline_lock.acquire(blocking=False):
+            return False
+        try:
+            if job.next_run > time.monotonic():
+                return False
+            if self._token is None:
+                self._token = uuid.uuid4().hex
+            self._set_leader(self._acquire_leadership())
+            if not self._is_leader:
+                # Another worker runs it; look again next interval
+                job.schedule_next(time.monotonic())
+                return False
+            self._run_job(job)
+            return True
+        finally:
+            self._inline_lock.release()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self._set_leader(self._acquire_leadership())
+            if self._is_leader:
+                self.run_pending()
+            self._stop.wait(self.tick)
+
+    def start(self):
+        """Start the scheduler thread in this process (no-op if it is running)."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            # Fresh identity per process - forked workers must not share a lease
+            self._token = uuid.uuid4().hex
+            self._is_leader = False
+            self._stop.clear()
+            for job in self._jobs.values():
+                job.next_run = 0
+            self._thread = threading.Thread(target=self._loop, name='refresh-scheduler', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=5):
+        """Stop the scheduler thread and give up the leader lease."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        if self._is_leader and self.redis:
+            try:
+                if self.redis.get(self.leader_key) == self._token:
+                    self.redis.delete(self.leader_key)
+            except Exception as e:
+                logger.debug(f"Could not release refresh lease: {e}")
+        self._is_leader = False
+
+    def stats(self):
+        """Leadership state and per-job run metrics for status endpoints."""
+        with self._lock:
+            return {
+                'running': self._thread is not None and self._thread.is_alive(),
+                'leader': self._is_leader,
+                'leader_changes': self._leader_changes,
+                'jobs': {
+                    name: dict(job.stats, interval=job.interval)
+                    for name, job in self._jobs.items()
+                }
+            }
@@ -0,0 +1,184 @@
+"""
+Database schema capabilities, probed once per worker instead of per request.
+
+Deployments run different generations of the bot's schema: bets record their
+outcome in `result`, `status` or the `bet_won`/`bet_loss` flags, the stake in
+`units` or `bet_amount`, and some databases have no users or
+guild_customization table at all. Rather than trying a query and falling
+back when it fails, every worker reads the table and column list from
+information_schema once and compiles the SQL fragments each logical query
+needs for that schema (BetColumns, user_name_sql()).
+
+Compiled fragments are cached until the schema is probed again. That happens
+when the Redis version counter changes: run `flask refresh-schema` after a
+migration and every worker re-probes within check_interval seconds. Until
+the first probe succeeds, queries compile against ASSUMED_SCHEMA.
+
+Key layout:
+    schema:version    INCR counter, bumped to make workers re-probe
+"""
+
+import logging
+import threading
+import time
+
+from queries import fetch_all, register
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'schema:version'
+
+# What the queries were written against; used until a probe succeeds
+ASSUMED_SCHEMA = {
+    'bets': frozenset(('bet_serial', 'guild_id', 'user_id', 'bet_type', 'units', 'status', 'result',
+                       'profit_loss', 'created_at', 'updated_at')),
+    'users': frozenset(('user_id', 'username', 'display_name')),
+    'guild_customization': frozenset(('guild_id',)),
+}
+
+# Where both exist, result carries the outcome and status may only hold the
+# bet's lifecycle ('pending', 'settled', ...), so result wins when it is set
+OUTCOME_COLUMNS = ('result', 'status')
+STAKE_COLUMNS = ('units', 'bet_amount')
+USER_NAME_COLUMNS = ('username', 'display_name')
+
+
+SCHEMA_COLUMNS = register('schema.columns', """
+    SELECT table_name AS table_name, column_name AS column_name
+    FROM information_schema.columns
+    WHERE table_schema = {current_schema}
+""", prepare=False)
+
+
+def load_schema(connection):
+    """Read {table: frozenset(columns)} for the current database."""
+    tables = {}
+    for row in fetch_all(connection, SCHEMA_COLUMNS):
+        tables.setdefault(row['table_name'].lower(), set()).add(row['column_name'].lower())
+    return {table: frozenset(columns) for table, columns in tables.items()}
+
+
+class BetColumns:
+    """SQL expressions for a bet's outcome, stake and profit on the detected bets table."""
+
+    __slots__ = ('won', 'lost', 'settled', 'outcome', 'stake', 'profit', 'outcome_column')
+
+    def __init__(self, columns, alias=None):
+        p = f"{alias}." if alias else ''
+        present = [column for column in OUTCOME_COLUMNS if column in columns]
+        if present:
+            outcome = ','.join(present)
+            value = (f"COALESCE({', '.join(p + column for column in present)})" if len(present) > 1
+                     else f"{p}{present[0]}")
+            self.won = f"{value} IN ('won', 'WON')"
+            self.lost = f"{value} IN ('lost', 'LOST')"
+            self.settled = f"{value} IN ('won', 'lost', 'WON', 'LOST')"
+        elif 'bet_won' in columns:
+            outcome = 'bet_won'
+            self.won = f"{p}bet_won = TRUE"
+            self.lost = f"{p}bet_loss = TRUE" if 'bet_loss' in columns else 'FALSE'
+            self.settled = f"({self.won} OR {self.lost})"
+        else:
+            self.won = self.lost = self.settled = 'FALSE'
+        self.outcome_column = outcome
+        self.outcome = f"CASE WHEN {self.won} THEN 'won' WHEN {self.lost} THEN 'lost' ELSE 'pending' END"
+        stake = next((column for column in STAKE_COLUMNS if column in columns), None)
+        self.stake = f"{p}{stake}" if stake else '0'
+        # Without a profit column there is nothing to derive it from (odds vary)
+        self.profit = f"{p}profit_loss" if 'profit_loss' in columns else '0'
+
+
+class SchemaRegistry:
+    """Per-worker table/column snapshot and the SQL fragments compiled from it."""
+
+    def __init__(self, redis_client, loader, check_interval=30):
+        self.redis = redis_client
+        self.loader = loader
+        self.check_interval = check_interval
+        self._tables = ASSUMED_SCHEMA
+        self._compiled = {}
+        self._version = None
+        self._checked_at = 0
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._stats = {'probes': 0, 'errors': 0, 'compiled': 0}
+
+    def bump(self):
+        """Tell every worker to probe the schema again (call after a migration)."""
+        self._checked_at = 0
+        self._loaded = False
+        if self.redis:
+            return self.redis.incr(VERSION_KEY)
+
+    def _remote_version(self):
+        return self.redis.get(VERSION_KEY) if self.redis else None
+
+    def _sync(self):
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return
+        if not self._lock.acquire(blocking=False):
+            return  # another thread is probing; keep using the current snapshot
+        try:
+            if now - self._checked_at < self.check_interval:
+                return
+            try:
+                version = self._remote_version()
+                if not self._loaded or version != self._version:
+                    tables = self.loader()
+                    # Swap the snapshot and drop everything compiled from the old one
+                    self._tables, self._compiled = tables, {}
+                    self._version = version
+                    self._loaded = True
+                    self._stats['probes'] += 1
+                    logger.info(f"Schema probed: {len(tables)} tables")
+            except Exception as e:
+                self._stats['errors'] += 1
+                logger.error(f"Error probing database schema: {e}")
+            self._checked_at = now
+        finally:
+            self._lock.release()
+
+    def refresh(self):
+        """Probe now in this process."""
+        self._checked_at = 0
+        self._loaded = False
+        self._sync()
+        return self._loaded
+
+    def has_table(self, table):
+        self._sync()
+        return table in self._tables
+
+    def has_column(self, table, column):
+        self._sync()
+        return column in self._tables.get(table, ())
+
+    def compiled(self, key, build):
+        """build(tables) once per schema snapshot, cached under key."""
+        self._sync()
+        compiled = self._compiled
+        value = compiled.get(key)
+        if value is None:
+            value = compiled[key] = build(self._tables)
+            self._stats['compiled'] += 1
+        return value
+
+    def bets(self, alias=None):
+        """BetColumns for the bets table, optionally qualified with a table alias."""
+        return self.compiled(('bets', alias), lambda tables: BetColumns(tables.get('bets', ()), alias))
+
+    def user_name_sql(self, alias='u'):
+        """COALESCE over the users table's name columns, or None when there is nothing to join."""
+        def build(tables):
+            users = tables.get('users', ())
+            names = [f"{alias}.{column}" for column in USER_NAME_COLUMNS if column in users]
+            if 'user_id' not in users or not names:
+                return ''
+            return f"COALESCE({', '.join(names)}, 'Unknown User')"
+        return self.compiled(('user_name', alias), build) or None
+
+    def stats(self):
+        bets = self.bets()
+        return dict(self._stats, loaded=self._loaded, version=self._version, tables=len(self._tables),
+                    bet_outcome=bets.outcome_column, bet_stake=bets.stake)
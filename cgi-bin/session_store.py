@@ -0,0 +1,99 @@
+"""
+Server-side sessions stored in Redis.
+
+The cookie only carries a random session id; the session data lives in
+Redis under session:{sid} (encoded with the cache codec) and expires after
+the configured TTL. Requests for static files never touch Redis.
+"""
+
+import logging
+import secrets
+
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+logger = logging.getLogger(__name__)
+
+
+class RedisSession(CallbackDict, SessionMixin):
+    """Session dict that tracks modification and knows its Redis id."""
+
+    def __init__(self, initial=None, sid=None, new=False):
+        def on_update(self):
+            self.modified = True
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+        self.previous_sid = None
+
+    def regenerate(self):
+        """Move the data to a fresh id (call on login to prevent session fixation)."""
+        if self.sid and not self.new:
+            self.previous_sid = self.sid
+        self.sid = secrets.token_urlsafe(32)
+        self.new = True
+        self.modified = True
+
+
+class RedisSessionInterface(SessionInterface):
+    """Flask session interface keeping session data in Redis."""
+
+    def __init__(self, redis_client, codec, ttl=7 * 86400, prefix='session'):
+        self.redis = redis_client
+        self.codec = codec
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def _key(self, sid):
+        return f"{self.prefix}:{sid}"
+
+    def _is_static(self, app, request):
+        return app.static_url_path and request.path.startswith(app.static_url_path + '/')
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if not sid or self._is_static(app, request):
+            return RedisSession(sid=None, new=True)
+        try:
+            payload = self.redis.get(self._key(sid))
+            if payload is not None:
+                return RedisSession(self.codec.loads(payload), sid=sid)
+        except Exception as e:
+            # Redis trouble - carry on with an anonymous session for this request
+            logger.error(f"Session load error: {e}")
+        return RedisSession(sid=None, new=True)
+
+    def save_session(self, app, session, response):
+        if session.sid:
+            response.vary.add('Cookie')
+        if not session.modified:
+            return
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        try:
+            if session.previous_sid:
+                self.redis.delete(self._key(session.previous_sid))
+                session.previous_sid = None
+            if not session:
+                if session.sid:
+                    self.redis.delete(self._key(session.sid))
+                response.delete_cookie(name, domain=domain, path=path)
+                return
+            if not session.sid:
+                session.sid = secrets.token_urlsafe(32)
+            self.redis.setex(self._key(session.sid), self.ttl, self.codec.dumps(dict(session)))
+        except Exception as e:
+            logger.error(f"Session save error: {e}")
+            return
+        response.set_cookie(
+            name,
+            session.sid,
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app)
+        )
@@ -1,19 +1,44 @@
 import os
 import logging
+import click
 import logging.handlers
 import sys
-from flask import Flask, jsonify, render_template, request, redirect, url_for, session
+from flask import Flask, Response, jsonify, render_template, request, redirect, url_for, session, g, has_app_context, has_request_context
 from werkzeug.middleware.proxy_fix import ProxyFix
 from datetime import datetime
 import mysql.connector
 from mysql.connector import Error
 import psycopg2
 from psycopg2 import OperationalError
+from psycopg2 import Error as PostgresError
 import json
-import requests
+import gzip
 from dotenv import load_dotenv
 import redis
-import hashlib
+import threading
+import time
+import asyncio
+import aiohttp
+from background_loop import BackgroundLoop
+from discord_client import DEFAULT_API_BASE, DiscordAPIError, DiscordClient
+from db_pool import ConnectionPool, DatabaseUnavailable, PoolTimeout, SessionConnection
+from bet_rollup import BetRollup
+from leaderboard import LeaderboardEngine, period_start
+from cache import LayeredCache
+from cache_codec import CacheCodec
+from refresh_scheduler import RefreshScheduler
+from session_store import RedisSessionInterface
+from bot_guilds import BotGuildRegistry
+from guild_registry import GuildSettingsRegistry, load_guild_records
+from page_cache import PageCache
+from parallel_loader import Dataset, ParallelLoader
+from live_feed import LiveFeed
+from live_board import LiveBoardEngine
+from dimensions import DimensionCache, load_dimensions
+from schema import SchemaRegistry, load_schema
+from queries import execute, fetch_all, fetch_one, register
+from queries import stats as query_stats
+from circuit_breaker import CircuitBreaker, GuardedRedis
 
 # Load environment variables from .env file
 load_dotenv()
@@ -73,18 +98,19 @@ app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'your-secret-key-change-this'
 app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
 
 # Redis Configuration
+REDIS_SETTINGS = dict(
+    host=os.getenv('REDIS_HOST', 'localhost'),
+    port=int(os.getenv('REDIS_PORT', 6379)),
+    username=os.getenv('REDIS_USERNAME', None),
+    password=os.getenv('REDIS_PASSWORD', None),
+    db=int(os.getenv('REDIS_DB', 0)),
+    socket_connect_timeout=5,
+    socket_timeout=5,
+    retry_on_timeout=True
+)
+
 try:
-    redis_client = redis.Redis(
-        host=os.getenv('REDIS_HOST', 'localhost'),
-        port=int(os.getenv('REDIS_PORT', 6379)),
-        username=os.getenv('REDIS_USERNAME', None),
-        password=os.getenv('REDIS_PASSWORD', None),
-        db=int(os.getenv('REDIS_DB', 0)),
-        decode_responses=True,
-        socket_connect_timeout=5,
-        socket_timeout=5,
-        retry_on_timeout=True
-    )
+    redis_client = redis.Redis(decode_responses=True, **REDIS_SETTINGS)
     # Test connection
     redis_client.ping()
     logger.info("[OK] Redis connection established successfully")
@@ -92,178 +118,532 @@ except Exception as e:
     logger.error(f"[ERROR] Redis connection failed: {e}")
     redis_client = None
 
-def get_cache_key(*args):
-    """Generate a cache key from arguments."""
-    key_string = "|".join(str(arg) for arg in args)
-    return hashlib.md5(key_string.encode()).hexdigest()
+# Circuit breakers - fail fast instead of waiting on connect timeouts during outages
+BREAKER_FAILURE_THRESHOLD = float(os.getenv('BREAKER_FAILURE_THRESHOLD', 0.5))
+BREAKER_MINIMUM_CALLS = int(os.getenv('BREAKER_MINIMUM_CALLS', 5))
+BREAKER_WINDOW = int(os.getenv('BREAKER_WINDOW', 30))
+BREAKER_OPEN_TIMEOUT = int(os.getenv('BREAKER_OPEN_TIMEOUT', 60))
+BREAKER_PROBE_INTERVAL = int(os.getenv('BREAKER_PROBE_INTERVAL', 5))
+
+def _probe_database():
+    """Background probe for the database breaker (borrows and returns a connection)."""
+    get_db_pool().acquire(timeout=2).close()
+
+db_breaker = CircuitBreaker(
+    'database',
+    failure_threshold=BREAKER_FAILURE_THRESHOLD,
+    minimum_calls=BREAKER_MINIMUM_CALLS,
+    window=BREAKER_WINDOW,
+    open_timeout=BREAKER_OPEN_TIMEOUT,
+    probe=_probe_database,
+    probe_interval=BREAKER_PROBE_INTERVAL
+)
 
-def cache_get(key, default=None):
-    """Get value from Redis cache."""
-    if not redis_client:
-        return default
-    try:
-        value = redis_client.get(key)
-        return json.loads(value) if value else default
-    except Exception as e:
-        logger.error(f"Cache get error: {e}")
-        return default
+redis_breaker = None
+if redis_client:
+    _raw_redis_client = redis_client
+    redis_breaker = CircuitBreaker(
+        'redis',
+        failure_threshold=BREAKER_FAILURE_THRESHOLD,
+        minimum_calls=BREAKER_MINIMUM_CALLS,
+        window=BREAKER_WINDOW,
+        open_timeout=BREAKER_OPEN_TIMEOUT,
+        probe=_raw_redis_client.ping,
+        probe_interval=BREAKER_PROBE_INTERVAL,
+        failure_exceptions=(redis.exceptions.ConnectionError, redis.exceptions.TimeoutError)
+    )
+    redis_client = GuardedRedis(_raw_redis_client, redis_breaker)
+
+# Cache payloads are binary (see cache_codec), so the cache gets its own
+# non-decoding client sharing the Redis breaker
+cache_redis_client = None
+if redis_client:
+    cache_redis_client = GuardedRedis(redis.Redis(decode_responses=False, **REDIS_SETTINGS), redis_breaker)
+
+# Two-tier cache (in-process LRU + Redis)
+cache = LayeredCache(
+    cache_redis_client,
+    codec=CacheCodec(
+        compress_threshold=int(os.getenv('CACHE_COMPRESS_THRESHOLD', 1024)),
+        use_msgpack=os.getenv('CACHE_USE_MSGPACK', 'true').lower() == 'true'
+    ),
+    local_max_size=int(os.getenv('CACHE_LOCAL_MAX_SIZE', 512)),
+    negative_ttl=int(os.getenv('CACHE_NEGATIVE_TTL', 30)),
+    jitter=float(os.getenv('CACHE_TTL_JITTER', 0.1)),
+    lock_lease=int(os.getenv('CACHE_LOCK_LEASE', 30)),
+    lock_wait=float(os.getenv('CACHE_LOCK_WAIT', 5)),
+    early_refresh_beta=float(os.getenv('CACHE_EARLY_REFRESH_BETA', 1.0)),
+    stale_ttl=int(os.getenv('CACHE_STALE_TTL', 3600))  # keep last good copies for an hour
+)
+cache.configure('active_guilds', max_size=1, ttl=120)  # 2 minutes
+cache.configure('guild_stats', max_size=1000, ttl=60)
+# Only changes through update_guild_customization, which writes through
+cache.configure('guild_customization', max_size=1000,
+                ttl=int(os.getenv('GUILD_CUSTOMIZATION_CACHE_TTL', 3600)))
+cache.configure('pages', max_size=int(os.getenv('PAGE_CACHE_MAX_SIZE', 256)), stale_ttl=0)
+
+# Rendered anonymous pages; purge('guild:<id>') drops every page of a guild
+PAGE_CACHE_TTL = int(os.getenv('PAGE_CACHE_TTL', 60))
+page_cache = PageCache(
+    cache,
+    redis_client,
+    enabled=os.getenv('PAGE_CACHE_ENABLED', 'true').lower() == 'true',
+    browser_max_age=int(os.getenv('PAGE_CACHE_BROWSER_MAX_AGE', 0))
+)
 
-def cache_set(key, value, expire=300):
-    """Set value in Redis cache with expiration (default 5 minutes)."""
-    if not redis_client:
-        return False
-    try:
-        redis_client.setex(key, expire, json.dumps(value))
-        return True
-    except Exception as e:
-        logger.error(f"Cache set error: {e}")
-        return False
+# Refresh-ahead for the hottest keys: recomputed in the background before
+# their TTL lapses, so requests read them from cache. Intervals stay below
+# the namespace TTLs above. The live_games job also feeds the SSE stream.
+REFRESH_SCHEDULER_ENABLED = os.getenv('REFRESH_SCHEDULER_ENABLED', 'true').lower() == 'true'
+refresh_scheduler = RefreshScheduler(
+    redis_client,
+    leader_ttl=int(os.getenv('REFRESH_LEADER_TTL', 15)),
+    jitter=float(os.getenv('REFRESH_JITTER', 0.1))
+)
+refresh_scheduler.register('live_games', int(os.getenv('REFRESH_LIVE_GAMES_INTERVAL', 15)),
+                           lambda: _refresh_live_games())
+refresh_scheduler.register('active_guilds', int(os.getenv('REFRESH_ACTIVE_GUILDS_INTERVAL', 60)),
+                           lambda: cache.refresh('active_guilds', 'top', _load_active_guilds))
+refresh_scheduler.register('bot_guilds', int(os.getenv('REFRESH_BOT_GUILDS_INTERVAL', 120)),
+                           lambda: bot_guild_registry.refresh())
+
+@app.before_request
+def start_refresh_scheduler():
+    """Start the refresh and cache invalidation threads in this worker on its first request."""
+    if REFRESH_SCHEDULER_ENABLED:
+        refresh_scheduler.start()
+    cache.start_listener()
+    dimension_cache.warm()
+
+# Live score changes pushed to browsers over SSE. Each stream served by this
+# route holds a server thread, so SSE_MAX_CLIENTS stays well below
+# WEB_THREADS; production serves the stream from the non-blocking
+# live_stream server (LIVE_STREAM_BIND) and this route is the fallback.
+SSE_HEARTBEAT = int(os.getenv('SSE_HEARTBEAT', 15))
+SSE_MAX_DURATION = int(os.getenv('SSE_MAX_DURATION', 300))
+live_feed = LiveFeed(
+    redis_client,
+    history_size=int(os.getenv('SSE_HISTORY_SIZE', 200)),
+    max_clients=int(os.getenv('SSE_MAX_CLIENTS', 2))
+)
 
-def get_db_connection():
-    """Create database connection with optimized settings."""
+def _refresh_live_games():
+    """Sync the live board and push its score/status changes to streams."""
+    live_feed.publish_board(get_live_games())
+
+def _record_stale_data(namespace, key, age):
+    """Remember stale cache reads so templates can flag out-of-date data."""
+    if has_app_context():
+        g.setdefault('stale_data', []).append({'source': namespace, 'age': int(age)})
+
+cache.on_stale = _record_stale_data
+
+# Server-side sessions: the cookie holds only a session id, the data lives in Redis
+SESSION_TTL = int(os.getenv('SESSION_TTL', 7 * 86400))  # 7 days
+# Logged-in sessions are permanent, so the cookie lives as long as the Redis copy
+app.config['PERMANENT_SESSION_LIFETIME'] = SESSION_TTL
+SERVER_SIDE_SESSIONS = cache_redis_client is not None
+if SERVER_SIDE_SESSIONS:
+    app.session_interface = RedisSessionInterface(cache_redis_client, cache.codec, ttl=SESSION_TTL)
+else:
+    logger.warning("Redis unavailable - falling back to cookie sessions")
+
+@app.context_processor
+def inject_stale_data():
+    """Expose stale-data markers (empty when everything is fresh) to templates."""
+    return {'stale_data': g.get('stale_data', [])}
+
+# Driver errors of either database
+DB_ERRORS = (Error, PostgresError)
+
+# Database connection pool settings
+DB_POOL_MIN_SIZE = int(os.getenv('DB_POOL_MIN_SIZE', 2))
+DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', 10))
+DB_POOL_CHECKOUT_TIMEOUT = float(os.getenv('DB_POOL_CHECKOUT_TIMEOUT', 5))
+DB_POOL_MAX_LIFETIME = int(os.getenv('DB_POOL_MAX_LIFETIME', 1800))  # 30 minutes
+
+_db_pool = None
+_db_pool_lock = threading.Lock()
+
+def _connect_postgres():
+    """Open a new raw PostgreSQL connection."""
+    connection = psycopg2.connect(
+        host=os.getenv('POSTGRES_HOST', 'localhost'),
+        user=os.getenv('POSTGRES_USER', 'postgres'),
+        password=os.getenv('POSTGRES_PASSWORD', ''),
+        database=os.getenv('POSTGRES_DB', 'dbsbm'),
+        port=int(os.getenv('POSTGRES_PORT', 5432)),
+        connect_timeout=5
+    )
+    connection.autocommit = True
+    return connection
+
+def _connect_mysql():
+    """Open a new raw MySQL connection."""
+    return mysql.connector.connect(
+        host=os.getenv('MYSQL_HOST', 'localhost'),
+        user=os.getenv('MYSQL_USER', 'dbsbm'),
+        password=os.getenv('MYSQL_PASSWORD', ''),
+        database=os.getenv('MYSQL_DB', 'dbsbm'),
+        port=int(os.getenv('MYSQL_PORT', 3306)),
+        # Performance optimizations
+        connection_timeout=5,
+        autocommit=True,
+        # Buffer results so helpers sharing the request connection never
+        # trip over each other's unread rows
+        buffered=True
+    )
+
+def get_db_pool():
+    """Get the process-wide connection pool, creating it on first use."""
+    global _db_pool
+    if _db_pool is None:
+        with _db_pool_lock:
+            if _db_pool is None:
+                # Try PostgreSQL first (preferred), fallback to MySQL
+                if os.getenv('POSTGRES_HOST'):
+                    connect, name = _connect_postgres, 'postgres_pool'
+                else:
+                    connect, name = _connect_mysql, 'mysql_pool'
+                pool = ConnectionPool(
+                    connect,
+                    name=name,
+                    min_size=DB_POOL_MIN_SIZE,
+                    max_size=DB_POOL_MAX_SIZE,
+                    checkout_timeout=DB_POOL_CHECKOUT_TIMEOUT,
+                    max_lifetime=DB_POOL_MAX_LIFETIME
+                )
+                pool.warm()
+                _db_pool = pool
+    return _db_pool
+
+def _borrow_db_connection():
+    """Borrow a database connection from the shared pool (close() returns it)."""
+    if not db_breaker.allow():
+        # Database is down - fail fast rather than wait on the connect timeout
+        return None
     try:
-        # Try PostgreSQL first (preferred)
-        if os.getenv('POSTGRES_HOST'):
-            connection = psycopg2.connect(
-                host=os.getenv('POSTGRES_HOST', 'localhost'),
-                user=os.getenv('POSTGRES_USER', 'postgres'),
-                password=os.getenv('POSTGRES_PASSWORD', ''),
-                database=os.getenv('POSTGRES_DB', 'dbsbm'),
-                port=int(os.getenv('POSTGRES_PORT', 5432))
-            )
-            connection.autocommit = True
-            return connection
-        else:
-            # Fallback to MySQL
-            connection = mysql.connector.connect(
-                host=os.getenv('MYSQL_HOST', 'localhost'),
-                user=os.getenv('MYSQL_USER', 'dbsbm'),
-                password=os.getenv('MYSQL_PASSWORD', ''),
-                database=os.getenv('MYSQL_DB', 'dbsbm'),
-                port=int(os.getenv('MYSQL_PORT', 3306)),
-                # Performance optimizations
-                connection_timeout=5,
-                autocommit=True,
-                pool_name='web_pool',
-                pool_size=10,
-                pool_reset_session=True
-            )
-            return connection
+        connection = get_db_pool().acquire()
+    except PoolTimeout as e:
+        # Pool saturation is load, not an outage - don't trip the breaker
+        logger.error(f"Error connecting to database: {e}")
+        return None
     except (OperationalError, Error) as e:
+        db_breaker.record_failure()
         logger.error(f"Error connecting to database: {e}")
         return None
+    db_breaker.record_success()
+    return connection
+
+def get_db_connection():
+    """Get a database connection; callers close() it when done.
+
+    Inside a Flask app context every helper shares one request-scoped
+    connection, checked out on first use and released in teardown.
+    """
+    if not has_app_context():
+        return _borrow_db_connection()
+
+    db_session = g.get('db_session')
+    if db_session is None:
+        if g.get('db_unavailable'):
+            # Already failed once during this request, don't wait again
+            return None
+        pooled = _borrow_db_connection()
+        if pooled is None:
+            g.db_unavailable = True
+            return None
+        label = request.path if has_request_context() else '-'
+        db_session = g.db_session = SessionConnection(pooled, label)
+    return db_session
+
+@app.teardown_appcontext
+def release_db_session(exception=None):
+    """Return the request-scoped connection to the pool and log its usage."""
+    db_session = g.pop('db_session', None)
+    if db_session is None:
+        return
+    db_session.release()
+    logger.info(f"[DB] {db_session.label}: {db_session.query_count} queries, {db_session.db_time * 1000:.1f}ms DB time")
+
+def query_db(name, params=None, one=False, **fragments):
+    """Run a named read query and return its first row (one=True) or all rows, as dicts."""
+    connection = get_db_connection()
+    if not connection:
+        raise DatabaseUnavailable("No database connection")
+    try:
+        if one:
+            return fetch_one(connection, name, params, **fragments)
+        return fetch_all(connection, name, params, **fragments)
+    finally:
+        connection.close()
+
+# Independent page queries run concurrently: one on the request's own
+# connection, the rest each in its own app context and pooled connection.
+# Every request thread may hold a connection too, so the loader gets at most
+# the pool's share per thread and runs datasets inline when it is busy.
+page_loader = ParallelLoader(
+    max_workers=max(1, min(int(os.getenv('PAGE_LOADER_WORKERS', 8)),
+                           DB_POOL_MAX_SIZE // int(os.getenv('WEB_THREADS', 4)))),
+    default_timeout=float(os.getenv('PAGE_LOADER_TIMEOUT', 5)),
+    context_factory=app.app_context
+)
+
+def _with_stale_markers(func):
+    def run():
+        # Only the markers this dataset recorded, whichever context it ran in
+        stale = g.setdefault('stale_data', [])
+        before = len(stale)
+        value = func()
+        recorded = stale[before:]
+        del stale[before:]
+        return value, recorded
+    return run
+
+def load_page_data(*datasets):
+    """Fetch a page's datasets concurrently; failed or slow ones get their default."""
+    result = page_loader.load([
+        Dataset(d.name, _with_stale_markers(d.func), d.timeout, d.default) for d in datasets
+    ])
+    for dataset in datasets:
+        if dataset.name in result.errors:
+            continue
+        result[dataset.name], stale = result[dataset.name]
+        if stale and has_app_context():
+            # Carry stale-data markers back to the request (see _record_stale_data)
+            g.setdefault('stale_data', []).extend(stale)
+    return result
+
+def init_worker():
+    """Reset per-process state in a freshly forked server worker.
+
+    Only needed when the app is imported before forking (preload); sockets,
+    locks and threads inherited from the parent must not be reused.
+    """
+    global _db_pool_lock
+    _db_pool_lock = threading.Lock()
+    if _db_pool is not None:
+        _db_pool.reset_after_fork()
+    db_breaker.reset()
+    if redis_breaker:
+        redis_breaker.reset()
+    cache.reset_local()
+    # The refresh thread and the Discord event loop restart on first use
+    logger.info(f"[OK] Worker {os.getpid()} initialised")
 
 def get_active_guilds():
     """Get active guilds with their stats."""
-    # Check cache first
-    cache_key = get_cache_key("active_guilds")
-    cached_result = cache_get(cache_key)
-    if cached_result is not None:
-        return cached_result
-    
+    # Cached; concurrent misses across threads and workers share one query
+    try:
+        return cache.get_or_load('active_guilds', 'top', _load_active_guilds)
+    except Exception as e:
+        logger.error(f"Error fetching active guilds: {e}")
+        return []
+
+ACTIVE_GUILDS = register('guilds.active', """
+    SELECT 
+        gs.guild_id,
+        gs.guild_name,
+        gs.subscription_level,
+        COALESCE(SUM(CASE 
+            WHEN b.created_at >= {ago:1 MONTH} 
+            THEN {bets.stake} 
+            ELSE 0 
+        END), 0) as monthly_units,
+        COALESCE(SUM(CASE 
+            WHEN b.created_at >= {ago:1 YEAR} 
+            THEN {bets.stake} 
+            ELSE 0 
+        END), 0) as yearly_units
+    FROM guild_settings gs
+    LEFT JOIN bets b ON gs.guild_id = b.guild_id
+    WHERE gs.is_active = TRUE
+    GROUP BY gs.guild_id, gs.guild_name, gs.subscription_level
+    ORDER BY yearly_units DESC
+    LIMIT 10
+""")
+
+def _load_active_guilds():
+    """Query active guilds with their monthly/yearly units."""
     connection = get_db_connection()
     if not connection:
-        return []
+        raise DatabaseUnavailable("No database connection")
     
     try:
-        cursor = connection.cursor(dictionary=True)
-        
         # Get guilds from guild_settings with their real names and monthly/yearly units
-        query = """
-        SELECT 
-            gs.guild_id,
-            COALESCE(gs.guild_name, CONCAT('Guild ', RIGHT(gs.guild_id, 6))) as guild_name,
-            gs.subscription_level,
-            COALESCE(SUM(CASE 
-                WHEN b.created_at >= DATE_SUB(NOW(), INTERVAL 1 MONTH) 
-                THEN b.units 
-                ELSE 0 
-            END), 0) as monthly_units,
-            COALESCE(SUM(CASE 
-                WHEN b.created_at >= DATE_SUB(NOW(), INTERVAL 1 YEAR) 
-                THEN b.units 
-                ELSE 0 
-            END), 0) as yearly_units
-        FROM guild_settings gs
-        LEFT JOIN bets b ON gs.guild_id = b.guild_id
-    WHERE gs.is_active = TRUE
-        GROUP BY gs.guild_id, gs.guild_name, gs.subscription_level
-        ORDER BY yearly_units DESC
-        LIMIT 10
-        """
-        
-        cursor.execute(query)
-        guilds = cursor.fetchall()
-        cursor.close()
-        
-        # Cache for 2 minutes
-        cache_set(cache_key, guilds, expire=120)
+        guilds = fetch_all(connection, ACTIVE_GUILDS, bets=schema_registry.bets('b'))
+        for guild in guilds:
+            guild['guild_name'] = guild['guild_name'] or f"Guild {str(guild['guild_id'])[-6:]}"
         return guilds
         
-    except Error as e:
-        logger.error(f"Error fetching active guilds: {e}")
-        return []
     finally:
-        if connection.is_connected():
-            connection.close()
+        connection.close()
 
 
+def _load_schema():
+    """Probe the database's tables and columns."""
+    connection = get_db_connection()
+    if not connection:
+        raise DatabaseUnavailable("No database connection")
+    try:
+        return load_schema(connection)
+    finally:
+        connection.close()
+
+# Tables and columns are probed once per worker; queries compile against them
+schema_registry = SchemaRegistry(
+    redis_client,
+    _load_schema,
+    check_interval=int(os.getenv('SCHEMA_CHECK_INTERVAL', 30))
+)
+
+def _optional_bet_column(column, alias='b'):
+    """A bets column if this schema has it, else NULL."""
+    return f"{alias}.{column}" if schema_registry.has_column('bets', column) else 'NULL'
+
+@app.cli.command('refresh-schema')
+def refresh_schema_command():
+    """Make every worker probe the schema again (run after a migration)."""
+    version = schema_registry.bump()
+    if not schema_registry.refresh():
+        raise click.ClickException("Database unavailable")
+    click.echo(f"Schema version is now {version}" if version else "Redis unavailable - restart workers to pick up the change")
+    for table in ('bets', 'users', 'guild_customization'):
+        click.echo(f"  {table}: {'present' if schema_registry.has_table(table) else 'missing'}")
+    click.echo(f"  bet outcome column: {schema_registry.bets().outcome_column or 'none'}")
+
+def _load_guild_records():
+    """Load every guild's settings for the registry snapshot."""
+    connection = get_db_connection()
+    if not connection:
+        raise DatabaseUnavailable("No database connection")
+    try:
+        return load_guild_records(connection)
+    finally:
+        connection.close()
+
+# guild_settings is tiny - each worker keeps all of it in memory
+guild_registry = GuildSettingsRegistry(
+    redis_client,
+    _load_guild_records,
+    check_interval=int(os.getenv('GUILD_SETTINGS_CHECK_INTERVAL', 5)),
+    max_age=int(os.getenv('GUILD_SETTINGS_MAX_AGE', 300))
+)
+
+@app.cli.command('reload-guild-settings')
+def reload_guild_settings_command():
+    """Make every worker reload guild settings (run after editing guild_settings)."""
+    version = guild_registry.bump()
+    page_cache.purge('guilds')
+    click.echo(f"Guild settings version is now {version}" if version else "Redis unavailable - workers reload on their own schedule")
+
+
+DEFAULT_GUILD_CUSTOMIZATION = {
+    'page_title': None,
+    'page_description': None,
+    'welcome_message': None,
+    'primary_color': '#667eea',
+    'secondary_color': '#764ba2',
+    'accent_color': '#5865F2',
+    'hero_image': None,
+    'logo_image': None,
+    'background_image': None,
+    'about_section': None,
+    'features_section': None,
+    'rules_section': None,
+    'discord_invite': None,
+    'website_url': None,
+    'twitter_url': None,
+    'show_leaderboard': True,
+    'show_recent_bets': True,
+    'show_stats': True,
+    'public_access': False
+}
+
+# Fields guild admins can edit on the customization page
+CUSTOMIZATION_FIELDS = [
+    'page_title', 'page_description', 'welcome_message',
+    'primary_color', 'secondary_color', 'accent_color',
+    'hero_image', 'logo_image', 'background_image',
+    'about_section', 'features_section', 'rules_section',
+    'discord_invite', 'website_url', 'twitter_url',
+    'show_leaderboard', 'show_recent_bets', 'show_stats', 'public_access'
+]
+
+GUILD_CUSTOMIZATION = register('guild_customization.get', """
+    SELECT * FROM guild_customization 
+    WHERE guild_id = :guild_id
+""")
+
+GUILD_CUSTOMIZATION_EXISTS = register('guild_customization.exists', """
+    SELECT id FROM guild_customization WHERE guild_id = :guild_id
+""")
+
+GUILD_CUSTOMIZATION_CREATE = register('guild_customization.create', """
+    INSERT INTO guild_customization (
+        guild_id, page_title, page_description, welcome_message,
+        primary_color, secondary_color, accent_color,
+        show_leaderboard, show_recent_bets, show_stats, public_access
+    ) VALUES (
+        :guild_id, :page_title, :page_description, :welcome_message,
+        :primary_color, :secondary_color, :accent_color,
+        :show_leaderboard, :show_recent_bets, :show_stats, :public_access
+    )
+""")
+
+# Upserts writing only the fields a save supplies, registered per field set
+# on first use (forms send one of a handful of sets)
+_customization_upserts = {}
+_customization_upserts_lock = threading.Lock()
+
+def _customization_upsert(fields):
+    """Named upsert of a tuple of CUSTOMIZATION_FIELDS (other columns are left alone)."""
+    name = _customization_upserts.get(fields)
+    if name is None:
+        with _customization_upserts_lock:
+            name = _customization_upserts.get(fields)
+            if name is None:
+                name = register(f"guild_customization.upsert.{','.join(fields)}", f"""
+                    INSERT INTO guild_customization (guild_id, {', '.join(fields)})
+                    VALUES (:guild_id, {', '.join(':' + field for field in fields)})
+                    {{upsert:guild_id}} {', '.join(f'{field} = {{excluded:{field}}}' for field in fields)}
+                """)
+                _customization_upserts[fields] = name
+    return name
+
+def _fetch_guild_customization(connection, guild_id):
+    """Customization row for a guild, or the default settings if none exist."""
+    customization = fetch_one(connection, GUILD_CUSTOMIZATION, {'guild_id': guild_id})
+    return customization or dict(DEFAULT_GUILD_CUSTOMIZATION, guild_id=guild_id)
+
+def _load_guild_customization(guild_id):
+    connection = get_db_connection()
+    if not connection:
+        raise DatabaseUnavailable("No database connection")
+    try:
+        return _fetch_guild_customization(connection, guild_id)
+    finally:
+        connection.close()
+
 def get_guild_customization(guild_id):
     """Get guild customization settings."""
+    # Cached, defaults included; updates write through and notify other workers
     try:
-        connection = get_db_connection()
-        if connection:
-            cursor = connection.cursor(dictionary=True)
-            cursor.execute("""
-                SELECT * FROM guild_customization 
-                WHERE guild_id = %s
-            """, (guild_id,))
-            customization = cursor.fetchone()
-            cursor.close()
-            connection.close()
-            
-            # Return default settings if none exist
-            if not customization:
-                return {
-                    'guild_id': guild_id,
-                    'page_title': None,
-                    'page_description': None,
-                    'welcome_message': None,
-                    'primary_color': '#667eea',
-                    'secondary_color': '#764ba2',
-                    'accent_color': '#5865F2',
-                    'hero_image': None,
-                    'logo_image': None,
-                    'background_image': None,
-                    'about_section': None,
-                    'features_section': None,
-                    'rules_section': None,
-                    'discord_invite': None,
-                    'website_url': None,
-                    'twitter_url': None,
-                    'show_leaderboard': True,
-                    'show_recent_bets': True,
-                    'show_stats': True,
-                    'public_access': False
-                }
-            return customization
-    except Error as e:
+        return cache.get_or_load('guild_customization', guild_id,
+                                 lambda: _load_guild_customization(guild_id))
+    except Exception as e:
         logger.error(f"Error fetching guild customization: {e}")
         return None
 
 
 def create_default_guild_customization(guild_id, guild_name=None):
     """Create default customization settings for a new guild."""
+    connection = None
     try:
         connection = get_db_connection()
         if connection:
-            cursor = connection.cursor()
-            
             # Check if customization already exists
-            cursor.execute("SELECT id FROM guild_customization WHERE guild_id = %s", (guild_id,))
-            if cursor.fetchone():
-                cursor.close()
-                connection.close()
+            if fetch_one(connection, GUILD_CUSTOMIZATION_EXISTS, {'guild_id': guild_id}):
                 return True
                 
             # Create default customization
@@ -271,344 +651,287 @@ def create_default_guild_customization(guild_id, guild_name=None):
             default_description = "Track bets, compete with friends, and analyze your betting performance."
             default_welcome = f"Welcome to {guild_name or 'our betting community'}! Track your bets and see how you stack up against other members."
             
-            cursor.execute("""
-                INSERT INTO guild_customization (
-                    guild_id, page_title, page_description, welcome_message,
-                    primary_color, secondary_color, accent_color,
-                    show_leaderboard, show_recent_bets, show_stats, public_access
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """, (
-                guild_id, default_title, default_description, default_welcome,
-                '#667eea', '#764ba2', '#5865F2',
-                True, True, True, False
-            ))
+            execute(connection, GUILD_CUSTOMIZATION_CREATE, {
+                'guild_id': guild_id,
+                'page_title': default_title,
+                'page_description': default_description,
+                'welcome_message': default_welcome,
+                'primary_color': '#667eea',
+                'secondary_color': '#764ba2',
+                'accent_color': '#5865F2',
+                'show_leaderboard': True,
+                'show_recent_bets': True,
+                'show_stats': True,
+                'public_access': False
+            })
             
             connection.commit()
-            cursor.close()
-            connection.close()
+            cache.invalidate('guild_customization', guild_id)
+            page_cache.purge(f'guild:{guild_id}')
             return True
             
-    except Error as e:
+    except DB_ERRORS as e:
         logger.error(f"Error creating default guild customization: {e}")
         return False
+    finally:
+        if connection:
+            connection.close()
 
 
 def update_guild_customization(guild_id, settings):
     """Update guild customization settings."""
+    connection = None
     try:
         connection = get_db_connection()
         if connection:
-            cursor = connection.cursor()
-            
-            # Build dynamic update query
-            set_clauses = []
-            values = []
-            
-            allowed_fields = [
-                'page_title', 'page_description', 'welcome_message',
-                'primary_color', 'secondary_color', 'accent_color',
-                'hero_image', 'logo_image', 'background_image',
-                'about_section', 'features_section', 'rules_section',
-                'discord_invite', 'website_url', 'twitter_url',
-                'show_leaderboard', 'show_recent_bets', 'show_stats', 'public_access'
-            ]
-            
-            for field in allowed_fields:
-                if field in settings:
-                    set_clauses.append(f"{field} = %s")
-                    values.append(settings[field])
-            
-            if not set_clauses:
+            fields = tuple(field for field in CUSTOMIZATION_FIELDS if field in settings)
+            if not fields:
                 return False
-                
-            values.append(guild_id)
-            query = f"""
-                INSERT INTO guild_customization (guild_id, {', '.join(allowed_fields)})
-                VALUES (%s, {', '.join(['%s'] * len(allowed_fields))})
-                ON DUPLICATE KEY UPDATE {', '.join(set_clauses)}
-            """
             
-            # For INSERT part, we need all values
-            insert_values = [guild_id] + [settings.get(field) for field in allowed_fields]
-            
-            cursor.execute(f"""
-                INSERT INTO guild_customization (guild_id, {', '.join(allowed_fields)})
-                VALUES ({', '.join(['%s'] * (len(allowed_fields) + 1))})
-                ON DUPLICATE KEY UPDATE {', '.join(set_clauses)}
-            """, insert_values + values)
+            # Only the supplied columns are set, so concurrent saves of
+            # different fields don't overwrite each other
+            execute(connection, _customization_upsert(fields),
+                    dict({field: settings[field] for field in fields}, guild_id=guild_id))
             
             connection.commit()
-            cursor.close()
-            connection.close()
+            
+            # Write through so the next page view needs no query, then tell other workers
+            cache.set('guild_customization', guild_id, _fetch_guild_customization(connection, guild_id))
+            cache.publish_invalidation('guild_customization', guild_id)
+            page_cache.purge(f'guild:{guild_id}')
             return True
             
-    except Error as e:
+    except DB_ERRORS as e:
         logger.error(f"Error updating guild customization: {e}")
         return False
+    finally:
+        if connection:
+            connection.close()
+
+
+# Discord permission bits: 0x8 = Administrator, 0x20 = Manage Guild
+ADMIN_PERMISSION_BITS = 0x8 | 0x20
 
+def build_guild_permissions(accessible_guilds):
+    """Map guild_id -> permission bits for the guilds a user can access."""
+    permissions = {}
+    for guild in accessible_guilds:
+        try:
+            # Discord sends permissions as a string in newer API versions
+            permissions[str(guild['id'])] = int(guild.get('permissions') or 0)
+        except (TypeError, ValueError):
+            permissions[str(guild['id'])] = 0
+    return permissions
+
+def get_guild_permissions(guild_id):
+    """Permission bits of the current user in a guild, or None without access."""
+    permissions = session.get('guild_permissions')
+    if permissions is None:
+        # Cookie sessions don't carry the index - build it once per request
+        permissions = g.get('guild_permissions')
+        if permissions is None:
+            discord_user = session.get('discord_user') or {}
+            permissions = g.guild_permissions = build_guild_permissions(discord_user.get('accessible_guilds', []))
+    return permissions.get(str(guild_id))
 
 def check_guild_admin_access(guild_id):
     """Check if current user has admin access to guild."""
-    if 'discord_user' not in session:
-        return False
-    
-    user_guilds = session['discord_user'].get('accessible_guilds', [])
-    for guild in user_guilds:
-        if guild['id'] == str(guild_id):
-            # Check if user has admin permissions (manage server, administrator, etc.)
-            permissions = guild.get('permissions', 0)
-            # 0x8 = Administrator, 0x20 = Manage Guild
-            return (permissions & 0x8) == 0x8 or (permissions & 0x20) == 0x20
-    return False
-
+    permissions = get_guild_permissions(guild_id)
+    return permissions is not None and bool(permissions & ADMIN_PERMISSION_BITS)
+
+
+GUILD_PUBLIC_STATS = register('bets.guild_public_stats', """
+    SELECT 
+        COUNT(DISTINCT user_id) as total_bettors,
+        COUNT(*) as total_bets,
+        COALESCE(SUM(CASE WHEN {bets.won} THEN 1 ELSE 0 END), 0) as total_wins,
+        COALESCE(SUM(CASE WHEN {bets.lost} THEN 1 ELSE 0 END), 0) as total_losses,
+        COALESCE(SUM(CASE WHEN {bets.won} THEN {bets.profit} ELSE 0 END), 0) as total_winnings,
+        COALESCE(SUM({bets.profit}), 0) as net_profit
+    FROM bets 
+    WHERE guild_id = :guild_id AND {bets.settled}
+""")
 
 def get_guild_public_stats(guild_id):
     """Get public guild statistics."""
+    connection = None
     try:
         connection = get_db_connection()
         if connection:
-            cursor = connection.cursor(dictionary=True)
-            cursor.execute("""
-                SELECT 
-                    COUNT(DISTINCT user_id) as total_bettors,
-                    COUNT(*) as total_bets,
-                    COALESCE(SUM(CASE WHEN result = 'won' THEN 1 ELSE 0 END), 0) as total_wins,
-                    COALESCE(SUM(CASE WHEN result = 'lost' THEN 1 ELSE 0 END), 0) as total_losses,
-                    COALESCE(SUM(CASE WHEN result = 'won' THEN profit_loss ELSE 0 END), 0) as total_winnings,
-                    COALESCE(SUM(profit_loss), 0) as net_profit
-                FROM bets 
-                WHERE guild_id = %s AND result IN ('won', 'lost')
-            """, (guild_id,))
-            stats = cursor.fetchone()
-            cursor.close()
-            connection.close()
-            return stats
-    except Error as e:
+            return fetch_one(connection, GUILD_PUBLIC_STATS, {'guild_id': guild_id},
+                             bets=schema_registry.bets())
+    except DB_ERRORS as e:
         logger.error(f"Error fetching guild public stats: {e}")
         return None
+    finally:
+        if connection:
+            connection.close()
 
 
-def get_guild_leaderboard(guild_id, limit=10):
-    """Get guild leaderboard."""
+# Leaderboard engine (Redis sorted sets, falls back to SQL without Redis)
+leaderboard_engine = LeaderboardEngine(
+    redis_client,
+    schema=schema_registry
+) if redis_client else None
+
+def _sync_leaderboards():
+    """Apply newly settled bets, then build new guilds and rolled-over periods."""
+    connection = get_db_connection()
+    if not connection:
+        raise DatabaseUnavailable("No database connection")
+    try:
+        leaderboard_engine.sync(connection)
+        leaderboard_engine.build_pending(connection)
+    finally:
+        connection.close()
+
+if leaderboard_engine:
+    refresh_scheduler.register('leaderboards', int(os.getenv('LEADERBOARD_SYNC_INTERVAL', 30)), _sync_leaderboards)
+
+LEADERBOARD_ORDER = {
+    'profit': 'net_profit DESC, win_rate DESC',
+    'wins': 'wins DESC, total_bets DESC'
+}
+
+GUILD_LEADERBOARD = register('bets.guild_leaderboard', """
+    SELECT 
+        user_id,
+        COUNT(*) as total_bets,
+        SUM(CASE WHEN {bets.won} THEN 1 ELSE 0 END) as wins,
+        SUM(CASE WHEN {bets.lost} THEN 1 ELSE 0 END) as losses,
+        ROUND(
+            (SUM(CASE WHEN {bets.won} THEN 1 ELSE 0 END) * 100.0) / 
+            NULLIF(SUM(CASE WHEN {bets.settled} THEN 1 ELSE 0 END), 0), 
+            1
+        ) as win_rate,
+        COALESCE(SUM({bets.profit}), 0) as net_profit
+    FROM bets 
+    WHERE guild_id = :guild_id AND {bets.settled} {since}
+    GROUP BY user_id
+    HAVING COUNT(*) >= 3
+    ORDER BY {order}
+    LIMIT :limit
+""")
+
+def get_guild_leaderboard(guild_id, limit=10, window='all', metric='profit'):
+    """Get guild leaderboard (window: weekly, monthly or all; metric: profit or wins)."""
+    connection = None
     try:
         connection = get_db_connection()
+        
+        if leaderboard_engine:
+            try:
+                built = leaderboard_engine.is_built(guild_id, window)
+                if not built:
+                    # Built in the background by the scheduler; SQL until then
+                    leaderboard_engine.request_build(guild_id)
+                if not REFRESH_SCHEDULER_ENABLED:
+                    refresh_scheduler.run_if_due('leaderboards')
+                    built = built or leaderboard_engine.is_built(guild_id, window)
+                if built:
+                    return leaderboard_engine.top(guild_id, window=window, metric=metric, limit=limit)
+            except Exception as e:
+                logger.warning(f"Leaderboard engine unavailable, using SQL: {e}")
+        
         if connection:
-            cursor = connection.cursor(dictionary=True)
-            cursor.execute("""
-                SELECT 
-                    user_id,
-                    COUNT(*) as total_bets,
-                    SUM(CASE WHEN result = 'won' THEN 1 ELSE 0 END) as wins,
-                    SUM(CASE WHEN result = 'lost' THEN 1 ELSE 0 END) as losses,
-                    ROUND(
-                        (SUM(CASE WHEN result = 'won' THEN 1 ELSE 0 END) * 100.0) / 
-                        NULLIF(SUM(CASE WHEN result IN ('won', 'lost') THEN 1 ELSE 0 END), 0), 
-                        1
-                    ) as win_rate,
-                    COALESCE(SUM(profit_loss), 0) as net_profit
-                FROM bets 
-                WHERE guild_id = %s AND result IN ('won', 'lost')
-                GROUP BY user_id
-                HAVING total_bets >= 3
-                ORDER BY net_profit DESC, win_rate DESC
-                LIMIT %s
-            """, (guild_id, limit))
-            leaderboard = cursor.fetchall()
-            cursor.close()
-            connection.close()
-            return leaderboard
-    except Error as e:
+            since = period_start(window, datetime.utcnow())
+            return fetch_all(connection, GUILD_LEADERBOARD,
+                             {'guild_id': guild_id, 'since': since, 'limit': limit},
+                             bets=schema_registry.bets(),
+                             since='AND created_at >= :since' if since else '',
+                             order=LEADERBOARD_ORDER[metric])
+    except DB_ERRORS as e:
         logger.error(f"Error fetching guild leaderboard: {e}")
         return []
+    finally:
+        if connection:
+            connection.close()
 
+def get_guild_rank(guild_id, user_id, window='all', metric='profit'):
+    """Get a user's leaderboard position (None if unranked or Redis is down)."""
+    if not leaderboard_engine or not user_id:
+        return None
+    try:
+        return leaderboard_engine.rank(guild_id, user_id, window=window, metric=metric)
+    except Exception as e:
+        logger.warning(f"Error getting guild rank: {e}")
+        return None
 
 
 def get_live_games():
-    """Get live games from database."""
-    # Check cache first (cache for 30 seconds since live data changes frequently)
-    cache_key = get_cache_key("live_games")
-    cached_result = cache_get(cache_key)
-    if cached_result is not None:
-        return cached_result
-    
+    """Get live games grouped by league (shared views of the live board - read-only)."""
+    live_board.sync_if_due(get_db_connection)
+    age = live_board.age()
+    if age is not None and age > max(30, live_board.sync_interval * 3):
+        # Syncs are failing - the board is the last good copy
+        _record_stale_data('live_games', 'board', age)
+    return live_board.board()
+
+# Daily bet rollup (per-guild, per-day aggregates in the guild's time zone)
+bet_rollup = BetRollup(
+    db_timezone=os.getenv('DB_TIMEZONE', 'UTC'),
+    default_timezone=os.getenv('DEFAULT_GUILD_TIMEZONE', 'UTC'),
+    schema=schema_registry
+)
+
+def _sync_bet_rollup():
+    """Fold newly placed and settled bets into the daily rollup."""
     connection = get_db_connection()
     if not connection:
-        return []
-    
+        raise DatabaseUnavailable("No database connection")
     try:
-        cursor = connection.cursor(dictionary=True)
-        
-        # Get live games - simplified query based on actual schema
-        query = """
-        SELECT 
-            g.id as game_id,
-            g.api_game_id,
-            g.league_id,
-            g.league_name,
-            g.home_team_id,
-            g.away_team_id,
-            g.home_team_name,
-            g.away_team_name,
-            g.home_team_logo,
-            g.away_team_logo,
-            g.start_time,
-            g.status,
-            g.score
-        FROM games g
-        WHERE g.status IN ('live', 'halftime', 'scheduled', 'finished')
-        AND g.start_time >= DATE_SUB(NOW(), INTERVAL 1 DAY)
-        ORDER BY g.start_time ASC
-        LIMIT 50
-        """
-        
-        cursor.execute(query)
-        games = cursor.fetchall()
-        
-        # Group games by league
-        leagues = {}
-        for game in games:
-            league_id = game['league_id']
-            league_name = game['league_name'] or f"League {league_id}"
-            
-            if league_id not in leagues:
-                leagues[league_id] = {
-                    'id': league_id,
-                    'name': league_name,
-                    'logo': None,  # No league logo in current schema
-                    'games': []
-                }
-            
-            # Parse score if it exists
-            score_data = None
-            if game['score']:
-                try:
-                    import json
-                    score_info = json.loads(game['score'])
-                    if isinstance(score_info, dict):
-                        score_data = {
-                            'home': score_info.get('home', 0),
-                            'away': score_info.get('away', 0)
-                        }
-                except:
-                    score_data = None
-            
-            # Format game data
-            game_data = {
-                'game_id': game['game_id'],
-                'home_team_name': game['home_team_name'],
-                'home_logo': game['home_team_logo'],
-                'away_team_name': game['away_team_name'],
-                'away_logo': game['away_team_logo'],
-                'start_time': game['start_time'],
-                'status': game['status'],
-                'score': score_data
-            }
-            
-            leagues[league_id]['games'].append(game_data)
-        
-        cursor.close()
-        result = list(leagues.values())
-        
-        # Cache for 30 seconds (live data)
-        cache_set(cache_key, result, expire=30)
-        return result
-        
-    except Error as e:
-        logger.error(f"Error fetching live games: {e}")
-        return []
+        bet_rollup.sync(connection)
     finally:
-        if connection.is_connected():
-            connection.close()
+        connection.close()
+
+# Kept off the request path: the scheduler leader syncs (and on its first
+# run creates the rollup tables), requests only read the buckets
+refresh_scheduler.register('bet_rollup', int(os.getenv('BET_ROLLUP_SYNC_INTERVAL', 30)), _sync_bet_rollup)
+
+# Live board: recent games held in memory per worker, synced incrementally
+# from games.updated_at (timestamps are compared in the database's zone)
+live_board = LiveBoardEngine(
+    window_days=int(os.getenv('LIVE_BOARD_WINDOW_DAYS', 7)),
+    sync_interval=int(os.getenv('LIVE_BOARD_SYNC_INTERVAL', 5)),
+    full_sync_interval=int(os.getenv('LIVE_BOARD_FULL_SYNC_INTERVAL', 600)),
+    clock=lambda: datetime.now(bet_rollup.db_zone).replace(tzinfo=None)
+)
+
+def _load_dimensions():
+    """Load the leagues and teams lookup tables."""
+    connection = get_db_connection()
+    if not connection:
+        raise DatabaseUnavailable("No database connection")
+    try:
+        return load_dimensions(connection)
+    finally:
+        connection.close()
+
+# Leagues and teams rarely change - each worker keeps them in memory
+dimension_cache = DimensionCache(_load_dimensions, ttl=int(os.getenv('DIMENSIONS_TTL', 600)))
+LEAGUE_GAMES_PAGE_SIZE = int(os.getenv('LEAGUE_GAMES_PAGE_SIZE', 25))
+
+@app.cli.command('backfill-bet-rollups')
+@click.option('--guild-id', type=int, default=None, help='Only rebuild this guild.')
+@click.option('--days', type=int, default=None, help='Only rebuild the last N days.')
+def backfill_bet_rollups_command(guild_id, days):
+    """Rebuild guild_daily_bet_stats from the bets table."""
+    connection = _borrow_db_connection()
+    if not connection:
+        raise click.ClickException("Database unavailable")
+    try:
+        written = bet_rollup.backfill(connection, guild_id=guild_id, days=days)
+        click.echo(f"Wrote {written} daily buckets")
+    finally:
+        connection.close()
 
 def get_guild_stats(guild_id):
     """Get guild statistics for today."""
-    # Check cache first (cache for 60 seconds)
-    cache_key = get_cache_key("guild_stats", guild_id)
-    cached_result = cache_get(cache_key)
-    if cached_result is not None:
-        return cached_result
-    
+    # Cached for 60 seconds; stale copies are served while refreshing
     try:
-        connection = get_db_connection()
-        if not connection:
-            return {}
-        
-        cursor = connection.cursor(dictionary=True)
-        
-        # Get today's bets count - handle different possible column names
-        try:
-            cursor.execute("""
-                SELECT COUNT(*) as today_bets
-                FROM bets 
-                WHERE guild_id = %s 
-                AND DATE(created_at) = CURDATE()
-            """, (guild_id,))
-            today_bets = cursor.fetchone()['today_bets']
-        except Exception as e:
-            logger.warning(f"Error getting today's bets: {e}")
-            today_bets = 0
-        
-        # Get today's units - handle different status values
-        try:
-            cursor.execute("""
-                SELECT COALESCE(SUM(units), 0) as today_units
-                FROM bets 
-                WHERE guild_id = %s 
-                AND DATE(created_at) = CURDATE()
-                AND status IN ('won', 'lost', 'WON', 'LOST')
-            """, (guild_id,))
-            today_units = cursor.fetchone()['today_units']
-        except Exception as e:
-            logger.warning(f"Error getting today's units: {e}")
-            today_units = 0
-        
-        # Get active users (users who placed bets today)
-        try:
-            cursor.execute("""
-                SELECT COUNT(DISTINCT user_id) as active_users
-                FROM bets 
-                WHERE guild_id = %s 
-                AND DATE(created_at) = CURDATE()
-            """, (guild_id,))
-            active_users = cursor.fetchone()['active_users']
-        except Exception as e:
-            logger.warning(f"Error getting active users: {e}")
-            active_users = 0
-        
-        # Get win rate (last 30 days) - handle different status values
-        try:
-            cursor.execute("""
-                SELECT 
-                    COUNT(*) as total_bets,
-                    SUM(CASE WHEN status IN ('won', 'WON') THEN 1 ELSE 0 END) as won_bets
-                FROM bets 
-                WHERE guild_id = %s 
-                AND created_at >= DATE_SUB(NOW(), INTERVAL 30 DAY)
-                AND status IN ('won', 'lost', 'WON', 'LOST')
-            """, (guild_id,))
-            win_stats = cursor.fetchone()
-            
-            win_rate = 0
-            if win_stats['total_bets'] > 0:
-                win_rate = (win_stats['won_bets'] / win_stats['total_bets']) * 100
-        except Exception as e:
-            logger.warning(f"Error getting win rate: {e}")
-            win_rate = 0
-        
-        cursor.close()
-        connection.close()
-        
-        result = {
-            'today_bets': today_bets,
-            'today_units': today_units,
-            'active_users': active_users,
-            'win_rate': win_rate
-        }
-        
-        # Cache for 60 seconds
-        cache_set(cache_key, result, expire=60)
-        return result
-        
+        return cache.get_or_load('guild_stats', guild_id, lambda: _load_guild_stats(guild_id))
+    except DatabaseUnavailable:
+        return {}
     except Exception as e:
         logger.error(f"Error getting guild stats: {e}")
         return {
@@ -618,52 +941,52 @@ def get_guild_stats(guild_id):
             'win_rate': 0
         }
 
+def _load_guild_stats(guild_id):
+    """Read today's stats and the 30-day win rate from the bet rollup."""
+    connection = get_db_connection()
+    if not connection:
+        raise DatabaseUnavailable("No database connection")
+    
+    try:
+        if not REFRESH_SCHEDULER_ENABLED:
+            # No scheduler thread - one worker per interval syncs lazily
+            refresh_scheduler.run_if_due('bet_rollup')
+        # Today's bucket and the 30-day win rate in one indexed lookup
+        return bet_rollup.get_stats(connection, guild_id)
+    finally:
+        connection.close()
+
+RECENT_BETS = register('bets.recent', """
+    SELECT 
+        b.bet_serial,
+        b.user_id,
+        b.bet_type,
+        {bets.stake} as units,
+        {bets.outcome} as status,
+        b.created_at,
+        b.updated_at
+        {username}
+    FROM bets b
+    {users_join}
+    WHERE b.guild_id = :guild_id
+    ORDER BY b.created_at DESC
+    LIMIT :limit
+""")
+
 def get_recent_activity(guild_id, limit=10):
     """Get recent activity for the guild."""
+    connection = None
     try:
         connection = get_db_connection()
         if not connection:
             return []
         
-        cursor = connection.cursor(dictionary=True)
-        
-        # Get recent bets and their outcomes - handle different column names
-        try:
-            cursor.execute("""
-                SELECT 
-                    b.bet_serial,
-                    b.user_id,
-                    b.bet_type,
-                    b.units,
-                    b.status,
-                    b.created_at,
-                    b.updated_at,
-                    COALESCE(u.username, u.display_name, 'Unknown User') as username
-                FROM bets b
-                LEFT JOIN users u ON b.user_id = u.user_id
-                WHERE b.guild_id = %s
-                ORDER BY b.created_at DESC
-                LIMIT %s
-            """, (guild_id, limit))
-        except Exception as e:
-            # Fallback query if username column doesn't exist
-            logger.warning(f"Error with username join: {e}")
-            cursor.execute("""
-                SELECT 
-                    bet_serial,
-                    user_id,
-                    bet_type,
-                    units,
-                    status,
-                    created_at,
-                    updated_at
-                FROM bets 
-                WHERE guild_id = %s
-                ORDER BY created_at DESC
-                LIMIT %s
-            """, (guild_id, limit))
-        
-        bets = cursor.fetchall()
+        # Get recent bets and their outcomes, with names if there is a users table to join
+        user_name = schema_registry.user_name_sql('u')
+        bets = fetch_all(connection, RECENT_BETS, {'guild_id': guild_id, 'limit': limit},
+                         bets=schema_registry.bets('b'),
+                         username=f', {user_name} as username' if user_name else '',
+                         users_join='LEFT JOIN users u ON b.user_id = u.user_id' if user_name else '')
         activity = []
         
         for bet in bets:
@@ -672,10 +995,10 @@ def get_recent_activity(guild_id, limit=10):
             units = bet.get('units', 0)
             status = bet.get('status', 'pending')
             
-            if status in ['won', 'WON']:
+            if status == 'won':
                 icon = 'trophy'
                 message = f"{username} won {units} units on {bet_type}"
-            elif status in ['lost', 'LOST']:
+            elif status == 'lost':
                 icon = 'times-circle'
                 message = f"{username} lost {units} units on {bet_type}"
             else:
@@ -695,14 +1018,14 @@ def get_recent_activity(guild_id, limit=10):
                 'timestamp': timestamp
             })
         
-        cursor.close()
-        connection.close()
-        
         return activity
         
     except Exception as e:
         logger.error(f"Error getting recent activity: {e}")
         return []
+    finally:
+        if connection:
+            connection.close()
 
 # Discord OAuth Helper Functions
 def get_discord_oauth_url():
@@ -720,90 +1043,170 @@ def get_discord_oauth_url():
     )
     return oauth_url
 
-def exchange_discord_code(code):
-    """Exchange Discord OAuth code for access token."""
+# Outbound Discord API calls run on one long-lived event loop whose aiohttp
+# session keeps connections to Discord warm across requests
+DISCORD_API_TIMEOUT = float(os.getenv('DISCORD_API_TIMEOUT', 15))
+
+def _create_discord_session():
+    """Create the shared Discord HTTP session (runs on the discord loop)."""
+    connector = aiohttp.TCPConnector(
+        limit=100,  # Total connection pool size
+        limit_per_host=30,  # Per-host connection limit
+        ttl_dns_cache=300,  # DNS cache TTL
+        use_dns_cache=True,
+        keepalive_timeout=60,
+        enable_cleanup_closed=True
+    )
+    timeout = aiohttp.ClientTimeout(total=10, connect=5)
+    return aiohttp.ClientSession(
+        connector=connector,
+        timeout=timeout,
+        headers={'User-Agent': 'DBSBM-Bot/1.0'}
+    )
+
+discord_loop = BackgroundLoop(_create_discord_session, name='discord-http', default_timeout=DISCORD_API_TIMEOUT)
+
+def get_discord_session():
+    """Get the pooled Discord HTTP session (only from coroutines on discord_loop)."""
+    return discord_loop.session()
+
+discord_client = DiscordClient(
+    get_discord_session,
+    api_base=os.getenv('DISCORD_API_BASE', DEFAULT_API_BASE),
+    timeout=int(os.getenv('DISCORD_REQUEST_TIMEOUT', 10)),
+    max_retries=int(os.getenv('DISCORD_MAX_RETRIES', 2)),
+    guilds_ttl=int(os.getenv('DISCORD_GUILDS_CACHE_TTL', 60)),
+    roles_ttl=int(os.getenv('DISCORD_ROLES_CACHE_TTL', 60))
+)
+
+async def async_exchange_discord_code(code):
+    """Async version of Discord code exchange with connection pooling."""
     try:
-        data = {
-            'client_id': os.getenv('DISCORD_CLIENT_ID'),
-            'client_secret': os.getenv('DISCORD_CLIENT_SECRET'),
-            'grant_type': 'authorization_code',
-            'code': code,
-            'redirect_uri': os.getenv('DISCORD_REDIRECT_URI')
-        }
-        
-        headers = {
-            'Content-Type': 'application/x-www-form-urlencoded'
-        }
-        
-        response = requests.post('https://discord.com/api/oauth2/token', data=data, headers=headers)
-        return response.json() if response.status_code == 200 else None
-        
-    except Exception as e:
+        return await discord_client.exchange_code(
+            code,
+            os.getenv('DISCORD_CLIENT_ID'),
+            os.getenv('DISCORD_CLIENT_SECRET'),
+            os.getenv('DISCORD_REDIRECT_URI')
+        )
+    except DiscordAPIError as e:
         logger.error(f"Error exchanging Discord code: {e}")
         return None
 
-def get_discord_user_info(access_token):
-    """Get Discord user information using access token."""
+async def async_get_discord_user_info(access_token):
+    """Async version of Discord user info with connection pooling."""
     try:
-        headers = {
-            'Authorization': f'Bearer {access_token}'
-        }
-        
-        response = requests.get('https://discord.com/api/users/@me', headers=headers)
-        return response.json() if response.status_code == 200 else None
-        
-    except Exception as e:
+        return await discord_client.get_current_user(access_token)
+    except DiscordAPIError as e:
         logger.error(f"Error getting Discord user info: {e}")
         return None
 
-def get_discord_user_guilds(access_token):
-    """Get Discord guilds the user is a member of."""
+async def async_get_discord_user_guilds(access_token):
+    """Async version of Discord user guilds with connection pooling."""
     try:
-        headers = {
-            'Authorization': f'Bearer {access_token}'
-        }
-        
-        response = requests.get('https://discord.com/api/users/@me/guilds', headers=headers)
-        return response.json() if response.status_code == 200 else []
-        
-    except Exception as e:
+        return await discord_client.get_current_user_guilds(access_token)
+    except DiscordAPIError as e:
         logger.error(f"Error getting Discord user guilds: {e}")
         return []
 
+async def async_get_user_guild_roles(guild_id, user_id, access_token):
+    """Async version of the guild member role lookup with connection pooling."""
+    try:
+        return await discord_client.get_member_roles(guild_id, user_id, access_token)
+    except DiscordAPIError as e:
+        logger.warning(f"Could not get user roles for guild {guild_id}: {e}")
+        return []
+
+async def async_discord_auth(code):
+    """Exchange the code, then fetch user info and guilds concurrently."""
+    token_data = await async_exchange_discord_code(code)
+    if not token_data or 'access_token' not in token_data:
+        return None, None, []
+    
+    access_token = token_data['access_token']
+    user_info, user_guilds = await asyncio.gather(
+        async_get_discord_user_info(access_token),
+        async_get_discord_user_guilds(access_token)
+    )
+    return token_data, user_info, user_guilds
+
+def run_discord_call(coro, default):
+    """Run a Discord coroutine on the shared loop, returning default on timeout."""
+    try:
+        return discord_loop.submit(coro)
+    except Exception as e:
+        logger.error(f"Discord API call failed: {e}")
+        return default
+
+def run_async_discord_auth(code):
+    """Run async Discord auth operations concurrently."""
+    return run_discord_call(async_discord_auth(code), (None, None, []))
+
+def exchange_discord_code(code):
+    """Exchange Discord OAuth code for access token."""
+    return run_discord_call(async_exchange_discord_code(code), None)
+
+def get_discord_user_info(access_token):
+    """Get Discord user information using access token."""
+    return run_discord_call(async_get_discord_user_info(access_token), None)
+
+def get_discord_user_guilds(access_token):
+    """Get Discord guilds the user is a member of."""
+    return run_discord_call(async_get_discord_user_guilds(access_token), [])
+
 def get_bot_guilds():
     """Get guilds where the bot is present."""
+    # Shared Redis set, rebuilt by the refresh scheduler; each worker reads a snapshot
+    return sorted(bot_guild_registry.snapshot())
+
+BOT_GUILDS = register('guilds.bot_active', """
+    SELECT DISTINCT guild_id FROM guild_settings WHERE is_active = TRUE
+""")
+
+def _load_bot_guilds():
+    """Query the ids of guilds where the bot is active."""
+    # This would require the bot to be running and accessible
+    # For now, we'll check against the database
+    connection = get_db_connection()
+    if not connection:
+        raise DatabaseUnavailable("No database connection")
+    
     try:
-        # This would require the bot to be running and accessible
-        # For now, we'll check against the database
-        connection = get_db_connection()
-        if not connection:
-            return []
+        return [str(row['guild_id']) for row in fetch_all(connection, BOT_GUILDS)]
         
-        cursor = connection.cursor(dictionary=True)
-    cursor.execute("SELECT DISTINCT guild_id FROM guild_settings WHERE is_active = TRUE")
-        bot_guilds = [str(row['guild_id']) for row in cursor.fetchall()]
-        cursor.close()
+    finally:
         connection.close()
-        
-        return bot_guilds
-        
-    except Exception as e:
-        logger.error(f"Error getting bot guilds: {e}")
-        return []
+
+bot_guild_registry = BotGuildRegistry(
+    redis_client,
+    _load_bot_guilds,
+    check_interval=int(os.getenv('BOT_GUILDS_CHECK_INTERVAL', 5))
+)
+
+@app.cli.command('refresh-bot-guilds')
+@click.option('--add', 'add_id', type=int, default=None, help='Mark one guild as active.')
+@click.option('--remove', 'remove_id', type=int, default=None, help='Mark one guild as inactive.')
+def refresh_bot_guilds_command(add_id, remove_id):
+    """Publish bot guild changes to every worker (rebuilds the set by default)."""
+    if add_id is not None:
+        bot_guild_registry.add(add_id)
+    elif remove_id is not None:
+        bot_guild_registry.remove(remove_id)
+    else:
+        click.echo(f"{len(bot_guild_registry.refresh())} active bot guilds")
 
 def get_user_accessible_guilds(user_guilds):
     """Get guilds where user is a member AND bot is present."""
     try:
-        bot_guilds = get_bot_guilds()
-        user_guild_ids = [guild['id'] for guild in user_guilds]
-        
-        # Find intersection of user guilds and bot guilds
-        accessible_guilds = []
-        for guild in user_guilds:
-            if guild['id'] in bot_guilds:
-                accessible_guilds.append(guild)
-        
-        return accessible_guilds
+        # Filtered against the worker's snapshot of the bot guild set
+        return [
+            {
+                'id': guild['id'],
+                'name': guild['name'],
+                'icon': guild.get('icon'),
+                'permissions': guild.get('permissions', 0)
+            }
+            for guild in bot_guild_registry.accessible(user_guilds or [])
+        ]
         
     except Exception as e:
         logger.error(f"Error getting user accessible guilds: {e}")
@@ -811,23 +1214,7 @@ def get_user_accessible_guilds(user_guilds):
 
 def get_user_guild_roles(guild_id, user_id, access_token):
     """Get user's roles in a specific Discord guild."""
-    try:
-        headers = {
-            'Authorization': f'Bearer {access_token}'
-        }
-        
-        # Get guild member info to see their roles
-        response = requests.get(f'https://discord.com/api/guilds/{guild_id}/members/{user_id}', headers=headers)
-        if response.status_code == 200:
-            member_data = response.json()
-            return member_data.get('roles', [])
-        else:
-            logger.warning(f"Could not get user roles for guild {guild_id}: {response.status_code}")
-            return []
-        
-    except Exception as e:
-        logger.error(f"Error getting user guild roles: {e}")
-        return []
+    return run_discord_call(async_get_user_guild_roles(guild_id, user_id, access_token), [])
 
 def check_user_role_access(guild_id, required_role_type='member'):
     """Check if user has required role access in guild."""
@@ -837,45 +1224,21 @@ def check_user_role_access(guild_id, required_role_type='member'):
             return False
         
         # Get guild settings to find admin role
-        connection = get_db_connection()
-        if not connection:
+        guild_settings = guild_registry.get(guild_id)
+        if not guild_settings or not guild_settings.has_settings:
             return False
         
-        cursor = connection.cursor()
-        cursor.execute("""
-            SELECT admin_role, command_channel_1
-            FROM guild_settings 
-            WHERE guild_id = %s
-        """, (guild_id,))
-        
-        guild_settings = cursor.fetchone()
-        cursor.close()
-        connection.close()
+        admin_role = guild_settings.admin_role
         
-        if not guild_settings:
-            return False
-        
-        admin_role = guild_settings[0]
-        
-        # Get user's guild info from session
-        accessible_guilds = discord_user.get('accessible_guilds', [])
-        user_guild = None
-        
-        for guild in accessible_guilds:
-            if guild['id'] == str(guild_id):
-                user_guild = guild
-                break
-        
-        if not user_guild:
+        # Get user's permission bits for this guild from the session
+        permissions = get_guild_permissions(guild_id)
+        if permissions is None:
             return False
         
         # Check permissions - if they have admin permissions, they can access admin pages
-        permissions = user_guild.get('permissions', 0)
-        
         if required_role_type == 'admin':
             # Check if user has administrator or manage guild permissions
-            has_admin_perms = (permissions & 0x8) == 0x8 or (permissions & 0x20) == 0x20
-            return has_admin_perms
+            return bool(permissions & ADMIN_PERMISSION_BITS)
         
         elif required_role_type == 'member':
             # Any guild member can access member pages
@@ -914,12 +1277,7 @@ def get_user_access_level(guild_id):
 
 def check_guild_access(guild_id):
     """Check if the current user has access to a specific guild."""
-    discord_user = session.get('discord_user')
-    if not discord_user:
-        return False
-    
-    accessible_guilds = discord_user.get('accessible_guilds', [])
-    return str(guild_id) in [guild['id'] for guild in accessible_guilds]
+    return get_guild_permissions(guild_id) is not None
 
 def require_guild_access(guild_id):
     """Decorator to require guild access for a route."""
@@ -932,57 +1290,53 @@ def require_guild_access(guild_id):
         return wrapper
     return decorator
 
+DASHBOARD_GUILDS = register('guilds.dashboard', """
+    SELECT 
+        g.guild_id,
+        g.guild_name,
+        gs.embed_channel_1,
+        gs.command_channel_1,
+        gs.admin_role,
+        gs.base_unit_value,
+        gs.premium_enabled,
+        COUNT(DISTINCT b.bet_id) as total_bets,
+        COUNT(DISTINCT u.user_id) as total_users
+    FROM guilds g
+    LEFT JOIN guild_settings gs ON g.guild_id = gs.guild_id
+    LEFT JOIN bets b ON gs.guild_id = b.guild_id
+    LEFT JOIN users u ON g.guild_id = u.guild_id
+    GROUP BY g.guild_id, g.guild_name, gs.embed_channel_1, gs.command_channel_1, 
+             gs.admin_role, gs.base_unit_value, gs.premium_enabled
+    ORDER BY g.guild_name
+""")
+
 @app.route('/dashboard')
 @app.route('/guild-dashboard')
 def dashboard():
     """Guild Dashboard - Lists all guilds the user has access to"""
+    conn = None
     try:
         conn = get_db_connection()
-        cursor = conn.cursor()
         
         # Get all guilds with their settings and stats
-        query = """
-        SELECT 
-            g.guild_id,
-            g.guild_name,
-            gs.embed_channel_1,
-            gs.command_channel_1,
-            gs.admin_role,
-            gs.base_unit_value,
-            gs.premium_enabled,
-            COUNT(DISTINCT b.bet_id) as total_bets,
-            COUNT(DISTINCT u.user_id) as total_users
-        FROM guilds g
-        LEFT JOIN guild_settings gs ON g.guild_id = gs.guild_id
-    LEFT JOIN bets b ON gs.guild_id = b.guild_id
-    LEFT JOIN users u ON g.guild_id = u.guild_id
-    GROUP BY g.guild_id, g.guild_name, gs.embed_channel_1, gs.command_channel_1, 
-         gs.admin_role, gs.base_unit_value, gs.premium_enabled
-    ORDER BY g.guild_name
-        """
-        
-        cursor.execute(query)
-        guilds = cursor.fetchall()
+        guilds = fetch_all(conn, DASHBOARD_GUILDS)
         
-        # Convert to list of dictionaries for easier template handling
+        # Rename for easier template handling
         guild_list = []
         for guild in guilds:
             guild_dict = {
-                'guild_id': guild[0],
-                'guild_name': guild[1],
-                'embed_channel': guild[2],
-                'command_channel': guild[3],
-                'admin_role': guild[4],
-                'base_unit_value': guild[5] or 1.0,
-                'premium_enabled': guild[6] or False,
-                'total_bets': guild[7] or 0,
-                'total_users': guild[8] or 0
+                'guild_id': guild['guild_id'],
+                'guild_name': guild['guild_name'],
+                'embed_channel': guild['embed_channel_1'],
+                'command_channel': guild['command_channel_1'],
+                'admin_role': guild['admin_role'],
+                'base_unit_value': guild['base_unit_value'] or 1.0,
+                'premium_enabled': guild['premium_enabled'] or False,
+                'total_bets': guild['total_bets'] or 0,
+                'total_users': guild['total_users'] or 0
             }
             guild_list.append(guild_dict)
         
-        cursor.close()
-        conn.close()
-        
         # Get Discord client ID from environment for invite links
         discord_client_id = os.getenv('DISCORD_CLIENT_ID', '1341993312915034153')
         
@@ -993,6 +1347,9 @@ def dashboard():
     except Exception as e:
         logger.error(f"Error in guild_dashboard: {e}")
         return render_template('error.html', error="Unable to load guild dashboard")
+    finally:
+        if conn:
+            conn.close()
 
 @app.route('/')
 def index():
@@ -1027,6 +1384,7 @@ def index():
         return render_template('subscription_landing.html')
 
 @app.route('/server-list')
+@page_cache.cached(ttl=PAGE_CACHE_TTL, tags=('guilds',))
 def server_list():
     """Server list page."""
     try:
@@ -1064,25 +1422,19 @@ def discord_callback():
     if not code:
         return redirect(url_for('index'))
     
-    # Exchange code for access token
-    token_data = exchange_discord_code(code)
-    if not token_data or 'access_token' not in token_data:
-        return redirect(url_for('index'))
-    
-    access_token = token_data['access_token']
-    
-    # Get user info
-    user_info = get_discord_user_info(access_token)
-    if not user_info:
+    # Exchange code for access token, then fetch user info and guilds concurrently
+    start_time = time.time()
+    token_data, user_info, user_guilds = run_async_discord_auth(code)
+    if not token_data or not user_info:
         return redirect(url_for('index'))
-    
-    # Get user guilds
-    user_guilds = get_discord_user_guilds(access_token)
+    logger.info(f"Discord auth completed in {time.time() - start_time:.2f}s")
     
     # Get accessible guilds (where user is member AND bot is present)
     accessible_guilds = get_user_accessible_guilds(user_guilds)
     
-    # Store user info in session
+    # Store user info in session (a fresh server-side session id per login)
+    if hasattr(session, 'regenerate'):
+        session.regenerate()
     session['discord_user'] = {
         'id': user_info['id'],
         'username': user_info['username'],
@@ -1090,6 +1442,11 @@ def discord_callback():
         'avatar': user_info.get('avatar'),
         'accessible_guilds': accessible_guilds
     }
+    session.permanent = True
+    if SERVER_SIDE_SESSIONS:
+        # Precomputed so every access check is a single dict lookup; kept
+        # out of cookie sessions, where it would grow the cookie per guild
+        session['guild_permissions'] = build_guild_permissions(accessible_guilds)
     
     # Redirect based on accessible guilds
     if accessible_guilds:
@@ -1130,6 +1487,63 @@ def guild_home(guild_id):
         logger.error(f"Error in guild_home: {e}")
         return redirect(url_for('index'))
 
+GUILD_ADMIN_STATS = register('bets.guild_admin_stats', """
+    SELECT 
+        COUNT(DISTINCT b.user_id) as total_users,
+        COUNT(*) as total_bets,
+        SUM(CASE WHEN {bets.won} THEN 1 ELSE 0 END) as total_wins,
+        SUM(CASE WHEN {bets.lost} THEN 1 ELSE 0 END) as total_losses,
+        AVG({bets.stake}) as avg_bet_amount,
+        SUM({bets.stake}) as total_volume
+    FROM bets b
+    WHERE b.guild_id = :guild_id
+""")
+
+GUILD_BET_FEED = register('bets.guild_feed', """
+    SELECT 
+        b.user_id,
+        {bets.stake} as bet_amount,
+        {odds} as odds,
+        {description} as bet_description,
+        b.created_at,
+        {bets.won} as bet_won,
+        {bets.lost} as bet_loss
+    FROM bets b
+    WHERE b.guild_id = :guild_id
+    ORDER BY b.created_at DESC
+    LIMIT 20
+""")
+
+MEMBER_STATS = register('bets.member_stats', """
+    SELECT 
+        COUNT(*) as my_total_bets,
+        SUM(CASE WHEN {bets.won} THEN 1 ELSE 0 END) as my_wins,
+        SUM(CASE WHEN {bets.lost} THEN 1 ELSE 0 END) as my_losses,
+        AVG({bets.stake}) as my_avg_bet,
+        SUM({bets.stake}) as my_total_wagered
+    FROM bets b
+    WHERE b.guild_id = :guild_id AND b.user_id = :user_id
+""")
+
+MEMBER_RECENT_BETS = register('bets.member_recent', """
+    SELECT 
+        {bets.stake} as bet_amount,
+        {odds} as odds,
+        {description} as bet_description,
+        b.created_at,
+        {bets.won} as bet_won,
+        {bets.lost} as bet_loss
+    FROM bets b
+    WHERE b.guild_id = :guild_id AND b.user_id = :user_id
+    ORDER BY b.created_at DESC
+    LIMIT 10
+""")
+
+def _bet_feed_columns():
+    """Fragments for the bet feed queries on this schema."""
+    return {'bets': schema_registry.bets('b'), 'odds': _optional_bet_column('odds'),
+            'description': _optional_bet_column('bet_description')}
+
 @app.route('/guild/<int:guild_id>/admin')
 def guild_admin_page(guild_id):
     """Guild admin page with full management capabilities."""
@@ -1139,87 +1553,42 @@ def guild_admin_page(guild_id):
             return redirect(url_for('guild_member_page', guild_id=guild_id))
         
         # Get guild info
-        connection = get_db_connection()
-        if connection:
-            cursor = connection.cursor()
-            cursor.execute("""
-                SELECT 
-                    g.guild_id,
-                    g.guild_name,
-                    gs.embed_channel_1,
-                    gs.command_channel_1,
-                    gs.admin_role,
-                    gs.base_unit_value,
-                    gs.premium_enabled,
-                    gs.subscription_level
-                FROM guilds g
-                LEFT JOIN guild_settings gs ON g.guild_id = gs.guild_id
-                WHERE g.guild_id = %s
-            """, (guild_id,))
-            guild = cursor.fetchone()
-            
-            if guild:
-                # Get comprehensive admin statistics
-                cursor.execute("""
-                    SELECT 
-                        COUNT(DISTINCT b.user_id) as total_users,
-                        COUNT(b.bet_id) as total_bets,
-                        SUM(CASE WHEN b.bet_won = TRUE THEN 1 ELSE 0 END) as total_wins,
-                        SUM(CASE WHEN b.bet_loss = TRUE THEN 1 ELSE 0 END) as total_losses,
-                        AVG(b.bet_amount) as avg_bet_amount,
-                        SUM(b.bet_amount) as total_volume
-                    FROM bets b
-                    WHERE b.guild_id = %s
-                """, (guild_id,))
-                admin_stats = cursor.fetchone()
-                
-                # Get recent user activity
-                cursor.execute("""
-                    SELECT 
-                        b.user_id,
-                        b.bet_amount,
-                        b.odds,
-                        b.bet_description,
-                        b.created_at,
-                        b.bet_won,
-                        b.bet_loss
-                    FROM bets b
-                    WHERE b.guild_id = %s
-                    ORDER BY b.created_at DESC
-                    LIMIT 20
-                """, (guild_id,))
-                recent_activity = cursor.fetchall()
-                
-                cursor.close()
-                connection.close()
-                
-                guild_data = {
-                    'guild_id': guild[0],
-                    'guild_name': guild[1],
-                    'embed_channel': guild[2],
-                    'command_channel': guild[3],
-                    'admin_role': guild[4],
-                    'base_unit_value': guild[5] or 1.0,
-                    'premium_enabled': guild[6] or False,
-                    'subscription_level': guild[7] or 'free'
-                }
-                
-                stats_data = {
-                    'total_users': admin_stats[0] or 0,
-                    'total_bets': admin_stats[1] or 0,
-                    'total_wins': admin_stats[2] or 0,
-                    'total_losses': admin_stats[3] or 0,
-                    'avg_bet_amount': admin_stats[4] or 0,
-                    'total_volume': admin_stats[5] or 0
-                }
-                
-                return render_template('guild_admin.html', 
-                                     guild=guild_data,
-                                     stats=stats_data,
-                                     recent_activity=recent_activity,
-                                     guild_id=guild_id)
+        guild = guild_registry.get(guild_id)
+        if not guild:
+            return redirect(url_for('index'))
+        
+        params, columns = {'guild_id': guild_id}, _bet_feed_columns()
+        
+        # Statistics and recent activity are independent - fetch them concurrently
+        data = load_page_data(
+            # Get comprehensive admin statistics
+            Dataset('admin_stats', lambda: query_db(GUILD_ADMIN_STATS, params, one=True, bets=columns['bets'])),
+            # Get recent user activity
+            Dataset('recent_activity', lambda: query_db(GUILD_BET_FEED, params, **columns), default=[])
+        )
+        admin_stats = data['admin_stats'] or {}
+        
+        guild_data = {
+            'guild_id': guild.guild_id,
+            'guild_name': guild.guild_name,
+            'embed_channel': guild.embed_channel,
+            'command_channel': guild.command_channel,
+            'admin_role': guild.admin_role,
+            'base_unit_value': guild.base_unit_value or 1.0,
+            'premium_enabled': guild.premium_enabled or False,
+            'subscription_level': guild.subscription_level or 'free'
+        }
         
-        return redirect(url_for('index'))
+        stats_data = {
+            field: admin_stats.get(field) or 0
+            for field in ('total_users', 'total_bets', 'total_wins', 'total_losses', 'avg_bet_amount', 'total_volume')
+        }
+        
+        return render_template('guild_admin.html', 
+                             guild=guild_data,
+                             stats=stats_data,
+                             recent_activity=data['recent_activity'],
+                             guild_id=guild_id)
     except Exception as e:
         logger.error(f"Error rendering guild admin page: {e}")
         return redirect(url_for('index'))
@@ -1233,94 +1602,62 @@ def guild_member_page(guild_id):
             return redirect(url_for('discord_login'))
         
         # Get guild info
-        connection = get_db_connection()
-        if connection:
-            cursor = connection.cursor()
-            cursor.execute("""
-                SELECT 
-                    g.guild_id,
-                    g.guild_name,
-                    gs.base_unit_value,
-                    gs.premium_enabled
-                FROM guilds g
-                LEFT JOIN guild_settings gs ON g.guild_id = gs.guild_id
-                WHERE g.guild_id = %s
-            """, (guild_id,))
-            guild = cursor.fetchone()
-            
-            if guild:
-                # Get user's personal stats
-                user_id = session.get('discord_user', {}).get('id')
-                cursor.execute("""
-                    SELECT 
-                        COUNT(b.bet_id) as my_total_bets,
-                        SUM(CASE WHEN b.bet_won = TRUE THEN 1 ELSE 0 END) as my_wins,
-                        SUM(CASE WHEN b.bet_loss = TRUE THEN 1 ELSE 0 END) as my_losses,
-                        AVG(b.bet_amount) as my_avg_bet,
-                        SUM(b.bet_amount) as my_total_wagered
-                    FROM bets b
-                    WHERE b.guild_id = %s AND b.user_id = %s
-                """, (guild_id, user_id))
-                user_stats = cursor.fetchone()
-                
-                # Get guild leaderboard (top 10)
-                cursor.execute("""
-                    SELECT 
-                        b.user_id,
-                        COUNT(b.bet_id) as total_bets,
-                        SUM(CASE WHEN b.bet_won = TRUE THEN 1 ELSE 0 END) as wins,
-                        SUM(CASE WHEN b.bet_loss = TRUE THEN 1 ELSE 0 END) as losses,
-                        SUM(b.bet_amount) as total_wagered
-                    FROM bets b
-                    WHERE b.guild_id = %s
-                    GROUP BY b.user_id
-                    ORDER BY wins DESC, total_bets DESC
-                    LIMIT 10
-                """, (guild_id,))
-                leaderboard = cursor.fetchall()
-                
-                # Get user's recent bets
-                cursor.execute("""
-                    SELECT 
-                        b.bet_amount,
-                        b.odds,
-                        b.bet_description,
-                        b.created_at,
-                        b.bet_won,
-                        b.bet_loss
-                    FROM bets b
-                    WHERE b.guild_id = %s AND b.user_id = %s
-                    ORDER BY b.created_at DESC
-                    LIMIT 10
-                """, (guild_id, user_id))
-                my_recent_bets = cursor.fetchall()
-                
-                cursor.close()
-                connection.close()
-                
-                guild_data = {
-                    'guild_id': guild[0],
-                    'guild_name': guild[1],
-                    'base_unit_value': guild[2] or 1.0,
-                    'premium_enabled': guild[3] or False
-                }
-                
-                user_stats_data = {
-                    'total_bets': user_stats[0] or 0,
-                    'wins': user_stats[1] or 0,
-                    'losses': user_stats[2] or 0,
-                    'avg_bet': user_stats[3] or 0,
-                    'total_wagered': user_stats[4] or 0
-                }
-                
-                return render_template('guild_member.html', 
-                                     guild=guild_data,
-                                     user_stats=user_stats_data,
-                                     leaderboard=leaderboard,
-                                     my_recent_bets=my_recent_bets,
-                                     guild_id=guild_id)
+        guild = guild_registry.get(guild_id)
+        if not guild:
+            return redirect(url_for('index'))
+        
+        user_id = session.get('discord_user', {}).get('id')
+        params, columns = {'guild_id': guild_id, 'user_id': user_id}, _bet_feed_columns()
+        data = load_page_data(
+            # Get user's personal stats
+            Dataset('user_stats', lambda: query_db(MEMBER_STATS, params, one=True, bets=columns['bets'])),
+            # Get guild leaderboard (top 10 by wins) and the user's rank
+            Dataset('top_players', lambda: get_guild_leaderboard(guild_id, limit=10, metric='wins'), default=[]),
+            Dataset('rank', lambda: get_guild_rank(guild_id, user_id, metric='wins')),
+            # Get user's recent bets
+            Dataset('recent_bets', lambda: query_db(MEMBER_RECENT_BETS, params, **columns), default=[])
+        )
+        user_stats = data['user_stats'] or {}
+        top_players = data['top_players'] or []
         
-        return redirect(url_for('index'))
+        leaderboard = [
+            (str(player['user_id']), f"Player {str(player['user_id'])[-4:]}",
+             float(player['net_profit'] or 0), player['total_bets'], float(player['win_rate'] or 0))
+            for player in top_players
+        ]
+        my_profit = next((player['net_profit'] for player in top_players
+                          if str(player['user_id']) == str(user_id)), None)
+        if my_profit is None and leaderboard_engine and user_id:
+            try:
+                my_profit = leaderboard_engine.user_entry(guild_id, user_id)['net_profit']
+            except Exception as e:
+                logger.warning(f"Error getting member leaderboard entry: {e}")
+        
+        guild_data = {
+            'guild_id': guild.guild_id,
+            'guild_name': guild.guild_name,
+            'base_unit_value': guild.base_unit_value or 1.0,
+            'premium_enabled': guild.premium_enabled or False
+        }
+        
+        user_stats_data = {
+            'total_bets': user_stats.get('my_total_bets') or 0,
+            'wins': user_stats.get('my_wins') or 0,
+            'losses': user_stats.get('my_losses') or 0,
+            'avg_bet': user_stats.get('my_avg_bet') or 0,
+            'total_wagered': user_stats.get('my_total_wagered') or 0,
+            'total_winnings': float(my_profit or 0),
+            'rank': data['rank'] or '-'
+        }
+        settled = user_stats_data['wins'] + user_stats_data['losses']
+        user_stats_data['win_rate'] = (user_stats_data['wins'] * 100.0 / settled) if settled else 0.0
+        
+        return render_template('guild_member.html', 
+                             guild=guild_data,
+                             user_stats=user_stats_data,
+                             leaderboard=leaderboard,
+                             my_recent_bets=data['recent_bets'],
+                             guild_id=guild_id)
     except Exception as e:
         logger.error(f"Error rendering guild member page: {e}")
         return redirect(url_for('index'))
@@ -1370,25 +1707,16 @@ def playmaker_stats(guild_id):
 def guild_settings(guild_id):
     """Guild settings page."""
     try:
-        # Get guild info from guild_settings with real names
-        connection = get_db_connection()
-        if connection:
-            cursor = connection.cursor(dictionary=True)
-            cursor.execute("""
-                SELECT 
-                    guild_id,
-                    COALESCE(guild_name, CONCAT('Guild ', RIGHT(guild_id, 6))) as guild_name,
-                    subscription_level,
-                    is_active
-                FROM guild_settings 
-                WHERE guild_id = %s
-            """, (guild_id,))
-            guild = cursor.fetchone()
-            cursor.close()
-            connection.close()
-            
-            if guild:
-                return render_template('guild_settings.html', guild=guild, guild_id=guild_id)
+        # Get guild info from the guild settings snapshot
+        record = guild_registry.get(guild_id)
+        if record and record.has_settings:
+            guild = {
+                'guild_id': record.guild_id,
+                'guild_name': record.display_name,
+                'subscription_level': record.subscription_level,
+                'is_active': record.is_active
+            }
+            return render_template('guild_settings.html', guild=guild, guild_id=guild_id)
         
         return redirect(url_for('index'))
     except Exception as e:
@@ -1405,44 +1733,27 @@ def subscriptions(guild_id):
         return render_template('subscriptions.html', guild_id=guild_id)
 
 @app.route('/league/<int:league_id>/scores')
+@page_cache.cached(ttl=min(PAGE_CACHE_TTL, 30), tags=('league:{league_id}',))  # live scores
 def live_scores_league(league_id):
     """Live scores for a specific league."""
     try:
-        # Get league info and games
-        connection = get_db_connection()
-        if connection:
-            cursor = connection.cursor(dictionary=True)
-            
-            # Get league info
-            cursor.execute("SELECT * FROM leagues WHERE league_id = %s", (league_id,))
-            league = cursor.fetchone()
-            
-            if league:
-                # Get games for this league
-                cursor.execute("""
-                    SELECT 
-                        g.*,
-                        ht.team_name as home_team_name,
-                        ht.logo_url as home_logo,
-                        at.team_name as away_team_name,
-                        at.logo_url as away_logo
-                    FROM games g
-                    JOIN teams ht ON g.home_team_id = ht.team_id
-                    JOIN teams at ON g.away_team_id = at.team_id
-                    WHERE g.league_id = %s
-                    AND g.game_time >= DATE_SUB(NOW(), INTERVAL 7 DAY)
-                    ORDER BY g.game_time DESC
-                """, (league_id,))
-                games = cursor.fetchall()
-                
-                cursor.close()
-                connection.close()
-                
-                return render_template('live_scores_league.html', 
-                                    league=league, 
-                                    games=games)
-        
-        return redirect(url_for('index'))
+        league = dimension_cache.league(league_id)
+        if not league:
+            return redirect(url_for('index'))
+        
+        # Games of the last LIVE_BOARD_WINDOW_DAYS days come from the live board,
+        # joined with the cached teams one page at a time
+        live_board.sync_if_due(get_db_connection)
+        games = live_board.league_games(league_id)
+        page = max(request.args.get('page', 1, type=int), 1)
+        pages = max((len(games) + LEAGUE_GAMES_PAGE_SIZE - 1) // LEAGUE_GAMES_PAGE_SIZE, 1)
+        offset = (page - 1) * LEAGUE_GAMES_PAGE_SIZE
+        
+        return render_template('live_scores_league.html', 
+                            league=league, 
+                            games=dimension_cache.join_games(games[offset:offset + LEAGUE_GAMES_PAGE_SIZE]),
+                            page=page,
+                            pages=pages)
     except Exception as e:
         logger.error(f"Error rendering league scores: {e}")
         return redirect(url_for('index'))
@@ -1459,22 +1770,17 @@ def guild_customize(guild_id):
         customization = get_guild_customization(guild_id)
         
         # Get guild info
-        connection = get_db_connection()
-        if connection:
-            cursor = connection.cursor(dictionary=True)
-            cursor.execute("""
-                SELECT guild_id, guild_name, subscription_level 
-                FROM guild_settings WHERE guild_id = %s
-            """, (guild_id,))
-            guild = cursor.fetchone()
-            cursor.close()
-            connection.close()
-            
-            if guild:
-                return render_template('guild_customize.html', 
-                                    guild=guild,
-                                    customization=customization,
-                                    guild_id=guild_id)
+        record = guild_registry.get(guild_id)
+        if record and record.has_settings:
+            guild = {
+                'guild_id': record.guild_id,
+                'guild_name': record.settings_name,
+                'subscription_level': record.subscription_level
+            }
+            return render_template('guild_customize.html', 
+                                guild=guild,
+                                customization=customization,
+                                guild_id=guild_id)
         
         return redirect(url_for('guild_home', guild_id=guild_id))
         
@@ -1530,22 +1836,15 @@ def update_guild_customize(guild_id):
 
 
 @app.route('/guild/<int:guild_id>/public')
+@page_cache.cached(ttl=PAGE_CACHE_TTL, tags=('guild:{guild_id}', 'guilds'))
 def guild_public_page(guild_id):
     """Public guild page - no login required if public_access enabled."""
+    connection = None
     try:
         # Get guild info and customization
         connection = get_db_connection()
         if connection:
-            cursor = connection.cursor(dictionary=True)
-            
-            # Check if guild_customization table exists
-            try:
-                cursor.execute("SHOW TABLES LIKE 'guild_customization'")
-                table_exists = cursor.fetchone() is not None
-            except:
-                table_exists = False
-            
-            if not table_exists:
+            if not schema_registry.has_table('guild_customization'):
                 # Demo mode - show sample guild page
                 demo_guild_data = {
                     'guild_id': guild_id,
@@ -1595,9 +1894,6 @@ def guild_public_page(guild_id):
                     {'description': 'Celtics vs Heat', 'result': 'won', 'profit_loss': 7.5, 'bet_date': datetime.now()},
                 ]
                 
-                cursor.close()
-                connection.close()
-                
                 return render_template('guild_public.html',
                                     guild=demo_guild_data,
                                     guild_stats=demo_stats,
@@ -1606,23 +1902,19 @@ def guild_public_page(guild_id):
                                     guild_id=guild_id,
                                     demo_mode=True)
             
-            # Get guild and customization in one query
-            cursor.execute("""
-                SELECT 
-                    gs.guild_id, gs.guild_name, gs.subscription_level, gs.is_active,
-                    gc.*
-                FROM guild_settings gs
-                LEFT JOIN guild_customization gc ON gs.guild_id = gc.guild_id
-                WHERE gs.guild_id = %s AND gs.is_active = TRUE
-            """, (guild_id,))
-            
-            guild_data = cursor.fetchone()
-            cursor.close()
-            connection.close()
-            
-            if not guild_data:
+            # Guild settings come from the registry snapshot
+            record = guild_registry.get(guild_id)
+            if not record or not record.has_settings or not record.is_active:
                 return render_template('guild_not_found.html'), 404
             
+            guild_data = dict(get_guild_customization(guild_id) or {})
+            guild_data.update({
+                'guild_id': record.guild_id,
+                'guild_name': record.settings_name,
+                'subscription_level': record.subscription_level,
+                'is_active': record.is_active
+            })
+            
             # Check if public access is enabled or user has access
             public_access = guild_data.get('public_access') if hasattr(guild_data, 'get') else getattr(guild_data, 'public_access', False)
             has_access = public_access or check_guild_access(guild_id)
@@ -1632,25 +1924,25 @@ def guild_public_page(guild_id):
                 return render_template('guild_private.html', guild_name=guild_name), 403
             
             # Get guild statistics (only public stats)
-            guild_stats = get_guild_public_stats(guild_id)
+            datasets = [Dataset('guild_stats', lambda: get_guild_public_stats(guild_id))]
             
             # Get leaderboard if enabled
-            leaderboard = None
             show_leaderboard = guild_data.get('show_leaderboard') if hasattr(guild_data, 'get') else getattr(guild_data, 'show_leaderboard', True)
             if show_leaderboard:
-                leaderboard = get_guild_leaderboard(guild_id, limit=10)
+                datasets.append(Dataset('leaderboard', lambda: get_guild_leaderboard(guild_id, limit=10)))
             
             # Get recent activity if enabled
-            recent_activity = None
             show_recent_bets = guild_data.get('show_recent_bets') if hasattr(guild_data, 'get') else getattr(guild_data, 'show_recent_bets', True)
             if show_recent_bets:
-                recent_activity = get_recent_activity(guild_id, limit=5)
+                datasets.append(Dataset('recent_activity', lambda: get_recent_activity(guild_id, limit=5)))
+            
+            data = load_page_data(*datasets)
             
             return render_template('guild_public.html',
                                 guild=guild_data,
-                                guild_stats=guild_stats,
-                                leaderboard=leaderboard,
-                                recent_activity=recent_activity,
+                                guild_stats=data.get('guild_stats'),
+                                leaderboard=data.get('leaderboard'),
+                                recent_activity=data.get('recent_activity'),
                                 guild_id=guild_id)
         
         return render_template('guild_not_found.html'), 404
@@ -1658,6 +1950,9 @@ def guild_public_page(guild_id):
     except Exception as e:
         logger.error(f"Error rendering public guild page: {e}")
         return render_template('error.html'), 500
+    finally:
+        if connection:
+            connection.close()
 
 
 @app.route('/health')
@@ -1669,6 +1964,57 @@ def health():
         'service': 'betting-bot-webapp'
     })
 
+@app.route('/api/live-games')
+def api_live_games():
+    """Live games as JSON; ?since=<version> returns only what changed after that version."""
+    try:
+        if not REFRESH_SCHEDULER_ENABLED:
+            # No scheduler thread - the lease holder publishes at most once per interval
+            refresh_scheduler.run_if_due('live_games')
+        since = request.args.get('since', type=int)
+        delta = live_feed.changes_since(since) if since is not None else None
+        if delta is not None:
+            version, changed, removed = delta
+            payload = {'version': version, 'changed': list(changed.values()), 'removed': removed}
+        else:
+            version, games = live_feed.board()
+            payload = {'version': version, 'full': True, 'games': games}
+    except Exception as e:
+        logger.error(f"Error building live games API response: {e}")
+        return jsonify({'error': 'Live games unavailable'}), 503
+    
+    etag = f"live-{version}"
+    if since == version or etag in request.if_none_match:
+        response = Response(status=304)
+    else:
+        body = json.dumps(payload, separators=(',', ':'), default=str).encode()
+        response = Response(body, mimetype='application/json')
+        if len(body) > 1024 and 'gzip' in request.accept_encodings:
+            response.set_data(gzip.compress(body, compresslevel=5))
+            response.headers['Content-Encoding'] = 'gzip'
+        response.vary.add('Accept-Encoding')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@app.route('/api/live-games/stream')
+def live_games_stream():
+    """Server-Sent Events stream of live score and status changes."""
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    subscription = live_feed.subscribe(last_event_id)
+    if subscription is None:
+        response = jsonify({'error': 'Too many live score streams, try again shortly'})
+        response.headers['Retry-After'] = '30'
+        return response, 503
+    subscriber, initial = subscription
+    response = Response(
+        live_feed.stream(subscriber, initial, heartbeat=SSE_HEARTBEAT, max_duration=SSE_MAX_DURATION),
+        mimetype='text/event-stream'
+    )
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # don't let proxies buffer the stream
+    return response
+
 @app.route('/api/status')
 def api_status():
     """API status endpoint."""
@@ -1676,10 +2022,26 @@ def api_status():
         'status': 'operational',
         'version': '1.0.0',
         'environment': app.config['ENV'],
-        'debug': app.config['DEBUG']
+        'debug': app.config['DEBUG'],
+        'database_pool': get_db_pool().stats() if _db_pool else None,
+        'cache': cache.stats(),
+        'circuit_breakers': {
+            'database': db_breaker.snapshot(),
+            'redis': redis_breaker.snapshot() if redis_breaker else None
+        },
+        'refresh_scheduler': refresh_scheduler.stats(),
+        'discord_api': discord_client.stats(),
+        'bot_guilds': bot_guild_registry.stats(),
+        'guild_settings': guild_registry.stats(),
+        'page_cache': page_cache.stats(),
+        'page_loader': page_loader.stats(),
+        'live_feed': live_feed.stats(),
+        'live_board': live_board.stats(),
+        'dimensions': dimension_cache.stats(),
+        'schema': schema_registry.stats(),
+        'queries': query_stats()
     })
 
-
 if __name__ == "__main__":
     # Get port from environment or use default
     port = int(os.getenv('WEBAPP_PORT', 25594))
@@ -1702,201 +2064,3 @@ if __name__ == "__main__":
     except Exception as e:
         logger.error(f"Failed to start Flask webapp: {e}")
         sys.exit(1)
-
-
-
-# Performance-optimized Discord OAuth functions
-import aiohttp
-import asyncio
-from concurrent.futures import ThreadPoolExecutor
-
-# Global session for connection pooling
-_discord_session = None
-_executor = ThreadPoolExecutor(max_workers=4)
-
-def get_discord_session():
-    """Get or create Discord HTTP session with connection pooling."""
-    global _discord_session
-    if _discord_session is None or _discord_session.closed:
-        connector = aiohttp.TCPConnector(
-            limit=100,  # Total connection pool size
-            limit_per_host=30,  # Per-host connection limit
-            ttl_dns_cache=300,  # DNS cache TTL
-            use_dns_cache=True,
-            keepalive_timeout=60,
-            enable_cleanup_closed=True
-        )
-        timeout = aiohttp.ClientTimeout(total=10, connect=5)
-        _discord_session = aiohttp.ClientSession(
-            connector=connector,
-            timeout=timeout,
-            headers={'User-Agent': 'DBSBM-Bot/1.0'}
-        )
-    return _discord_session
-
-async def async_exchange_discord_code(code):
-    """Async version of Discord code exchange with connection pooling."""
-    try:
-        data = {
-            'client_id': os.getenv('DISCORD_CLIENT_ID'),
-            'client_secret': os.getenv('DISCORD_CLIENT_SECRET'),
-            'grant_type': 'authorization_code',
-            'code': code,
-            'redirect_uri': os.getenv('DISCORD_REDIRECT_URI')
-        }
-        
-        session = get_discord_session()
-        async with session.post('https://discord.com/api/oauth2/token', data=data) as response:
-            if response.status == 200:
-                return await response.json()
-            else:
-                logger.error(f"Discord token exchange failed: {response.status}")
-                return None
-                
-    except Exception as e:
-        logger.error(f"Error exchanging Discord code: {e}")
-        return None
-
-async def async_get_discord_user_info(access_token):
-    """Async version of Discord user info with connection pooling."""
-    try:
-        headers = {'Authorization': f'Bearer {access_token}'}
-        session = get_discord_session()
-        
-        async with session.get('https://discord.com/api/users/@me', headers=headers) as response:
-            if response.status == 200:
-                return await response.json()
-            else:
-                logger.error(f"Discord user info failed: {response.status}")
-                return None
-                
-    except Exception as e:
-        logger.error(f"Error getting Discord user info: {e}")
-        return None
-
-async def async_get_discord_user_guilds(access_token):
-    """Async version of Discord user guilds with connection pooling."""
-    try:
-        headers = {'Authorization': f'Bearer {access_token}'}
-        session = get_discord_session()
-        
-        async with session.get('https://discord.com/api/users/@me/guilds', headers=headers) as response:
-            if response.status == 200:
-                return await response.json()
-            else:
-                logger.error(f"Discord user guilds failed: {response.status}")
-                return []
-                
-    except Exception as e:
-        logger.error(f"Error getting Discord user guilds: {e}")
-        return []
-
-def run_async_discord_auth(code):
-    """Run async Discord auth operations concurrently."""
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    
-    try:
-        # Step 1: Exchange code for token
-        token_data = loop.run_until_complete(async_exchange_discord_code(code))
-        if not token_data or 'access_token' not in token_data:
-            return None, None, []
-        
-        access_token = token_data['access_token']
-        
-        # Step 2: Get user info and guilds concurrently
-        user_info_task = async_get_discord_user_info(access_token)
-        user_guilds_task = async_get_discord_user_guilds(access_token)
-        
-        user_info, user_guilds = loop.run_until_complete(
-            asyncio.gather(user_info_task, user_guilds_task)
-        )
-        
-        return token_data, user_info, user_guilds
-        
-    finally:
-        loop.close()
-
-# Performance-optimized callback function
-def discord_callback_optimized():
-    """Optimized Discord OAuth callback with concurrent requests."""
-    start_time = time.time()
-    
-    code = request.args.get('code')
-    if not code:
-        logger.warning("No code in Discord callback")
-        return redirect(url_for('index'))
-    
-    # Run all Discord API calls concurrently
-    token_data, user_info, user_guilds = run_async_discord_auth(code)
-    
-    if not user_info:
-        logger.error("Failed to get Discord user info")
-        return redirect(url_for('index'))
-    
-    # Get accessible guilds (optimize this with caching)
-    accessible_guilds = get_user_accessible_guilds_cached(user_guilds)
-    
-    # Store in session
-    session['discord_user'] = {
-        'id': user_info['id'],
-        'username': user_info['username'],
-        'discriminator': user_info.get('discriminator', '0000'),
-        'avatar': user_info.get('avatar'),
-        'accessible_guilds': accessible_guilds,
-        'auth_time': time.time()
-    }
-    
-    auth_time = time.time() - start_time
-    logger.info(f"Discord auth completed in {auth_time:.2f}s")
-    
-    # Redirect based on accessible guilds
-    if accessible_guilds:
-        return redirect(url_for('dashboard'))
-    else:
-        return redirect(url_for('subscribe'))
-
-# Cache for bot guild list (refresh every 5 minutes)
-_bot_guilds_cache = {'data': None, 'timestamp': 0}
-BOT_GUILDS_CACHE_TTL = 300  # 5 minutes
-
-def get_bot_guilds_cached():
-    """Get bot guilds with caching to reduce database hits."""
-    global _bot_guilds_cache
-    
-    current_time = time.time()
-    if (_bot_guilds_cache['data'] is None or 
-        current_time - _bot_guilds_cache['timestamp'] > BOT_GUILDS_CACHE_TTL):
-        
-        # Refresh cache
-        _bot_guilds_cache['data'] = get_bot_guilds()
-        _bot_guilds_cache['timestamp'] = current_time
-        logger.info("Bot guilds cache refreshed")
-    
-    return _bot_guilds_cache['data']
-
-def get_user_accessible_guilds_cached(user_guilds):
-    """Optimized version with caching."""
-    if not user_guilds:
-        return []
-    
-    # Get bot guilds from cache
-    bot_guilds = get_bot_guilds_cached()
-    if not bot_guilds:
-        return []
-    
-    # Convert to set for O(1) lookup
-    bot_guild_ids = {str(guild['guild_id']) for guild in bot_guilds}
-    
-    # Filter user guilds
-    accessible = []
-    for guild in user_guilds:
-        if str(guild['id']) in bot_guild_ids:
-            accessible.append({
-                'id': guild['id'],
-                'name': guild['name'],
-                'icon': guild.get('icon'),
-                'permissions': guild.get('permissions', 0)
-            })
-    
-    return accessible
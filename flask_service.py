@@ -2,12 +2,19 @@
 """
 Windows Service Version of Flask Application
 Runs continuously as a scheduled task with auto-restart capability
+
+On Linux the app is served by a pre-fork gunicorn server (several worker
+processes sharing one listening socket, each with a thread pool). Windows,
+or a missing gunicorn install, falls back to Flask's threaded server.
+Send SIGHUP to the master process for a graceful rolling restart.
 """
 
 import os
 import sys
 import time
+import atexit
 import logging
+import subprocess
 from pathlib import Path
 from datetime import datetime
 
@@ -37,6 +44,94 @@ def setup_environment():
         logging.error("[ERROR] .env file not found in cgi-bin directory!")
         return False
 
+def use_prefork_server():
+    """Whether to serve with gunicorn instead of Flask's threaded server."""
+    web_server = os.getenv('WEB_SERVER', 'auto')  # auto, gunicorn or werkzeug
+    if web_server == 'werkzeug':
+        return False
+    if os.name == 'nt':
+        if web_server == 'gunicorn':
+            logging.warning("gunicorn is not supported on Windows, using Flask's server")
+        return False
+    try:
+        import gunicorn  # noqa: F401
+    except ImportError:
+        logging.warning("gunicorn is not installed, using Flask's server")
+        return False
+    return True
+
+def _post_worker_init(worker):
+    """gunicorn hook: give each worker its own pools, breakers and caches."""
+    if worker.cfg.preload_app:
+        import webapp
+        webapp.init_worker()
+
+def _worker_exit(server, worker):
+    """gunicorn hook: hand the refresh leader lease to another worker and stop background threads."""
+    webapp = sys.modules.get('webapp')
+    if webapp is not None:
+        webapp.refresh_scheduler.stop()
+        webapp.discord_loop.stop()
+        webapp.cache.stop_listener()
+        webapp.live_feed.stop()
+
+def run_prefork_server():
+    """Serve the app with a pre-fork gunicorn master and worker processes."""
+    from gunicorn.app.base import BaseApplication
+
+    class FlaskServiceApplication(BaseApplication):
+        def __init__(self, options):
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            from webapp import app
+            return app
+
+    # Read after load_dotenv() so .env settings apply
+    bind = os.getenv('WEB_BIND', '0.0.0.0:5000')
+    workers = int(os.getenv('WEB_WORKERS', (os.cpu_count() or 1) * 2 + 1))
+    threads = int(os.getenv('WEB_THREADS', 4))
+    options = {
+        'bind': bind,
+        'workers': workers,
+        'worker_class': 'gthread',
+        'threads': threads,
+        # Recycle workers regularly; jitter keeps them from restarting together
+        'max_requests': int(os.getenv('WEB_MAX_REQUESTS', 1000)),
+        'max_requests_jitter': int(os.getenv('WEB_MAX_REQUESTS_JITTER', 100)),
+        'timeout': int(os.getenv('WEB_TIMEOUT', 30)),
+        'graceful_timeout': int(os.getenv('WEB_GRACEFUL_TIMEOUT', 30)),
+        'keepalive': int(os.getenv('WEB_KEEPALIVE', 5)),
+        # Excess connections queue in the kernel instead of piling onto workers
+        'backlog': int(os.getenv('WEB_BACKLOG', 2048)),
+        'preload_app': os.getenv('WEB_PRELOAD', 'false').lower() == 'true',
+        'post_worker_init': _post_worker_init,
+        'worker_exit': _worker_exit,
+        'accesslog': None,
+        'errorlog': '-',
+    }
+    logging.info(f"Starting gunicorn on {bind}: {workers} workers x {threads} threads")
+    FlaskServiceApplication(options).run()
+
+_live_stream_process = None
+
+def start_live_stream_server():
+    """Run the non-blocking live score stream server next to the web server (LIVE_STREAM_BIND)."""
+    global _live_stream_process
+    if not os.getenv('LIVE_STREAM_BIND'):
+        return
+    if _live_stream_process is not None and _live_stream_process.poll() is None:
+        return  # still running from before a restart
+    _live_stream_process = subprocess.Popen([sys.executable, str(app_dir / 'live_stream.py')], cwd=app_dir)
+    atexit.register(_live_stream_process.terminate)
+    logging.info(f"Live score stream server started on {os.getenv('LIVE_STREAM_BIND')} "
+                 f"(pid {_live_stream_process.pid}); route /api/live-games/stream to it")
+
 def start_flask_app():
     """Start the Flask application with error handling."""
     try:
@@ -46,6 +141,11 @@ def start_flask_app():
         # Load environment variables
         from dotenv import load_dotenv
         load_dotenv('.env')
+        start_live_stream_server()
+        
+        if use_prefork_server():
+            run_prefork_server()
+            return
         
         # Import and configure the Flask app
         from webapp import app
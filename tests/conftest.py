@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The web app's modules live side by side in cgi-bin/ (not a package)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cgi-bin'))
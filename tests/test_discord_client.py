@@ -0,0 +1,154 @@
+"""DiscordClient against a local fake Discord server."""
+
+import asyncio
+import time
+
+import aiohttp
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from discord_client import DiscordClient, RateLimited
+
+
+def run_against(handlers, scenario, **client_options):
+    """Start a fake API serving handlers {path: handler}, then await scenario(client, calls)."""
+    calls = []
+
+    def recording(path, handler):
+        async def handle(request):
+            calls.append((path, time.monotonic()))
+            return await handler(request)
+        return handle
+
+    async def main():
+        app = web.Application()
+        for path, handler in handlers.items():
+            app.router.add_route('*', path, recording(path, handler))
+        async with TestServer(app) as server, aiohttp.ClientSession() as session:
+            client = DiscordClient(lambda: session, api_base=str(server.make_url('/api')), **client_options)
+            return await scenario(client, calls)
+
+    return asyncio.run(main())
+
+
+def test_429_is_retried_after_retry_after():
+    responses = iter([
+        web.json_response({'message': 'rate limited', 'retry_after': 0.2}, status=429,
+                          headers={'Retry-After': '1'}),
+        web.json_response({'id': '42'}),
+    ])
+
+    async def me(request):
+        return next(responses)
+
+    async def scenario(client, calls):
+        assert await client.get_current_user('token') == {'id': '42'}
+        return client, calls
+
+    client, calls = run_against({'/api/users/@me': me}, scenario)
+    assert len(calls) == 2
+    # The JSON retry_after (0.2s) wins over the coarser header
+    assert 0.15 <= calls[1][1] - calls[0][1] < 0.9
+    assert client.stats()['retries'] == 1
+
+
+def test_429_longer_than_max_retry_wait_raises():
+    async def me(request):
+        return web.json_response({'retry_after': 30}, status=429, headers={'Retry-After': '30'})
+
+    async def scenario(client, calls):
+        with pytest.raises(RateLimited) as raised:
+            await client.get_current_user('token')
+        return raised.value, calls
+
+    error, calls = run_against({'/api/users/@me': me}, scenario, max_retry_wait=5)
+    assert error.retry_after == 30
+    assert len(calls) == 1
+
+
+def test_exhausted_bucket_waits_for_reset_instead_of_drawing_a_429():
+    async def me(request):
+        return web.json_response({'id': '42'}, headers={
+            'X-RateLimit-Bucket': 'users-me',
+            'X-RateLimit-Remaining': '0',
+            'X-RateLimit-Reset-After': '0.3',
+        })
+
+    async def scenario(client, calls):
+        await client.get_current_user('token')
+        await client.get_current_user('token')
+        return client, calls
+
+    client, calls = run_against({'/api/users/@me': me}, scenario)
+    assert len(calls) == 2
+    assert calls[1][1] - calls[0][1] >= 0.25
+    assert client.stats()['rate_limit_waits'] == 1
+
+
+def test_buckets_are_scoped_per_token():
+    async def me(request):
+        return web.json_response({'id': '42'}, headers={
+            'X-RateLimit-Bucket': 'users-me',
+            'X-RateLimit-Remaining': '0',
+            'X-RateLimit-Reset-After': '5',
+        })
+
+    async def scenario(client, calls):
+        await client.get_current_user('first')
+        await client.get_current_user('second')  # its own bucket - no wait
+        with pytest.raises(RateLimited):
+            await client.get_current_user('first')
+        return client, calls
+
+    client, calls = run_against({'/api/users/@me': me}, scenario, max_retry_wait=1)
+    assert len(calls) == 2
+    assert client.stats()['rate_limit_waits'] == 0
+
+
+def test_routes_sharing_a_bucket_share_its_limit():
+    headers = {'X-RateLimit-Bucket': 'shared', 'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset-After': '5'}
+
+    async def member(request):
+        return web.json_response({'roles': ['1']}, headers=headers)
+
+    async def scenario(client, calls):
+        await client.get_member_roles(1, 10, 'token')
+        # Another member of the same guild maps to the learnt bucket
+        with pytest.raises(RateLimited):
+            await client.get_member_roles(1, 11, 'token')
+        # A different guild is a different major parameter
+        assert await client.get_member_roles(2, 10, 'token') == ['1']
+        return calls
+
+    calls = run_against({'/api/guilds/{guild_id}/members/{user_id}': member}, scenario, max_retry_wait=1)
+    assert len(calls) == 2
+
+
+def test_guilds_are_cached_per_token():
+    async def guilds(request):
+        return web.json_response([{'id': '1'}])
+
+    async def scenario(client, calls):
+        await client.get_current_user_guilds('token')
+        await client.get_current_user_guilds('token')
+        await client.get_current_user_guilds('other')
+        return client, calls
+
+    client, calls = run_against({'/api/users/@me/guilds': guilds}, scenario)
+    assert len(calls) == 2
+    assert client.stats()['cache_hits'] == 1
+
+
+def test_server_errors_are_retried():
+    statuses = iter([502, 200])
+
+    async def me(request):
+        return web.json_response({'id': '42'}, status=next(statuses))
+
+    async def scenario(client, calls):
+        return await client.get_current_user('token'), calls
+
+    user, calls = run_against({'/api/users/@me': me}, scenario)
+    assert user == {'id': '42'}
+    assert len(calls) == 2
@@ -0,0 +1,214 @@
+"""Named query rendering for MySQL and PostgreSQL, and the prepared statement paths."""
+
+import os
+import re
+import string
+
+import pytest
+
+import queries
+from queries import PARAM, QUERIES, fetch_all, fetch_one, register, render
+from schema import ASSUMED_SCHEMA, BetColumns
+
+DIALECTS = ('mysql', 'postgres')
+
+
+@pytest.fixture(scope='module')
+def all_queries(tmp_path_factory):
+    """Every registered query, with webapp's included (imported away from the repo's log dir)."""
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp('webapp'))
+    try:
+        import webapp  # noqa: F401 - registers the page queries
+    finally:
+        os.chdir(cwd)
+    return sorted(QUERIES)
+
+
+@pytest.fixture
+def temporary_query():
+    """Register throwaway queries, removed again after the test."""
+    names = []
+
+    def add(name, sql, **options):
+        names.append(register(name, sql, **options))
+        return name
+
+    yield add
+    for name in names:
+        QUERIES.pop(name, None)
+
+
+def placeholder_fragments(name):
+    """Fragments for a query's caller-supplied fields: bet columns for {bets.*}, else empty."""
+    query = QUERIES[name]
+    fields = set()
+    for text in filter(None, (query.sql, query.postgres)):
+        for _, field, _, _ in string.Formatter().parse(text):
+            if field:
+                fields.add(re.split(r'[.\[]', field)[0])
+    fields -= set(queries.MACROS['mysql'])
+    return {field: BetColumns(ASSUMED_SCHEMA['bets']) if field == 'bets' else '' for field in fields}
+
+
+# -- parameters -----------------------------------------------------------
+
+@pytest.mark.parametrize('sql, expected', [
+    ("WHERE guild_id = :guild_id AND user_id = :user_id", ['guild_id', 'user_id']),
+    ("WHERE a = :a OR b = :a", ['a', 'a']),
+    ("SELECT created_at::date FROM bets WHERE id = :id", ['id']),  # casts are not parameters
+    ("WHERE start_time > '12:30' AND x = :x_1", ['x_1']),  # nor are times in literals
+    ("SELECT 1", []),
+])
+def test_param_pattern(sql, expected):
+    assert PARAM.findall(sql) == expected
+
+
+# -- macros ---------------------------------------------------------------
+
+def test_macros_render_per_dialect(temporary_query):
+    name = temporary_query('test.macros', """
+        INSERT INTO t (id, n, seen) VALUES (:id, :n, {now})
+        {upsert:id} n = {excluded:n}, day = {today}, old = {ago:1 MONTH}, db = {current_schema}
+    """, prepare=False)
+
+    mysql = render(name, 'mysql').sql
+    assert "VALUES (%s, %s, NOW())" in mysql
+    assert "ON DUPLICATE KEY UPDATE n = VALUES(n)" in mysql
+    assert "day = CURDATE()" in mysql
+    assert "old = DATE_SUB(NOW(), INTERVAL 1 MONTH)" in mysql
+    assert "db = DATABASE()" in mysql
+
+    postgres = render(name, 'postgres').sql
+    assert "ON CONFLICT (id) DO UPDATE SET n = EXCLUDED.n" in postgres
+    assert "day = CURRENT_DATE" in postgres
+    assert "old = NOW() - INTERVAL '1 MONTH'" in postgres
+    assert "db = current_schema()" in postgres
+
+
+def test_postgres_text_overrides_the_portable_sql(temporary_query):
+    name = temporary_query('test.override', "SELECT IFNULL(a, 0) FROM t", postgres="SELECT COALESCE(a, 0) FROM t")
+    assert 'IFNULL' in render(name, 'mysql').sql
+    assert 'COALESCE' in render(name, 'postgres').prepare_sql
+
+
+def test_upsert_macro_with_composite_key(temporary_query):
+    name = temporary_query('test.composite', "INSERT INTO t (a, b) VALUES (:a, :b) {upsert:a, b} b = {excluded:b}",
+                           prepare=False)
+    assert "ON CONFLICT (a, b) DO UPDATE SET b = EXCLUDED.b" in render(name, 'postgres').sql
+
+
+# -- every registered query -----------------------------------------------
+
+def test_every_registered_query_renders_for_both_dialects(all_queries):
+    assert len(all_queries) > 30
+    for name in all_queries:
+        fragments = placeholder_fragments(name)
+        for dialect in DIALECTS:
+            rendered = render(name, dialect, fragments)
+            text = rendered.prepare_sql or rendered.sql
+            assert '{' not in text and '}' not in text, (name, dialect)
+            assert not PARAM.findall(rendered.sql), (name, dialect)
+            if rendered.prepare_sql:
+                # $n numbered in first-use order; EXECUTE passes one value per distinct name
+                numbers = sorted({int(n) for n in re.findall(r'\$(\d+)', rendered.prepare_sql)})
+                assert numbers == list(range(1, len(rendered.params) + 1)), (name, dialect)
+                assert len(set(rendered.params)) == len(rendered.params), (name, dialect)
+                assert rendered.sql.count('%s') == len(rendered.params), (name, dialect)
+                assert re.fullmatch(r'\w{1,63}', rendered.statement), (name, dialect)
+            else:
+                assert rendered.sql.count('%s') == len(rendered.params), (name, dialect)
+
+
+def test_render_cache_is_keyed_on_fragment_text(temporary_query):
+    name = temporary_query('test.fragments', "SELECT {bets.won} FROM bets WHERE guild_id = :guild_id")
+    first = render(name, 'mysql', {'bets': BetColumns(ASSUMED_SCHEMA['bets'])})
+    renders = queries.stats()['renders']
+    # A re-probed schema hands out new fragment objects with the same SQL
+    assert render(name, 'mysql', {'bets': BetColumns(ASSUMED_SCHEMA['bets'])}) is first
+    assert queries.stats()['renders'] == renders
+    assert render(name, 'mysql', {'bets': BetColumns({'status'})}) is not first
+
+
+# -- execution ------------------------------------------------------------
+
+class FakeCursor:
+    def __init__(self, log, rows=((1, 'a'),), **options):
+        self.log = log
+        self.rows = list(rows)
+        self.options = options
+        self.description = None
+        self.rowcount = 0
+
+    def execute(self, sql, values=None):
+        self.log.append((sql.strip(), values, self.options))
+        if sql.lstrip().startswith('PREPARE'):
+            self.description = None
+        else:
+            self.description = [('id',), ('name',)]
+            self.rowcount = len(self.rows)
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+
+class FakePostgres:
+    def __init__(self):
+        self.log = []
+
+    def cursor(self):
+        return FakeCursor(self.log)
+
+
+FakePostgres.__module__ = 'psycopg2.extensions'  # how dialect_of recognises psycopg2
+
+
+class FakeMySQL:
+    def __init__(self):
+        self.log = []
+        self.cursors = 0
+
+    def cursor(self, **options):
+        self.cursors += 1
+        return FakeCursor(self.log, **options)
+
+
+def test_postgres_prepares_once_per_connection_then_executes(temporary_query):
+    name = temporary_query('test.pg', "SELECT id, name FROM t WHERE a = :a AND b = :b OR a = :a")
+    connection = FakePostgres()
+
+    assert fetch_all(connection, name, {'a': 1, 'b': 2}) == [{'id': 1, 'name': 'a'}]
+    assert fetch_one(connection, name, {'a': 3, 'b': 4}) == {'id': 1, 'name': 'a'}
+
+    prepare, first, second = connection.log
+    statement = render(name, 'postgres').statement
+    assert prepare[0] == f"PREPARE {statement} AS SELECT id, name FROM t WHERE a = $1 AND b = $2 OR a = $1"
+    assert first[:2] == (f"EXECUTE {statement} (%s, %s)", (1, 2))
+    assert second[:2] == (f"EXECUTE {statement} (%s, %s)", (3, 4))
+
+    # A new connection prepares the statement again
+    other = FakePostgres()
+    fetch_all(other, name, {'a': 1, 'b': 2})
+    assert other.log[0][0].startswith('PREPARE')
+
+
+def test_mysql_reuses_one_prepared_cursor_per_statement(temporary_query):
+    name = temporary_query('test.mysql', "SELECT id, name FROM t WHERE a = :a")
+    connection = FakeMySQL()
+
+    fetch_all(connection, name, {'a': 1})
+    fetch_all(connection, name, {'a': 2})
+
+    assert connection.cursors == 1
+    assert [entry[1] for entry in connection.log] == [(1,), (2,)]
+    assert connection.log[0][2] == {'prepared': True, 'buffered': False}
+
+
+def test_unprepared_queries_use_plain_cursors(temporary_query):
+    name = temporary_query('test.plain', "SELECT id, name FROM t WHERE a = :a", prepare=False)
+    connection = FakePostgres()
+    fetch_all(connection, name, {'a': 1})
+    assert connection.log == [("SELECT id, name FROM t WHERE a = %s", (1,), {})]